@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+Benchmark del sistema completo sin red externa: Rukovoditel falso y un modelo local en lugar de Groq.
+
+Levanta `servidor_falso.py` (por HTTP con uvicorn o en el mismo proceso con `httpx.ASGITransport`)
+y reemplaza el modelo de Groq por un `FunctionModel` de pydantic-ai que espera `--latencia-llm-ms`,
+llama a `consulta_licencias_encargados` y después responde. Mide estos escenarios:
+
+    transformar   `transformar_respuesta` sobre todos los registros del servidor falso
+    herramienta   `consulta_licencias_encargados` con filtros por empleado
+    agente        `Agent.arun` de punta a punta (modelo local + herramienta + Rukovoditel falso)
+    servidor      POST /consulta contra la aplicación FastAPI, con su limitador de concurrencia
+
+Los escenarios concurrentes se repiten para cada cantidad de usuarios simultáneos de `--usuarios`;
+cada usuario hace `--consultas` consultas seguidas. Los caches de Rukovoditel y de respuestas, el
+enrutador de intenciones y el límite de tasa hacia Rukovoditel se desactivan salvo que se pidan
+(`--con-cache`, `--con-limites`), para medir siempre el camino completo. Los límites del servidor
+(API_MAX_CONCURRENCIA, API_MAX_COLA) se toman del entorno, así que las 429 son las que vería un cliente.
+
+El resultado se guarda en JSON (`benchmarks/resultados/` por defecto) y se puede comparar con una
+corrida anterior; con una regresión mayor a la tolerancia el proceso termina con código 1.
+
+Uso:
+    python benchmarks/bench_sistema.py [--usuarios 10,100,1000] [--consultas 3] [--registros 5000]
+                                       [--transporte http|asgi] [--comparar base.json] [--tolerancia 0.2]
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+from typing import Optional, Dict, Any, List, Callable, Awaitable
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+ESCENARIOS = ["transformar", "herramienta", "agente", "servidor"]
+APELLIDOS = ["VIOLA", "AYVAR", "GOMEZ", "PEREZ", "SOSA", "DIAZ", "ROMERO", "TORRES"]
+RESPUESTA_FALSA = "Estas son las licencias encontradas."
+
+# Métricas que se comparan entre corridas: (ruta en el resultado, True si un valor mayor es peor)
+METRICAS_COMPARADAS = [
+    (("latencia_ms", "p95"), True),
+    (("throughput_rps",), False),
+    (("mejor_ms",), True),
+]
+
+
+def configurar_entorno(args):
+    """
+    Variables de entorno para el paquete. Se fijan antes de importarlo (también a través de
+    `servidor_falso`) porque los módulos leen su configuración al importarse, y tienen prioridad
+    sobre el `.env` (load_dotenv no las pisa).
+    """
+    os.environ.update({
+        "RUKOVODITEL_API_KEY": "clave-benchmark",
+        "RUKOVODITEL_USER": "benchmark",
+        "RUKOVODITEL_PASSWORD": "benchmark",
+        "RUKOVODITEL_SYNC_SQLITE": "",
+        "RUKOVODITEL_ENTIDADES": "",
+        "GROQ_API_KEY": os.getenv("GROQ_API_KEY") or "gsk-benchmark",
+        "AGENTE_ENRUTADOR": "0",
+        "AGENTE_TRAZAS": "",
+    })
+    if not args.con_cache:
+        os.environ["RUKOVODITEL_CACHE_TTL"] = "0"
+        os.environ["RUKOVODITEL_CACHE_SQLITE"] = ""
+        os.environ["AGENTE_CACHE_RESPUESTAS_TTL"] = "0"
+    if not args.con_limites:
+        os.environ["RUKOVODITEL_TASA"] = "0"
+
+
+def usar_rukovoditel_falso(falso, url: Optional[str] = None):
+    """
+    Reemplaza el cliente compartido de Rukovoditel por uno que apunta al servidor falso: por HTTP
+    si se indica su `url`, o llamando a la aplicación en el mismo proceso, sin sockets
+    """
+    import httpx
+    from mi_agente_ai.services import rukovoditel
+
+    if url is not None:
+        rukovoditel._cliente_compartido = rukovoditel.RukovoditelClient(api_url=url)
+    else:
+        rukovoditel._cliente_compartido = rukovoditel.RukovoditelClient(
+            api_url="http://rukovoditel/api/rest.php", async_transport=httpx.ASGITransport(falso)
+        )
+
+
+def modelo_falso(latencia_ms: float):
+    """
+    Modelo local en lugar de Groq: en el primer turno pide la herramienta de licencias con el empleado
+    que aparece al final de la consulta, y cuando recibe el resultado responde con el resultado final.
+    Cada turno espera `latencia_ms` para simular el tiempo de generación.
+    """
+    from pydantic_ai.messages import ModelResponse, ToolCallPart, ToolReturnPart, UserPromptPart
+    from pydantic_ai.models.function import FunctionModel
+
+    async def responder(mensajes, info):
+        await asyncio.sleep(latencia_ms / 1000)
+        partes = [parte for mensaje in mensajes for parte in mensaje.parts]
+        if not any(isinstance(parte, ToolReturnPart) for parte in partes):
+            prompt = next(parte.content for parte in reversed(partes) if isinstance(parte, UserPromptPart))
+            # Con un único parámetro de tipo modelo, los argumentos de la herramienta son los campos del modelo
+            return ModelResponse(parts=[ToolCallPart("consulta_licencias_encargados", {
+                "filtro": {"empleado": prompt.split()[-1]}, "limit": 50,
+            })])
+        return ModelResponse(parts=[ToolCallPart(info.result_tools[0].name, {"response": RESPUESTA_FALSA})])
+
+    return FunctionModel(responder)
+
+
+def reemplazar_modelo(agente, latencia_ms: float):
+    from mi_agente_ai.agents.base_agent import ModeloTrazado
+
+    agente.agent.model = ModeloTrazado(modelo_falso(latencia_ms))
+
+
+def percentiles(latencias: List[float]) -> Dict[str, Optional[float]]:
+    if not latencias:
+        return {"p50": None, "p95": None, "p99": None, "media": None, "max": None}
+    ordenadas = sorted(latencias)
+
+    def percentil(p: float) -> float:
+        return round(ordenadas[min(len(ordenadas) - 1, int(p * len(ordenadas)))], 2)
+
+    return {
+        "p50": percentil(0.50),
+        "p95": percentil(0.95),
+        "p99": percentil(0.99),
+        "media": round(statistics.fmean(ordenadas), 2),
+        "max": round(ordenadas[-1], 2),
+    }
+
+
+async def medir(usuarios: int, consultas: int, operacion: Callable[[int, int], Awaitable[str]]) -> Dict[str, Any]:
+    """
+    Ejecuta `usuarios` usuarios simultáneos que hacen `consultas` operaciones seguidas cada uno.
+    La operación devuelve "ok", "rechazada" o "error"; solo las exitosas cuentan para la latencia.
+    """
+    latencias: List[float] = []
+    conteo = {"ok": 0, "rechazada": 0, "error": 0}
+
+    async def usuario(numero: int):
+        for consulta in range(consultas):
+            inicio = time.perf_counter()
+            try:
+                estado = await operacion(numero, consulta)
+            except Exception as e:
+                print(f"  error: {type(e).__name__}: {e}")
+                estado = "error"
+            conteo[estado] += 1
+            if estado == "ok":
+                latencias.append((time.perf_counter() - inicio) * 1000)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(usuario(numero) for numero in range(usuarios)))
+    duracion = time.perf_counter() - inicio
+    return {
+        "usuarios": usuarios,
+        "consultas": usuarios * consultas,
+        "exitosas": conteo["ok"],
+        "rechazadas": conteo["rechazada"],
+        "errores": conteo["error"],
+        "duracion_s": round(duracion, 3),
+        "throughput_rps": round(conteo["ok"] / duracion, 2) if duracion else None,
+        "latencia_ms": percentiles(latencias),
+    }
+
+
+def _apellido(numero: int, consulta: int) -> str:
+    return APELLIDOS[(numero + consulta) % len(APELLIDOS)]
+
+
+def escenario_transformar(falso, repeticiones: int) -> Dict[str, Any]:
+    from mi_agente_ai.tools.consulta_licencias_encargados import transformar_respuesta
+
+    respuesta = {"status": "success", "data": falso.registros}
+    segundos = min(timeit.repeat(lambda: transformar_respuesta(respuesta), number=1, repeat=repeticiones))
+    return {
+        "registros": len(falso.registros),
+        "mejor_ms": round(segundos * 1000, 3),
+        "registros_por_s": round(len(falso.registros) / segundos),
+    }
+
+
+def operacion_herramienta():
+    from mi_agente_ai.tools.consulta_licencias_encargados import (
+        ConsultaLicenciasEncargadosInput, consulta_licencias_encargados
+    )
+    from mi_agente_ai.tools.planificador import FiltrosLicencias
+
+    async def operacion(numero: int, consulta: int) -> str:
+        salida = await consulta_licencias_encargados(ConsultaLicenciasEncargadosInput(
+            filtro=FiltrosLicencias(empleado=_apellido(numero, consulta)), limit=50
+        ))
+        return "ok" if salida.metadata.get("success") else "error"
+
+    return operacion
+
+
+def operacion_agente(agente):
+    async def operacion(numero: int, consulta: int) -> str:
+        respuesta = await agente.arun(f"Licencias de {_apellido(numero, consulta)}")
+        return "ok" if respuesta.response == RESPUESTA_FALSA else "error"
+
+    return operacion
+
+
+async def escenario_servidor(usuarios: int, consultas: int, latencia_llm_ms: float) -> Dict[str, Any]:
+    """POST /consulta por ASGI contra la aplicación FastAPI, con su ciclo de vida y su limitador"""
+    import httpx
+    from mi_agente_ai.api.server import crear_app
+
+    app = crear_app()
+    async with app.router.lifespan_context(app):
+        reemplazar_modelo(app.state.agente, latencia_llm_ms)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app), base_url="http://api",
+                                     timeout=None) as cliente:
+            async def operacion(numero: int, consulta: int) -> str:
+                respuesta = await cliente.post("/consulta", json={"prompt": f"Licencias de {_apellido(numero, consulta)}"})
+                if respuesta.status_code == 429:
+                    return "rechazada"
+                if respuesta.status_code == 200 and respuesta.json()["response"] == RESPUESTA_FALSA:
+                    return "ok"
+                return "error"
+
+            return await medir(usuarios, consultas, operacion)
+
+
+async def ejecutar_escenarios(args, falso) -> List[Dict[str, Any]]:
+    from mi_agente_ai.agents.base_agent import Agent
+    from mi_agente_ai.services.rukovoditel import obtener_cliente
+    from mi_agente_ai.utils.trazas import trazador
+
+    resultados = []
+
+    def registrar(escenario: str, resultado: Dict[str, Any]):
+        resultado = {"escenario": escenario, **resultado, "trazas": trazador.estadisticas()}
+        resultados.append(resultado)
+        if "mejor_ms" in resultado:
+            print(f"  {escenario:<12} {resultado['mejor_ms']:9.2f} ms  {resultado['registros_por_s']} registros/s")
+        else:
+            latencia = resultado["latencia_ms"]
+            print(f"  {escenario:<12} {resultado['usuarios']:>5} usuarios  {resultado['throughput_rps']:>8} rps  "
+                  f"p50 {latencia['p50']} ms  p95 {latencia['p95']} ms  p99 {latencia['p99']} ms  "
+                  f"rechazadas {resultado['rechazadas']}  errores {resultado['errores']}")
+
+    if "transformar" in args.escenarios:
+        trazador.reiniciar()
+        registrar("transformar", escenario_transformar(falso, args.repeticiones))
+
+    agente = None
+    if "agente" in args.escenarios:
+        agente = Agent()
+        reemplazar_modelo(agente, args.latencia_llm_ms)
+
+    for usuarios in args.usuarios:
+        if "herramienta" in args.escenarios:
+            trazador.reiniciar()
+            registrar("herramienta", await medir(usuarios, args.consultas, operacion_herramienta()))
+        if "agente" in args.escenarios:
+            trazador.reiniciar()
+            registrar("agente", await medir(usuarios, args.consultas, operacion_agente(agente)))
+        if "servidor" in args.escenarios:
+            trazador.reiniciar()
+            registrar("servidor", await escenario_servidor(usuarios, args.consultas, args.latencia_llm_ms))
+
+    await obtener_cliente().aclose()
+    return resultados
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=DIRECTORIO, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _valor(resultado: Dict[str, Any], ruta) -> Optional[float]:
+    for clave in ruta:
+        if not isinstance(resultado, dict):
+            return None
+        resultado = resultado.get(clave)
+    return resultado if isinstance(resultado, (int, float)) else None
+
+
+def comparar(base: Dict[str, Any], actual: Dict[str, Any], tolerancia: float) -> List[str]:
+    """Compara dos corridas por (escenario, usuarios) y devuelve las regresiones mayores a la tolerancia"""
+    def por_clave(corrida):
+        return {(r["escenario"], r.get("usuarios")): r for r in corrida["resultados"]}
+
+    anteriores = por_clave(base)
+    regresiones = []
+    print(f"\nComparación con la corrida {base.get('fecha')} ({base.get('entorno', {}).get('commit')}):")
+    distintos = [clave for clave, valor in actual["parametros"].items() if base.get("parametros", {}).get(clave) != valor]
+    if distintos:
+        print(f"  Atención: las corridas usan parámetros distintos ({', '.join(distintos)})")
+    for clave, resultado in por_clave(actual).items():
+        anterior = anteriores.get(clave)
+        if anterior is None:
+            continue
+        for ruta, mayor_es_peor in METRICAS_COMPARADAS:
+            antes, ahora = _valor(anterior, ruta), _valor(resultado, ruta)
+            if not antes or ahora is None:
+                continue
+            cambio = (ahora - antes) / antes
+            empeora = cambio > tolerancia if mayor_es_peor else cambio < -tolerancia
+            nombre = f"{clave[0]}" + (f" ({clave[1]} usuarios)" if clave[1] is not None else "")
+            linea = f"{nombre} {'.'.join(ruta)}: {antes} -> {ahora} ({cambio:+.1%})"
+            print(f"  {'REGRESIÓN ' if empeora else ''}{linea}")
+            if empeora:
+                regresiones.append(linea)
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--usuarios", default="10,100,1000", help="Usuarios simultáneos, separados por comas")
+    parser.add_argument("--consultas", type=int, default=3, help="Consultas seguidas por usuario")
+    parser.add_argument("--escenarios", default=",".join(ESCENARIOS))
+    parser.add_argument("--registros", type=int, default=5000)
+    parser.add_argument("--latencia-ms", type=float, default=50, help="Latencia del Rukovoditel falso")
+    parser.add_argument("--jitter-ms", type=float, default=10)
+    parser.add_argument("--latencia-llm-ms", type=float, default=100, help="Latencia de cada turno del modelo local")
+    parser.add_argument("--repeticiones", type=int, default=5, help="Repeticiones del escenario transformar")
+    parser.add_argument("--transporte", choices=["http", "asgi"], default="http")
+    parser.add_argument("--con-cache", action="store_true", help="Mantener los caches configurados")
+    parser.add_argument("--con-limites", action="store_true", help="Mantener el límite de tasa hacia Rukovoditel")
+    parser.add_argument("--salida", help="Archivo JSON de resultados (por defecto benchmarks/resultados/sistema-<fecha>.json)")
+    parser.add_argument("--comparar", help="Resultado anterior contra el que comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="Empeoramiento relativo permitido (0.2 = 20 %%)")
+    args = parser.parse_args()
+    args.usuarios = [int(u) for u in args.usuarios.split(",") if u.strip()]
+    args.escenarios = [e.strip() for e in args.escenarios.split(",") if e.strip()]
+    desconocidos = set(args.escenarios) - set(ESCENARIOS)
+    if desconocidos:
+        parser.error(f"Escenarios desconocidos: {', '.join(sorted(desconocidos))}")
+
+    configurar_entorno(args)
+    from servidor_falso import RukovoditelFalso, ServidorHTTP
+
+    falso = RukovoditelFalso(args.registros, args.latencia_ms, args.jitter_ms)
+    fecha = datetime.datetime.now().isoformat(timespec="seconds")
+    print(f"{args.registros} licencias, Rukovoditel {args.latencia_ms} ms, modelo {args.latencia_llm_ms} ms, "
+          f"transporte {args.transporte}")
+
+    if args.transporte == "http":
+        with ServidorHTTP(falso) as servidor:
+            usar_rukovoditel_falso(falso, servidor.url)
+            resultados = asyncio.run(ejecutar_escenarios(args, falso))
+    else:
+        usar_rukovoditel_falso(falso)
+        resultados = asyncio.run(ejecutar_escenarios(args, falso))
+
+    corrida = {
+        "fecha": fecha,
+        "entorno": {
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "cpus": os.cpu_count(),
+            "commit": _commit(),
+        },
+        "parametros": {
+            clave: getattr(args, clave) for clave in (
+                "usuarios", "consultas", "escenarios", "registros", "latencia_ms", "jitter_ms",
+                "latencia_llm_ms", "transporte", "con_cache", "con_limites",
+            )
+        },
+        "rukovoditel": falso.estadisticas(),
+        "resultados": resultados,
+    }
+    salida = args.salida or os.path.join(DIRECTORIO, "resultados", f"sistema-{fecha.replace(':', '')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, "w", encoding="utf-8") as archivo:
+        json.dump(corrida, archivo, ensure_ascii=False, indent=2)
+    print(f"Resultados en {salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as archivo:
+            regresiones = comparar(json.load(archivo), corrida, args.tolerancia)
+        if regresiones:
+            print(f"{len(regresiones)} regresiones mayores al {args.tolerancia:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
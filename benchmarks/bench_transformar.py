@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark del transformador de registros de licencias.
+
+Compara la implementación anterior de `transformar_respuesta` (un recorrido por registro
+para buscar el 912, chequeos de pertenencia y otro recorrido contra una lista literal
+que reconstruye el mapping de nombres en cada campo) con el transformador compilado
+de `mi_agente_ai/tools/esquema.py`, en modo registro y en modo columnar.
+
+Uso:
+    python benchmarks/bench_transformar.py [--registros 10000] [--repeticiones 5]
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from mi_agente_ai.tools.esquema import obtener_transformador
+
+
+def _obtener_nombre_campo_anterior(campo_id):
+    campo_mapping = {
+        "651": "Fecha de inicio",
+        "665": "Fecha Finalización",
+        "653": "Reincorporación",
+        "912": "Empleado"
+    }
+    return campo_mapping.get(str(campo_id), f"Campo {campo_id}")
+
+
+def transformar_anterior(registros):
+    """Implementación anterior, sin cambios"""
+    registros_procesados = []
+    for registro in registros:
+        registro_procesado = {}
+        for key, value in registro.items():
+            if key == "912":
+                registro_procesado["Empleado"] = value
+                break
+        if "651" in registro:
+            registro_procesado["Fecha de inicio"] = registro["651"]
+        if "665" in registro:
+            registro_procesado["Fecha Finalización"] = registro["665"]
+        if "653" in registro:
+            registro_procesado["Reincorporación"] = registro["653"]
+        for key, value in registro.items():
+            if key not in ["id", "date_added", "date_updated", "created_by", "parent_item_id",
+                           "912", "651", "665", "653"]:
+                registro_procesado[_obtener_nombre_campo_anterior(key)] = value
+        registros_procesados.append(registro_procesado)
+    return registros_procesados
+
+
+def generar_registros(cantidad, semilla=0):
+    """Registros con la forma que devuelve Rukovoditel para la entidad 43"""
+    azar = random.Random(semilla)
+    apellidos = ["VIOLA", "AYVAR", "GOMEZ", "PEREZ", "SOSA", "DIAZ", "ROMERO", "TORRES"]
+    nombres = ["Daniel", "Celestino", "María", "Juan", "Ana", "Luis"]
+    registros = []
+    for i in range(cantidad):
+        dia, mes, anio = azar.randint(1, 28), azar.randint(1, 12), azar.randint(2019, 2024)
+        registros.append({
+            "id": str(i + 1),
+            "date_added": "1665000000",
+            "date_updated": "1665000000",
+            "created_by": "1",
+            "parent_item_id": "0",
+            "912": f"{azar.choice(apellidos)}, {azar.choice(nombres)}",
+            "651": f"{dia:02d}/{mes:02d}/{anio}",
+            "665": f"{min(28, dia + 10):02d}/{mes:02d}/{anio}",
+            "653": f"{min(28, dia + 11):02d}/{mes:02d}/{anio}" if azar.random() < 0.8 else "",
+            "700": "observación",
+        })
+    return registros
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--registros", type=int, default=10000)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    registros = generar_registros(args.registros)
+    transformador = obtener_transformador(43)
+    transformador_fechas = obtener_transformador(43, parsear_fechas=True)
+
+    # El transformador compilado debe producir exactamente lo mismo que la implementación anterior
+    assert transformador.transformar(registros) == transformar_anterior(registros)
+
+    casos = [
+        ("anterior", lambda: transformar_anterior(registros)),
+        ("compilado", lambda: transformador.transformar(registros)),
+        ("compilado + fechas", lambda: transformador_fechas.transformar(registros)),
+        ("columnar", lambda: transformador.columnar(registros)),
+        ("columnar + fechas", lambda: transformador_fechas.columnar(registros)),
+    ]
+    base = None
+    print(f"{args.registros} registros, mejor de {args.repeticiones} repeticiones")
+    for nombre, funcion in casos:
+        segundos = min(timeit.repeat(funcion, number=1, repeat=args.repeticiones))
+        base = base or segundos
+        print(f"  {nombre:<20} {segundos * 1000:9.2f} ms  {segundos / args.registros * 1e6:7.2f} µs/registro  x{base / segundos:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Servidor falso de la API REST de Rukovoditel para benchmarks y pruebas manuales sin tocar producción.
+
+Es una aplicación ASGI que genera licencias sintéticas de la entidad 43 (con la misma forma que
+devuelve Rukovoditel) y responde `action=select` con filtros, `select_fields` y `limit` en formato
+"offset,cantidad", con una latencia configurable y, opcionalmente, una fracción de respuestas 429.
+Se puede servir por HTTP con uvicorn o usar en el mismo proceso con `httpx.ASGITransport`.
+
+Uso:
+    python benchmarks/servidor_falso.py [--registros 5000] [--latencia-ms 50] [--puerto 8765]
+
+y luego, por ejemplo:
+    RUKOVODITEL_API_URL=http://127.0.0.1:8765/api/rest.php python test_consulta_licencias.py
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+from typing import Optional, Dict, Any, Tuple
+from urllib.parse import parse_qsl
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from bench_transformar import generar_registros
+from mi_agente_ai.utils.fechas import parsear_fecha
+
+# Campos de sistema que Rukovoditel devuelve siempre, aunque no estén en `select_fields`
+CAMPOS_SISTEMA = ["id", "date_added", "date_updated", "created_by", "parent_item_id"]
+
+
+def _filtros(params: Dict[str, str]) -> Dict[str, str]:
+    """Extrae `filters[campo]=valor` del formulario aplanado"""
+    return {clave[len("filters["):-1]: valor for clave, valor in params.items()
+            if clave.startswith("filters[") and clave.endswith("]")}
+
+
+def _rango(valor: str) -> Tuple[Optional[Any], Optional[Any]]:
+    desde, _, hasta = valor.partition(",")
+    return parsear_fecha(desde.strip()) if desde.strip() else None, parsear_fecha(hasta.strip()) if hasta.strip() else None
+
+
+def _coincide(registro: Dict[str, Any], campo: str, valor: str) -> bool:
+    actual = str(registro.get(campo, ""))
+    if "," in valor and campo in ("651", "665", "653", "date_added", "date_updated"):
+        # Rango de fechas "desde,hasta" (cualquiera de los extremos puede faltar)
+        fecha = parsear_fecha(actual)
+        desde, hasta = _rango(valor)
+        return fecha is not None and (desde is None or fecha >= desde) and (hasta is None or fecha <= hasta)
+    # Texto: coincidencia parcial sin distinguir mayúsculas, como el filtro LIKE de Rukovoditel
+    return valor.lower() in actual.lower()
+
+
+class RukovoditelFalso:
+    """Aplicación ASGI que imita `api/rest.php` de Rukovoditel"""
+
+    def __init__(self, registros: int = 5000, latencia_ms: float = 50, jitter_ms: float = 10,
+                 tasa_429: float = 0.0, semilla: int = 0):
+        self.registros = generar_registros(registros, semilla)
+        self.latencia_ms = latencia_ms
+        self.jitter_ms = jitter_ms
+        self.tasa_429 = tasa_429
+        self._azar = random.Random(semilla)
+        self.peticiones = 0
+        self.en_curso = 0
+        self.max_en_curso = 0
+
+    def responder(self, params: Dict[str, str]) -> Dict[str, Any]:
+        if not (params.get("key") and params.get("username") and params.get("password")):
+            return {"status": "error", "error": "Faltan credenciales"}
+        if params.get("action") != "select":
+            return {"status": "error", "error": f"Acción no soportada: {params.get('action')}"}
+        if params.get("entity_id") != "43":
+            return {"status": "success", "data": []}
+
+        filtros = _filtros(params)
+        coincidencias = [r for r in self.registros if all(_coincide(r, c, v) for c, v in filtros.items())]
+
+        limite = params.get("limit", "")
+        if "," in limite:
+            desde, cantidad = (int(parte) for parte in limite.split(",", 1))
+        else:
+            desde, cantidad = 0, int(limite) if limite else len(coincidencias)
+        pagina = coincidencias[desde:desde + cantidad]
+
+        campos = [c.strip() for c in params.get("select_fields", "").split(",") if c.strip()]
+        if campos:
+            visibles = CAMPOS_SISTEMA + campos
+            pagina = [{campo: registro[campo] for campo in visibles if campo in registro} for registro in pagina]
+        return {"status": "success", "data": pagina}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                mensaje = await receive()
+                if mensaje["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif mensaje["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+
+        cuerpo = b""
+        while True:
+            mensaje = await receive()
+            cuerpo += mensaje.get("body", b"")
+            if not mensaje.get("more_body"):
+                break
+
+        self.peticiones += 1
+        self.en_curso += 1
+        self.max_en_curso = max(self.max_en_curso, self.en_curso)
+        try:
+            await asyncio.sleep(max(0.0, self.latencia_ms + self._azar.uniform(-self.jitter_ms, self.jitter_ms)) / 1000)
+            if self.tasa_429 and self._azar.random() < self.tasa_429:
+                estado, encabezados, contenido = 429, [(b"retry-after", b"1")], b'{"status":"error","error":"Too Many Requests"}'
+            else:
+                params = dict(parse_qsl(cuerpo.decode("utf-8"), keep_blank_values=True))
+                estado, encabezados = 200, []
+                contenido = json.dumps(self.responder(params), ensure_ascii=False).encode("utf-8")
+        finally:
+            self.en_curso -= 1
+
+        await send({
+            "type": "http.response.start",
+            "status": estado,
+            "headers": [(b"content-type", b"application/json"), *encabezados],
+        })
+        await send({"type": "http.response.body", "body": contenido})
+
+    def estadisticas(self) -> Dict[str, int]:
+        return {"peticiones": self.peticiones, "max_en_curso": self.max_en_curso}
+
+
+class ServidorHTTP:
+    """Sirve la aplicación con uvicorn en un hilo aparte, en un puerto libre de 127.0.0.1"""
+
+    def __init__(self, app, puerto: int = 0):
+        import uvicorn
+
+        self.config = uvicorn.Config(app, host="127.0.0.1", port=puerto, log_level="warning",
+                                     lifespan="off", backlog=4096, limit_concurrency=None)
+        self.servidor = uvicorn.Server(self.config)
+        self._hilo: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        puerto = self.servidor.servers[0].sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{puerto}/api/rest.php"
+
+    def __enter__(self) -> "ServidorHTTP":
+        self._hilo = threading.Thread(target=self.servidor.run, name="rukovoditel-falso", daemon=True)
+        self._hilo.start()
+        while not self.servidor.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *_):
+        self.servidor.should_exit = True
+        self._hilo.join(timeout=5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--registros", type=int, default=5000)
+    parser.add_argument("--latencia-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=10)
+    parser.add_argument("--tasa-429", type=float, default=0.0, help="Fracción de respuestas 429 (0 a 1)")
+    parser.add_argument("--puerto", type=int, default=8765)
+    args = parser.parse_args()
+
+    app = RukovoditelFalso(args.registros, args.latencia_ms, args.jitter_ms, args.tasa_429)
+    with ServidorHTTP(app, args.puerto) as servidor:
+        print(f"Rukovoditel falso con {args.registros} licencias en {servidor.url} (Ctrl+C para terminar)")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
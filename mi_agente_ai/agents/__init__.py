@@ -1,4 +1,6 @@
 # Archivo de inicialización para el paquete agents
 from mi_agente_ai.agents.base_agent import Agent
+from mi_agente_ai.agents.enrutador import EnrutadorIntenciones
+from mi_agente_ai.agents.memoria import MemoriaConversacion, AlmacenSesiones
 
-__all__ = ["Agent"] 
\ No newline at end of file
+__all__ = ["Agent", "EnrutadorIntenciones", "MemoriaConversacion", "AlmacenSesiones"]
\ No newline at end of file
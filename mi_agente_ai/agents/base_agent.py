@@ -1,10 +1,179 @@
 from pydantic_ai import Agent as PydanticAgent
+from pydantic_ai.models.groq import GroqModel
+from pydantic_ai.models.wrapper import WrapperModel
+from pydantic_ai.providers.groq import GroqProvider
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from pydantic_ai.messages import (
+    PartStartEvent, PartDeltaEvent, ToolCallPart, ToolCallPartDelta, ToolReturnPart,
+    FunctionToolCallEvent, FunctionToolResultEvent
+)
+from pydantic_core import from_json
+from contextlib import asynccontextmanager
+from typing import List, Optional, Dict, Any, AsyncIterator, Iterator
 import os
 import json
+import time
+import queue
+import asyncio
+import weakref
+import httpx
+from groq import AsyncGroq
 
 from mi_agente_ai.tools.consulta_licencias_encargados import ConsultaLicenciasEncargadosInput, ConsultaLicenciasEncargadosOutput, consulta_licencias_encargados
+from mi_agente_ai.tools.consulta_licencias_lote import consulta_licencias_lote
+from mi_agente_ai.tools.indice_licencias import consulta_licencias_por_fecha
+from mi_agente_ai.tools.analisis_licencias import analisis_licencias
+from mi_agente_ai.tools.indice_empleados import buscar_empleado, indice_empleados_cargado
+from mi_agente_ai.tools.prebusqueda import prebuscar
+from mi_agente_ai.tools.ver_pagina_resultado import ver_pagina_resultado
+from mi_agente_ai.tools.fabrica import herramientas_entidades
+from mi_agente_ai.utils.serializacion import salida_compacta, resultado_completo
+from mi_agente_ai.services.sincronizacion import obtener_sincronizador
+from mi_agente_ai.services.cache_respuestas import obtener_cache_respuestas, version_datos, ttl_maximo_respuestas
+from mi_agente_ai.services.control_flujo import CircuitoAbierto, TransporteControladoAsync, obtener_control
+from mi_agente_ai.utils.loop import ejecutar_en_loop, loop_compartido
+from mi_agente_ai.utils.trazas import Span, span, span_actual, trazador, trazado, registrar_uso
+from mi_agente_ai.models.schema import StreamEvent, ResultadoHerramienta
+from mi_agente_ai.agents.enrutador import EnrutadorIntenciones
+from mi_agente_ai.agents.memoria import AlmacenSesiones, MemoriaConversacion
+
+# Segundos máximos para responder una consulta
+TIMEOUT_AGENTE = float(os.getenv("AGENTE_TIMEOUT", "60"))
+
+MENSAJE_TIMEOUT = (
+    "Lo siento, la consulta ha tomado demasiado tiempo en procesarse. Por favor, intenta con una pregunta "
+    "más específica sobre licencias de encargados o consorcios administrados."
+)
+
+MENSAJE_SATURADO = (
+    "Lo siento, en este momento hay demasiadas consultas en curso y el servicio está limitando las peticiones. "
+    "Por favor, intenta nuevamente en unos segundos."
+)
+
+# Herramienta con la que pydantic-ai recibe la respuesta estructurada; no es una herramienta de datos
+HERRAMIENTA_RESULTADO = "final_result"
+
+
+def _cliente_groq() -> AsyncGroq:
+    """Cliente de Groq cuyas peticiones pasan por el control de flujo compartido, sin reintentos propios"""
+    transporte = TransporteControladoAsync(obtener_control("groq"), httpx.AsyncHTTPTransport())
+    return AsyncGroq(
+        api_key=os.getenv("GROQ_API_KEY"),
+        http_client=httpx.AsyncClient(transport=transporte),
+        max_retries=0,
+    )
+
+
+class ModeloGroq(GroqModel):
+    """
+    Modelo de Groq con un cliente HTTP por event loop. El agente corre tanto en el loop de uvicorn
+    como en el loop compartido de las llamadas síncronas, y las conexiones de un `httpx.AsyncClient`
+    no se pueden usar desde otro loop. El control de flujo sigue siendo uno solo para todos.
+    """
+
+    def __init__(self, nombre: str):
+        self._clientes: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncGroq]" = weakref.WeakKeyDictionary()
+        super().__init__(nombre, provider=GroqProvider(groq_client=_cliente_groq()))
+
+    @property
+    def client(self) -> AsyncGroq:
+        """Cliente para el event loop en ejecución (fuera de un loop, el creado con el modelo)"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return self._cliente_inicial
+        cliente = self._clientes.get(loop)
+        if cliente is None:
+            cliente = self._clientes[loop] = _cliente_groq()
+        return cliente
+
+    @client.setter
+    def client(self, cliente: AsyncGroq):
+        self._cliente_inicial = cliente
+
+
+def modelo_groq(nombre: str = "llama-3.3-70b-versatile") -> GroqModel:
+    """
+    Modelo de Groq cuyas peticiones pasan por el control de flujo compartido: limitador de tasa,
+    concurrencia adaptativa, reintentos que respetan Retry-After y circuito interruptor.
+    Los reintentos propios del SDK se desactivan para no multiplicarlos.
+    """
+    return ModeloGroq(nombre)
+
+
+class ModeloTrazado(WrapperModel):
+    """Modelo que registra cada petición al LLM como un span, con su uso de tokens"""
+
+    def _atributos(self, mensajes) -> Dict[str, Any]:
+        return {"gen_ai.system": self.system, "gen_ai.request.model": self.model_name, "mensajes": len(mensajes)}
+
+    async def request(self, messages, model_settings, model_request_parameters):
+        with span("modelo.request", **self._atributos(messages)) as actual:
+            respuesta, uso = await self.wrapped.request(messages, model_settings, model_request_parameters)
+            registrar_uso(actual, uso)
+            return respuesta, uso
+
+    @asynccontextmanager
+    async def request_stream(self, messages, model_settings, model_request_parameters):
+        with span("modelo.request_stream", **self._atributos(messages)) as actual:
+            async with self.wrapped.request_stream(messages, model_settings, model_request_parameters) as respuesta:
+                yield respuesta
+            registrar_uso(actual, respuesta.usage())
+
+
+def _registrar_ejecucion(traza: Span, result):
+    """Uso de tokens y llamadas a herramientas de una ejecución completa del agente"""
+    registrar_uso(traza, result.usage())
+    llamadas = [
+        parte for mensaje in result.new_messages() for parte in mensaje.parts
+        if isinstance(parte, ToolCallPart) and parte.tool_name != HERRAMIENTA_RESULTADO
+    ]
+    traza.atributo("herramientas.llamadas", len(llamadas))
+
+
+def _registrar_prebusqueda(traza: Span, prebusqueda):
+    """Consultas adelantadas durante la ejecución y cuántas usó el modelo"""
+    if prebusqueda is None:
+        return
+    traza.atributo("prebusqueda.lanzadas", prebusqueda.lanzadas)
+    traza.atributo("prebusqueda.aciertos", prebusqueda.aciertos)
+    traza.atributo("prebusqueda.ahorro_ms", round(prebusqueda.ahorro_ms, 2))
+
+
+def resultados_herramientas(mensajes) -> List[ResultadoHerramienta]:
+    """
+    Valores que devolvieron las herramientas en los mensajes de una ejecución, en orden.
+    Las salidas compactadas para el LLM se devuelven con todos sus registros (ver `resultado_completo`),
+    en una copia para no cambiar lo que queda en el historial de la conversación.
+    """
+    resultados = []
+    for mensaje in mensajes:
+        for parte in mensaje.parts:
+            if not isinstance(parte, ToolReturnPart) or parte.tool_name == HERRAMIENTA_RESULTADO:
+                continue
+            datos = parte.content
+            if isinstance(datos, BaseModel) and isinstance(getattr(datos, "resultado", None), dict):
+                datos = datos.model_copy(update={"resultado": resultado_completo(datos.resultado)})
+            resultados.append(ResultadoHerramienta(herramienta=parte.tool_name, datos=datos))
+    return resultados
+
+
+def resultado_para_ui(resultado: ResultadoHerramienta) -> str:
+    """JSON con `registros` y `metadata` en el nivel superior, el formato que muestran la UI y la API"""
+    datos = resultado.datos.model_dump(mode="json") if isinstance(resultado.datos, BaseModel) else resultado.datos
+    if isinstance(datos, dict) and isinstance(datos.get("resultado"), dict):
+        datos = {**datos["resultado"], "metadata": datos.get("metadata", {})}
+    return json.dumps(datos, ensure_ascii=False, default=str)
+
+
+def mensaje_error(error: BaseException) -> str:
+    """Mensaje para el usuario según el error: saturación o circuito abierto, o el error genérico"""
+    actual: Optional[BaseException] = error
+    while actual is not None:
+        if isinstance(actual, CircuitoAbierto) or getattr(actual, "status_code", None) == 429:
+            return MENSAJE_SATURADO
+        actual = actual.__cause__ or actual.__context__
+    return f"Lo siento, ocurrió un error: {str(error)}"
 
 class Agent:
     """Agente básico usando Pydantic AI con Groq"""
@@ -12,84 +181,401 @@ class Agent:
     def __init__(self):
         """Inicializa el agente de Pydantic AI"""
         
-        # Creamos el modelo de salida usando Pydantic
+        # Iniciar la sincronización del espejo local de licencias (si está configurada)
+        obtener_sincronizador()
+        
+        # Respuestas rápidas para las preguntas frecuentes, sin pasar por el LLM
+        self.enrutador = EnrutadorIntenciones()
+        
+        # Historial acotado de cada conversación, por identificador de sesión
+        self.sesiones = AlmacenSesiones()
+        
+        # Creamos el modelo de salida usando Pydantic. Solo lleva el texto de la respuesta: los resultados
+        # de las herramientas se toman del historial de la ejecución, sin que el modelo los repita
         class AgentOutput(BaseModel):
             response: str = Field(..., description="La respuesta generada para el usuario")
-            tool_used: Optional[bool] = Field(False, description="Si se utilizó alguna herramienta")
-            tool_result: Optional[str] = Field(None, description="El resultado de la herramienta si se utilizó")
+        
+        # Herramientas generadas para las otras entidades configuradas (consorcios, expensas, proveedores...)
+        herramientas_extra = herramientas_entidades()
+        prompt_entidades = ""
+        if herramientas_extra:
+            prompt_entidades = (
+                "Además de las licencias, puedes consultar estas entidades con su herramienta: "
+                + ", ".join(f"{h.name.removeprefix('consulta_')} ({h.name})" for h in herramientas_extra)
+                + ". Filtra y elige campos por su nombre; si un nombre no existe, la herramienta te indica los disponibles. "
+            )
+        
+        # Instrucciones del agente (se guardan para reenviarlas junto con el historial de cada sesión)
+        self.system_prompt = (
+            "Eres Carlos Zapier, un empleado de Administración Anastópulos encargado de responder cualquier consulta "
+            "sobre los consorcios que Administración Anastópulos administra. Siempre respondes en español de manera cordial y profesional. "
+            "Tu trabajo es ayudar a los clientes con información precisa sobre licencias y permisos de encargados. "
+            "Cuando necesitas consultar datos sobre licencias y permisos, utilizas la herramienta de consulta_licencias_encargados. "
+            "Esta herramienta te permite consultar registros de la entidad 43 (Pasantías) donde puedes ver información como fechas de inicio, "
+            "finalización y reincorporación, así como nombres de empleados. "
+            "Para filtrar por empleado, por rango de fechas o por el valor de un campo usa el parámetro `filtro` "
+            "de la herramienta en lugar de armar `filters` a mano. "
+            "Si necesitas varias consultas a la vez (por ejemplo, las licencias de varios empleados o de varios meses), "
+            "hazlas en una sola llamada a consulta_licencias_lote en lugar de llamar a la herramienta varias veces. "
+            "Para preguntas sobre fechas (quién estuvo de licencia en un día o en un mes, cuándo se reincorporó alguien, "
+            "qué licencias tuvo un empleado) utiliza la herramienta consulta_licencias_por_fecha, que responde desde un "
+            "índice local y devuelve solo las licencias que coinciden. "
+            "Para preguntas que requieren contar o sumar (cuántos días de licencia tuvo cada encargado, qué meses tienen "
+            "más licencias, qué licencias se superpusieron, cuánto duran las licencias) utiliza analisis_licencias, que "
+            "calcula los totales localmente sobre todas las licencias; usa sus números tal cual en lugar de sumar registros. "
+            "Los nombres del campo Empleado (912) están escritos como \"APELLIDO, Nombre\"; si no conoces el nombre exacto "
+            "de una persona, resuélvelo primero con buscar_empleado y usa el candidato devuelto en `filtro.campos`. "
+            "Los resultados de las herramientas llegan como tabla (`columnas` una sola vez y `filas` como arreglos). "
+            "Si un resultado es muy grande llega resumido con un `handle`: responde con el resumen y, solo si necesitas "
+            "más filas, pídelas con ver_pagina_resultado. "
+            + prompt_entidades +
+            "\n\nIMPORTANTE: Si te preguntan sobre información que no está relacionada con licencias de encargados o consorcios, "
+            "debes indicar amablemente que no puedes ayudar con esa consulta específica ya que tu función se limita a "
+            "brindar información sobre licencias y permisos de encargados de los consorcios administrados por Administración Anastópulos. "
+            "No inventes ni improvises respuestas sobre temas fuera de tu área de competencia. Simplemente indícale al usuario que "
+            "para ese tipo de consultas debería contactar a otro departamento o servicio apropiado. "
+            "\n\nTambién, si te solicitan información sobre consorcios específicos pero no puedes encontrarla con tus herramientas, "
+            "debes ser honesto e indicar que no tienes acceso a esa información en este momento, y sugerir que contacte "
+            "directamente a la administración para obtener datos más precisos. Siempre trata de ser útil y directo en tus respuestas."
+        )
         
         # Configuramos e inicializamos el agente de Pydantic AI
         self.agent = PydanticAgent(
-            model="groq:llama-3.3-70b-versatile",  # Modelo Llama 3.3 70B Versatile
+            model=ModeloTrazado(modelo_groq("llama-3.3-70b-versatile")),  # Modelo Llama 3.3 70B Versatile
             result_type=AgentOutput,
-            system_prompt=(
-                "Eres Carlos Zapier, un empleado de Administración Anastópulos encargado de responder cualquier consulta "
-                "sobre los consorcios que Administración Anastópulos administra. Siempre respondes en español de manera cordial y profesional. "
-                "Tu trabajo es ayudar a los clientes con información precisa sobre licencias y permisos de encargados. "
-                "Cuando necesitas consultar datos sobre licencias y permisos, utilizas la herramienta de consulta_licencias_encargados. "
-                "Esta herramienta te permite consultar registros de la entidad 43 (Pasantías) donde puedes ver información como fechas de inicio, "
-                "finalización y reincorporación, así como nombres de empleados. "
-                "\n\nIMPORTANTE: Si te preguntan sobre información que no está relacionada con licencias de encargados o consorcios, "
-                "debes indicar amablemente que no puedes ayudar con esa consulta específica ya que tu función se limita a "
-                "brindar información sobre licencias y permisos de encargados de los consorcios administrados por Administración Anastópulos. "
-                "No inventes ni improvises respuestas sobre temas fuera de tu área de competencia. Simplemente indícale al usuario que "
-                "para ese tipo de consultas debería contactar a otro departamento o servicio apropiado. "
-                "\n\nTambién, si te solicitan información sobre consorcios específicos pero no puedes encontrarla con tus herramientas, "
-                "debes ser honesto e indicar que no tienes acceso a esa información en este momento, y sugerir que contacte "
-                "directamente a la administración para obtener datos más precisos. Siempre trata de ser útil y directo en tus respuestas."
-            ),
-            tools=[consulta_licencias_encargados],
+            system_prompt=self.system_prompt,
+            tools=[
+                trazado(salida_compacta(consulta_licencias_encargados)),
+                trazado(salida_compacta(consulta_licencias_lote)),
+                trazado(salida_compacta(consulta_licencias_por_fecha)),
+                trazado(salida_compacta(analisis_licencias)),
+                trazado(buscar_empleado),
+                trazado(ver_pagina_resultado),
+                *herramientas_extra,
+            ],
             model_settings={"temperature": 1.0}  # Temperatura ajustada a 1 usando model_settings
         )
     
-    def run(self, prompt: str):
+    @staticmethod
+    def _construir_respuesta(result) -> type:
+        """
+        Convierte el resultado de Pydantic AI en el objeto de respuesta que espera la UI.
+        `tool_results` tiene los valores que devolvieron las herramientas en esta ejecución y
+        `tool_result` el último de ellos en JSON, como lo muestran la UI y la API.
+        """
+        resultados = resultados_herramientas(result.new_messages())
+        return type('AgentResponse', (), {
+            "response": result.data.response if hasattr(result.data, 'response') else str(result.data),
+            "tool_used": bool(resultados),
+            "tool_result": resultado_para_ui(resultados[-1]) if resultados else None,
+            "tool_results": resultados
+        })
+    
+    @staticmethod
+    def _respuesta_simple(mensaje: str) -> type:
+        """Respuesta sin resultado de herramienta (errores, timeouts)"""
+        return type('AgentResponse', (), {
+            "response": mensaje,
+            "tool_used": False,
+            "tool_result": None,
+            "tool_results": []
+        })
+    
+    @staticmethod
+    def _buscar_en_cache(prompt: str):
+        """
+        Busca en el cache de respuestas una pregunta igual o parecida hecha con la misma versión de los datos
+        
+        Returns:
+            Tupla (respuesta o None, versión de los datos)
+        """
+        cache = obtener_cache_respuestas()
+        if not cache.activo:
+            return None, None
+        version = version_datos()
+        encontrada = cache.obtener(prompt, version)
+        if encontrada is None:
+            return None, version
+        return type('AgentResponse', (), encontrada[0]), version
+    
+    @staticmethod
+    def _guardar_en_cache(prompt: str, respuesta, version, duracion: float):
+        cache = obtener_cache_respuestas()
+        if cache.activo:
+            cache.guardar(prompt, {
+                "response": respuesta.response,
+                "tool_used": respuesta.tool_used,
+                "tool_result": respuesta.tool_result,
+                "tool_results": respuesta.tool_results
+            }, version, duracion, ttl_maximo_respuestas())
+    
+    def _memoria(self, sesion: Optional[str]) -> Optional[MemoriaConversacion]:
+        return self.sesiones.obtener(sesion) if sesion else None
+    
+    def _historial(self, memoria: Optional[MemoriaConversacion]):
+        """Historial a enviar al modelo, o None si la conversación recién empieza"""
+        if memoria is None or memoria.vacia:
+            return None
+        return memoria.historial(self.system_prompt)
+    
+    def olvidar(self, sesion: str):
+        """Descarta el historial de una sesión (por ejemplo al borrar la conversación en la UI)"""
+        self.sesiones.olvidar(sesion)
+    
+    async def arun(self, prompt: str, timeout: float = TIMEOUT_AGENTE, sesion: Optional[str] = None):
         """
-        Ejecuta el agente con la consulta del usuario
+        Ejecuta el agente con la consulta del usuario dentro del event loop actual
         
         Args:
             prompt: La consulta del usuario
+            timeout: Segundos máximos de espera; al vencer se cancelan las llamadas en curso a Groq y Rukovoditel
+            sesion: Identificador de la conversación; si se indica, el modelo recibe el historial acotado de la sesión
             
         Returns:
             La respuesta generada y posibles resultados de herramientas
         """
+        with span("agente.run", sesion=sesion is not None) as traza:
+            return await self._arun(prompt, timeout, sesion, traza)
+    
+    async def _arun(self, prompt: str, timeout: float, sesion: Optional[str], traza: Span):
+        memoria = self._memoria(sesion)
+        historial = self._historial(memoria)
+        
+        # Las preguntas de seguimiento dependen del historial, así que no se comparten por el cache de respuestas
+        version = None
+        if historial is None:
+            cacheada, version = self._buscar_en_cache(prompt)
+            if cacheada is not None:
+                traza.atributo("origen", "cache")
+                if memoria is not None:
+                    memoria.agregar(prompt, cacheada.response)
+                return cacheada
+        
+        directa = await self.enrutador.responder(prompt)
+        if directa is not None:
+            traza.atributo("origen", "enrutador")
+            if memoria is not None:
+                memoria.agregar(prompt, directa["response"])
+            return type('AgentResponse', (), directa)
+        
+        traza.atributo("origen", "llm")
         try:
-            # Llamar al agente de Pydantic AI con un timeout
-            result = self.agent.run_sync(prompt, timeout=60)  # Timeout de 60 segundos
-            
-            # Crear un objeto con la estructura esperada por la UI
-            result_dict = {
-                "response": result.data.response if hasattr(result.data, 'response') else str(result.data),
-                "tool_used": False,
-                "tool_result": None
-            }
-            
-            # Procesar el resultado de la herramienta si existe
-            if hasattr(result.data, 'tool_used') and result.data.tool_used and hasattr(result.data, 'tool_result'):
-                result_dict["tool_used"] = True
-                
-                # Si el resultado de la herramienta es un objeto, convertirlo a JSON
-                if isinstance(result.data.tool_result, dict):
-                    # Ya es un diccionario
-                    tool_result = result.data.tool_result
-                else:
-                    # Intenta convertir a diccionario si es una cadena
-                    try:
-                        tool_result = json.loads(result.data.tool_result)
-                    except:
-                        # Si no es JSON, mantenerlo como está
-                        tool_result = {"result": str(result.data.tool_result)}
-                
-                # Convertir el resultado a formato JSON para la UI
-                result_dict["tool_result"] = json.dumps(tool_result, ensure_ascii=False)
-            
-            # Devolver el resultado en el formato esperado
-            return type('AgentResponse', (), result_dict)
+            # Llamar al agente de Pydantic AI con un timeout que cancela la tarea completa
+            inicio = time.perf_counter()
+            with self._prebuscar(prompt) as prebusqueda:
+                result = await asyncio.wait_for(self.agent.run(prompt, message_history=historial), timeout)
+            _registrar_prebusqueda(traza, prebusqueda)
+            _registrar_ejecucion(traza, result)
+            respuesta = self._construir_respuesta(result)
+            if historial is None:
+                self._guardar_en_cache(prompt, respuesta, version, time.perf_counter() - inicio)
+            if memoria is not None:
+                memoria.agregar(prompt, respuesta.response, result.new_messages())
+            return respuesta
+        except asyncio.TimeoutError as e:
+            traza.marcar_error(e)
+            return self._respuesta_simple(MENSAJE_TIMEOUT)
         except Exception as e:
             # En caso de error, devolver una respuesta genérica
             print(f"Error al procesar la solicitud: {str(e)}")
-            error_response = {
-                "response": f"Lo siento, ocurrió un error: {str(e)}",
-                "tool_used": False,
-                "tool_result": None
-            }
-            return type('AgentResponse', (), error_response) 
\ No newline at end of file
+            traza.marcar_error(e)
+            return self._respuesta_simple(mensaje_error(e))
+    
+    def run(self, prompt: str, timeout: float = TIMEOUT_AGENTE, sesion: Optional[str] = None):
+        """
+        Ejecuta el agente con la consulta del usuario desde código síncrono (CLI, Streamlit).
+        La consulta corre en el event loop compartido del proceso.
+        
+        Args:
+            prompt: La consulta del usuario
+            timeout: Segundos máximos de espera
+            sesion: Identificador de la conversación
+            
+        Returns:
+            La respuesta generada y posibles resultados de herramientas
+        """
+        return ejecutar_en_loop(self.arun(prompt, timeout, sesion))
+    
+    async def _producir_eventos(self, prompt: str, cola: asyncio.Queue, historial=None,
+                                memoria: Optional[MemoriaConversacion] = None, traza: Optional[Span] = None):
+        """Ejecuta el agente nodo por nodo y publica en la cola los eventos de texto y de herramientas"""
+        if traza is not None:
+            with trazador.activo(traza):
+                return await self._producir_eventos(prompt, cola, historial, memoria)
+        with self._prebuscar(prompt) as prebusqueda:
+            await self._iterar_agente(prompt, cola, historial, memoria)
+        if span_actual() is not None:
+            _registrar_prebusqueda(span_actual(), prebusqueda)
+
+    @staticmethod
+    def _prebuscar(prompt: str):
+        """Consultas de licencias que se adelantan mientras el modelo decide qué herramienta usar"""
+        return prebuscar(prompt, consulta_licencias_encargados, ConsultaLicenciasEncargadosInput, indice_empleados_cargado())
+
+    async def _iterar_agente(self, prompt: str, cola: asyncio.Queue, historial=None,
+                             memoria: Optional[MemoriaConversacion] = None):
+        async with self.agent.iter(prompt, message_history=historial) as run:
+            async for node in run:
+                if PydanticAgent.is_model_request_node(node):
+                    # La respuesta llega como argumentos JSON de la herramienta de resultado; se parsean
+                    # de forma parcial para emitir el texto de `response` a medida que se genera
+                    argumentos: Dict[int, str] = {}
+                    emitido = 0
+                    async with node.stream(run.ctx) as eventos:
+                        async for evento in eventos:
+                            if isinstance(evento, PartStartEvent) and isinstance(evento.part, ToolCallPart):
+                                argumentos[evento.index] = evento.part.args_as_json_str() if evento.part.args else ""
+                            elif isinstance(evento, PartDeltaEvent) and isinstance(evento.delta, ToolCallPartDelta):
+                                if isinstance(evento.delta.args_delta, str):
+                                    argumentos[evento.index] = argumentos.get(evento.index, "") + evento.delta.args_delta
+                            else:
+                                continue
+                            texto = self._response_parcial(argumentos.get(evento.index, ""))
+                            if len(texto) > emitido:
+                                await cola.put(StreamEvent(tipo="texto", texto=texto[emitido:]))
+                                emitido = len(texto)
+                elif PydanticAgent.is_call_tools_node(node):
+                    async with node.stream(run.ctx) as eventos:
+                        async for evento in eventos:
+                            if isinstance(evento, FunctionToolCallEvent):
+                                await cola.put(StreamEvent(
+                                    tipo="herramienta_llamada",
+                                    herramienta=evento.part.tool_name,
+                                    datos=evento.part.args_as_dict()
+                                ))
+                            elif isinstance(evento, FunctionToolResultEvent):
+                                contenido = evento.result.content
+                                await cola.put(StreamEvent(
+                                    tipo="herramienta_resultado",
+                                    herramienta=evento.result.tool_name,
+                                    datos=contenido.model_dump(mode="json") if isinstance(contenido, BaseModel) else contenido
+                                ))
+            respuesta = self._construir_respuesta(run.result)
+            if span_actual() is not None:
+                _registrar_ejecucion(span_actual(), run.result)
+            if memoria is not None:
+                memoria.agregar(prompt, respuesta.response, run.result.new_messages())
+            await cola.put(StreamEvent(tipo="final", datos=respuesta))
+    
+    @staticmethod
+    def _response_parcial(argumentos: str) -> str:
+        """Extrae el valor (posiblemente incompleto) de `response` de un JSON parcial"""
+        if not argumentos:
+            return ""
+        try:
+            datos = from_json(argumentos, allow_partial="trailing-strings")
+        except ValueError:
+            return ""
+        respuesta = datos.get("response") if isinstance(datos, dict) else None
+        return respuesta if isinstance(respuesta, str) else ""
+    
+    async def astream(self, prompt: str, timeout: float = TIMEOUT_AGENTE,
+                      sesion: Optional[str] = None) -> AsyncIterator[StreamEvent]:
+        """
+        Ejecuta el agente en modo streaming
+        
+        Args:
+            prompt: La consulta del usuario
+            timeout: Segundos máximos para toda la respuesta
+            sesion: Identificador de la conversación
+            
+        Yields:
+            StreamEvent: fragmentos de texto de la respuesta, llamadas y resultados de herramientas,
+            y un evento "final" cuyo `datos` es la misma respuesta que devuelve `run`
+        """
+        # El span se inicia sin volverlo actual: un generador asíncrono puede reanudarse en otro contexto
+        traza = trazador.iniciar("agente.stream", sesion=sesion is not None)
+        try:
+            async for evento in self._astream(prompt, timeout, sesion, traza):
+                if evento.tipo == "texto" and "primer_texto_ms" not in traza.atributos:
+                    traza.atributo("primer_texto_ms", round(traza.duracion_ms, 1))
+                yield evento
+        finally:
+            trazador.terminar(traza)
+    
+    async def _astream(self, prompt: str, timeout: float, sesion: Optional[str], traza: Span) -> AsyncIterator[StreamEvent]:
+        memoria = self._memoria(sesion)
+        historial = self._historial(memoria)
+        
+        version = None
+        if historial is None:
+            cacheada, version = self._buscar_en_cache(prompt)
+            if cacheada is not None:
+                traza.atributo("origen", "cache")
+                if memoria is not None:
+                    memoria.agregar(prompt, cacheada.response)
+                yield StreamEvent(tipo="texto", texto=cacheada.response)
+                yield StreamEvent(tipo="final", datos=cacheada)
+                return
+        
+        directa = await self.enrutador.responder(prompt)
+        if directa is not None:
+            traza.atributo("origen", "enrutador")
+            if memoria is not None:
+                memoria.agregar(prompt, directa["response"])
+            respuesta = type('AgentResponse', (), directa)
+            yield StreamEvent(tipo="texto", texto=respuesta.response)
+            yield StreamEvent(tipo="final", datos=respuesta)
+            return
+        
+        traza.atributo("origen", "llm")
+        cola: asyncio.Queue = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        inicio = loop.time()
+        limite = inicio + timeout
+        productor = asyncio.ensure_future(self._producir_eventos(prompt, cola, historial, memoria, traza))
+        try:
+            while True:
+                restante = limite - loop.time()
+                obtener = asyncio.ensure_future(cola.get())
+                terminados, _ = await asyncio.wait({obtener, productor}, timeout=max(0, restante),
+                                                  return_when=asyncio.FIRST_COMPLETED)
+                if obtener in terminados:
+                    evento = obtener.result()
+                    if evento.tipo == "final" and historial is None:
+                        self._guardar_en_cache(prompt, evento.datos, version, loop.time() - inicio)
+                    yield evento
+                    if evento.tipo == "final":
+                        return
+                    continue
+                obtener.cancel()
+                if productor in terminados:
+                    # El productor terminó sin evento final: propagar su error
+                    error = productor.exception()
+                    print(f"Error al procesar la solicitud: {str(error)}")
+                    traza.marcar_error(error)
+                    yield StreamEvent(tipo="final", datos=self._respuesta_simple(mensaje_error(error)))
+                    return
+                # Se agotó el tiempo
+                traza.marcar_error(asyncio.TimeoutError())
+                yield StreamEvent(tipo="final", datos=self._respuesta_simple(MENSAJE_TIMEOUT))
+                return
+        finally:
+            productor.cancel()
+    
+    def stream(self, prompt: str, timeout: float = TIMEOUT_AGENTE, sesion: Optional[str] = None) -> Iterator[StreamEvent]:
+        """
+        Versión síncrona de `astream` para la CLI y Streamlit: la generación corre en el
+        event loop compartido y los eventos se entregan a medida que llegan.
+        """
+        cola: "queue.Queue[Optional[StreamEvent]]" = queue.Queue()
+        
+        async def producir():
+            try:
+                async for evento in self.astream(prompt, timeout, sesion):
+                    cola.put(evento)
+            finally:
+                cola.put(None)
+        
+        futuro = loop_compartido.enviar(producir())
+        try:
+            while True:
+                evento = cola.get()
+                if evento is None:
+                    break
+                yield evento
+            # Si la generación falló antes del evento final, el error llega a quien consume
+            futuro.result()
+        finally:
+            # Si quien consume deja de leer, se cancela la generación en curso
+            futuro.cancel()
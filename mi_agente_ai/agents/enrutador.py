@@ -0,0 +1,239 @@
+import os
+import re
+import json
+import time
+import datetime
+import threading
+from typing import Optional, Dict, Any, List, Callable
+
+import httpx
+
+from mi_agente_ai.models.schema import ResultadoHerramienta
+from mi_agente_ai.services.rukovoditel import credenciales_configuradas, RukovoditelJSONError
+from mi_agente_ai.services.sincronizacion import obtener_sincronizador
+from mi_agente_ai.tools.indice_licencias import IndiceLicencias
+from mi_agente_ai.tools.indice_empleados import IndiceEmpleados, obtener_indice_empleados
+from mi_agente_ai.utils.fechas import parsear_fecha, rango_mes, MESES
+from mi_agente_ai.utils.texto import normalizar_texto
+
+# Responder las preguntas frecuentes sin pasar por el LLM (0 = desactivado)
+ENRUTADOR_ACTIVO = os.getenv("AGENTE_ENRUTADOR", "1") != "0"
+# Licencias que se enumeran en la respuesta; el resto queda en el resultado de la herramienta
+ENRUTADOR_MAX_LISTADO = int(os.getenv("AGENTE_ENRUTADOR_MAX_LISTADO", "10"))
+
+_PUNTUACION = re.compile(r"[¿?¡!.,;:\"']+")
+_MESES = "|".join(MESES)
+_NOMBRE = r"(?P<empleado>[a-zñ]+(?: [a-zñ]+){0,4})"
+
+# Patrones sobre la pregunta normalizada (minúsculas, sin tildes ni signos de puntuación)
+PATRON_REINCORPORACION = re.compile(
+    r"^(?:cuando|en que fecha|que dia) (?:se )?(?:reincorporo|volvio|regreso|retorno) (?:el |la )?(?:encargad[oa] )?"
+    + _NOMBRE + r"(?: (?:de|a) (?:su|la) (?:licencia|trabajo))?$"
+)
+PATRON_LICENCIAS_EMPLEADO = re.compile(
+    r"^(?:(?:que|cuales) )?(?:(?:mostrame|muestrame|dame|listame|ver) )?(?:las )?licencias "
+    r"(?:(?:que )?(?:tuvo|tiene|pidio|tomo|de|del)(?: el| la)? )(?:encargad[oa] )?" + _NOMBRE + "$"
+)
+PATRON_LICENCIAS_MES = re.compile(
+    r"^(?:quien|quienes) (?:estuvo|estuvieron|estaba|estaban) de licencia (?:en|durante) (?:el mes de )?"
+    r"(?P<mes>" + _MESES + r")(?: del?)? (?P<anio>\d{4})$"
+)
+PATRON_LICENCIAS_DIA = re.compile(
+    r"^(?:quien|quienes) (?:estuvo|estuvieron|estaba|estaban) de licencia (?:el )?"
+    r"(?:(?P<dia>\d{1,2}) de (?P<mes>" + _MESES + r")(?: del?)? (?P<anio>\d{4})|(?P<fecha>\d{1,2}/\d{1,2}/\d{4}))$"
+)
+
+
+def normalizar_pregunta(prompt: str) -> str:
+    """Minúsculas, sin tildes, sin signos de puntuación y con espacios simples (conserva las barras de las fechas)"""
+    return " ".join(_PUNTUACION.sub(" ", normalizar_texto(prompt)).split())
+
+
+def _fecha(valor: Any) -> str:
+    fecha = parsear_fecha(valor)
+    return fecha.strftime("%d/%m/%Y") if fecha else "sin fecha"
+
+
+def _describir(registro: Dict[str, Any], con_nombre: bool = False) -> str:
+    """Una línea con las fechas de una licencia"""
+    partes = [f"desde el {_fecha(registro.get('Fecha de inicio'))}"]
+    if parsear_fecha(registro.get("Fecha Finalización")):
+        partes.append(f"hasta el {_fecha(registro.get('Fecha Finalización'))}")
+    if parsear_fecha(registro.get("Reincorporación")):
+        partes.append(f"reincorporación el {_fecha(registro.get('Reincorporación'))}")
+    linea = ", ".join(partes)
+    return f"- {registro.get('Empleado', 'Sin nombre')}: {linea}" if con_nombre else f"- {linea[0].upper()}{linea[1:]}"
+
+
+def _listado(registros: List[Dict[str, Any]], con_nombre: bool = False) -> str:
+    lineas = [_describir(r, con_nombre) for r in registros[:ENRUTADOR_MAX_LISTADO]]
+    if len(registros) > ENRUTADOR_MAX_LISTADO:
+        lineas.append(f"- ... y {len(registros) - ENRUTADOR_MAX_LISTADO} más")
+    return "\n".join(lineas)
+
+
+class EnrutadorIntenciones:
+    """
+    Reconoce preguntas frecuentes sobre licencias (licencias de un empleado, quién estuvo de licencia
+    en un mes o un día, cuándo se reincorporó alguien) y las responde con el índice local de licencias
+    y una plantilla, sin llamar al LLM. Si la pregunta no coincide con ningún patrón, o es ambigua
+    (por ejemplo, el nombre coincide con varios empleados o con ninguno), devuelve None y responde el LLM.
+    """
+
+    def __init__(self, activo: bool = ENRUTADOR_ACTIVO):
+        self.activo = activo
+        self._lock = threading.Lock()
+        self._rutas: List[tuple] = [
+            ("reincorporacion", PATRON_REINCORPORACION, self._reincorporacion),
+            ("licencias_empleado", PATRON_LICENCIAS_EMPLEADO, self._licencias_empleado),
+            ("licencias_mes", PATRON_LICENCIAS_MES, self._licencias_mes),
+            ("licencias_dia", PATRON_LICENCIAS_DIA, self._licencias_dia),
+        ]
+        self._metricas: Dict[str, Dict[str, float]] = {
+            nombre: {"respondidas": 0, "derivadas": 0, "total_ms": 0.0, "max_ms": 0.0}
+            for nombre, _, _ in self._rutas
+        }
+        self.sin_ruta = 0
+
+    async def responder(self, prompt: str) -> Optional[Dict[str, Any]]:
+        """
+        Responde la pregunta si coincide con una ruta conocida
+
+        Returns:
+            Diccionario con `response`, `tool_used`, `tool_result` y `tool_results`, o None para derivar al LLM
+        """
+        if not self.activo:
+            return None
+        pregunta = normalizar_pregunta(prompt)
+        for nombre, patron, manejador in self._rutas:
+            coincidencia = patron.match(pregunta)
+            if coincidencia is None:
+                continue
+            respuesta = None
+            inicio = time.perf_counter()
+            try:
+                respuesta = await self._con_indice(manejador, coincidencia)
+            finally:
+                self._registrar(nombre, respuesta, inicio)
+            return respuesta
+        with self._lock:
+            self.sin_ruta += 1
+        return None
+
+    async def _con_indice(self, manejador: Callable[..., Optional[Dict[str, Any]]],
+                          coincidencia: re.Match) -> Optional[Dict[str, Any]]:
+        if obtener_sincronizador() is None and not credenciales_configuradas():
+            return None
+        try:
+            empleados = await obtener_indice_empleados()
+        except (httpx.HTTPError, RukovoditelJSONError, RuntimeError):
+            # Sin índice no hay respuesta rápida; el LLM informará el error
+            return None
+        return manejador(empleados.licencias_indice, empleados, coincidencia)
+
+    def _registrar(self, ruta: str, respuesta: Optional[Dict[str, Any]], inicio: float):
+        duracion = (time.perf_counter() - inicio) * 1000
+        with self._lock:
+            metricas = self._metricas[ruta]
+            metricas["respondidas" if respuesta is not None else "derivadas"] += 1
+            metricas["total_ms"] += duracion
+            metricas["max_ms"] = max(metricas["max_ms"], duracion)
+
+    @staticmethod
+    def _empleado_unico(indice: IndiceLicencias, empleados: IndiceEmpleados, nombre: str) -> Optional[str]:
+        coincidentes = indice.empleados(nombre)
+        if len(coincidentes) == 1:
+            return coincidentes[0]
+        if coincidentes:
+            return None
+        # Sin coincidencia exacta por palabras se admiten errores de tipeo si hay un único candidato claro
+        return empleados.resolver(nombre)
+
+    @staticmethod
+    def _salida(texto: str, registros: List[Dict[str, Any]], ruta: str, **metadata) -> Dict[str, Any]:
+        datos = {
+            "registros": registros,
+            "metadata": {
+                "success": True,
+                "origen": "enrutador",
+                "ruta": ruta,
+                "record_count": len(registros),
+                "timestamp": datetime.datetime.now().isoformat(),
+                **metadata,
+            },
+        }
+        return {
+            "response": texto,
+            "tool_used": True,
+            "tool_result": json.dumps(datos, ensure_ascii=False),
+            "tool_results": [ResultadoHerramienta(herramienta="enrutador", datos=datos)],
+        }
+
+    def _licencias_empleado(self, indice: IndiceLicencias, empleados: IndiceEmpleados, coincidencia: re.Match) -> Optional[Dict[str, Any]]:
+        empleado = self._empleado_unico(indice, empleados, coincidencia.group("empleado"))
+        if empleado is None:
+            return None
+        registros = indice.de_empleado(empleado)
+        nombre = registros[0].get("Empleado", empleado)
+        cantidad = "una licencia" if len(registros) == 1 else f"{len(registros)} licencias"
+        texto = f"{nombre} tiene registrada{'s' if len(registros) > 1 else ''} {cantidad}:\n{_listado(registros)}"
+        return self._salida(texto, registros, "licencias_empleado")
+
+    def _reincorporacion(self, indice: IndiceLicencias, empleados: IndiceEmpleados, coincidencia: re.Match) -> Optional[Dict[str, Any]]:
+        empleado = self._empleado_unico(indice, empleados, coincidencia.group("empleado"))
+        if empleado is None:
+            return None
+        registros = indice.de_empleado(empleado)
+        # Las licencias vienen ordenadas por fecha de inicio: la última es la más reciente
+        ultima = registros[-1]
+        nombre = ultima.get("Empleado", empleado)
+        reincorporacion = parsear_fecha(ultima.get("Reincorporación"))
+        if reincorporacion is not None:
+            texto = (f"{nombre} se reincorporó el {reincorporacion.strftime('%d/%m/%Y')}, "
+                     f"luego de su licencia iniciada el {_fecha(ultima.get('Fecha de inicio'))}.")
+        else:
+            texto = (f"{nombre} no tiene fecha de reincorporación registrada para su última licencia, "
+                     f"iniciada el {_fecha(ultima.get('Fecha de inicio'))}.")
+        return self._salida(texto, [ultima], "reincorporacion")
+
+    def _licencias_entre(self, indice: IndiceLicencias, desde: datetime.date, hasta: datetime.date,
+                         periodo: str, ruta: str) -> Dict[str, Any]:
+        registros = indice.entre(desde, hasta)
+        if not registros:
+            texto = f"No hay encargados con licencia registrada {periodo}."
+        else:
+            quienes = "una licencia de encargado" if len(registros) == 1 else f"{len(registros)} licencias de encargados"
+            texto = f"{periodo[0].upper()}{periodo[1:]} hubo {quienes}:\n{_listado(registros, con_nombre=True)}"
+        return self._salida(texto, registros, ruta, desde=desde.isoformat(), hasta=hasta.isoformat())
+
+    def _licencias_mes(self, indice: IndiceLicencias, empleados: IndiceEmpleados, coincidencia: re.Match) -> Optional[Dict[str, Any]]:
+        mes, anio = MESES[coincidencia.group("mes")], int(coincidencia.group("anio"))
+        desde, hasta = rango_mes(anio, mes)
+        return self._licencias_entre(indice, desde, hasta, f"en {coincidencia.group('mes')} de {anio}", "licencias_mes")
+
+    def _licencias_dia(self, indice: IndiceLicencias, empleados: IndiceEmpleados, coincidencia: re.Match) -> Optional[Dict[str, Any]]:
+        if coincidencia.group("fecha"):
+            fecha = parsear_fecha(coincidencia.group("fecha"))
+        else:
+            try:
+                fecha = datetime.date(int(coincidencia.group("anio")), MESES[coincidencia.group("mes")],
+                                      int(coincidencia.group("dia")))
+            except ValueError:
+                fecha = None
+        if fecha is None:
+            return None
+        return self._licencias_entre(indice, fecha, fecha, f"el {fecha.strftime('%d/%m/%Y')}", "licencias_dia")
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """Consultas respondidas y derivadas al LLM por ruta, con sus latencias"""
+        with self._lock:
+            rutas = {}
+            for nombre, metricas in self._metricas.items():
+                total = metricas["respondidas"] + metricas["derivadas"]
+                rutas[nombre] = {
+                    "respondidas": int(metricas["respondidas"]),
+                    "derivadas": int(metricas["derivadas"]),
+                    "media_ms": round(metricas["total_ms"] / total, 3) if total else 0.0,
+                    "max_ms": round(metricas["max_ms"], 3),
+                }
+            return {"rutas": rutas, "sin_ruta": self.sin_ruta}
@@ -0,0 +1,180 @@
+import os
+import time
+import dataclasses
+import threading
+from collections import OrderedDict
+from typing import Optional, List, Dict
+
+from pydantic_ai.messages import (
+    ModelMessage, ModelMessagesTypeAdapter, ModelRequest, ModelResponse,
+    SystemPromptPart, UserPromptPart, TextPart, ToolReturnPart
+)
+
+from mi_agente_ai.utils.serializacion import estimar_tokens
+
+# Tokens (aproximados) del historial que se envía al modelo en cada consulta
+MEMORIA_TOKENS = int(os.getenv("AGENTE_MEMORIA_TOKENS", "2000"))
+# Turnos recientes que se envían completos (con llamadas y resultados de herramientas)
+MEMORIA_TURNOS_COMPLETOS = int(os.getenv("AGENTE_MEMORIA_TURNOS_COMPLETOS", "3"))
+# Segundos que un resultado de herramienta del historial se considera vigente
+MEMORIA_TTL_HERRAMIENTAS = float(os.getenv("AGENTE_MEMORIA_TTL_HERRAMIENTAS", "300"))
+# Sesiones en memoria y segundos de inactividad tras los que se descartan
+SESIONES_MAX = int(os.getenv("AGENTE_SESIONES_MAX", "256"))
+SESIONES_TTL = float(os.getenv("AGENTE_SESIONES_TTL", "3600"))
+
+# Turnos guardados por sesión (los más viejos solo aportan al resumen)
+_MAX_TURNOS = 50
+_LARGO_RESUMEN_PREGUNTA = 200
+_LARGO_RESUMEN_RESPUESTA = 300
+
+MENSAJE_RESULTADO_VENCIDO = "Resultado vencido: vuelve a consultar la herramienta si necesitas estos datos."
+# Herramienta interna de pydantic-ai con la que el modelo entrega la respuesta final
+_HERRAMIENTA_RESULTADO = "final_result"
+
+
+@dataclasses.dataclass
+class Turno:
+    """Una pregunta del usuario con su respuesta y los mensajes intercambiados con el modelo"""
+    prompt: str
+    respuesta: str
+    mensajes: List[ModelMessage]
+    momento: float
+    tokens: int
+
+
+def _recortar(texto: str, largo: int) -> str:
+    texto = " ".join(str(texto).split())
+    return texto if len(texto) <= largo else texto[:largo - 1] + "…"
+
+
+class MemoriaConversacion:
+    """
+    Historial de una sesión con tamaño acotado. Los últimos turnos se envían completos, de modo que el
+    modelo puede reutilizar los resultados de herramientas todavía vigentes en preguntas de seguimiento
+    ("¿y en noviembre?"); los anteriores se reducen a un resumen de preguntas y respuestas.
+    Así el costo del prompt se mantiene acotado aunque la conversación sea larga.
+    """
+
+    def __init__(self, presupuesto_tokens: int = MEMORIA_TOKENS, turnos_completos: int = MEMORIA_TURNOS_COMPLETOS,
+                 ttl_herramientas: float = MEMORIA_TTL_HERRAMIENTAS):
+        self.presupuesto_tokens = presupuesto_tokens
+        self.turnos_completos = turnos_completos
+        self.ttl_herramientas = ttl_herramientas
+        self.turnos: List[Turno] = []
+        self.ultimo_uso = time.time()
+        self._lock = threading.Lock()
+
+    @property
+    def vacia(self) -> bool:
+        return not self.turnos
+
+    def agregar(self, prompt: str, respuesta: str, mensajes: Optional[List[ModelMessage]] = None):
+        """
+        Agrega un turno. Si no hay mensajes del modelo (respuestas del cache o del enrutador)
+        se registra la pregunta y la respuesta como un intercambio de texto.
+        """
+        if not mensajes:
+            mensajes = [ModelRequest(parts=[UserPromptPart(prompt)]), ModelResponse(parts=[TextPart(respuesta)])]
+        # Las instrucciones del sistema se envían aparte, así que no cuentan para el presupuesto
+        sin_sistema = [
+            dataclasses.replace(m, parts=[p for p in m.parts if not isinstance(p, SystemPromptPart)])
+            if isinstance(m, ModelRequest) else m
+            for m in mensajes
+        ]
+        tokens = estimar_tokens(ModelMessagesTypeAdapter.dump_python(sin_sistema, mode="json"))
+        with self._lock:
+            self.turnos.append(Turno(prompt, respuesta, list(mensajes), time.time(), tokens))
+            del self.turnos[:-_MAX_TURNOS]
+            self.ultimo_uso = time.time()
+
+    def _mensajes_turno(self, turno: Turno, ahora: float) -> List[ModelMessage]:
+        """Mensajes de un turno sin las instrucciones del sistema y con los resultados vencidos reemplazados"""
+        mensajes = []
+        for mensaje in turno.mensajes:
+            if isinstance(mensaje, ModelRequest):
+                partes = []
+                for parte in mensaje.parts:
+                    if isinstance(parte, SystemPromptPart):
+                        continue
+                    if (isinstance(parte, ToolReturnPart) and parte.tool_name != _HERRAMIENTA_RESULTADO
+                            and ahora - parte.timestamp.timestamp() > self.ttl_herramientas):
+                        parte = dataclasses.replace(parte, content=MENSAJE_RESULTADO_VENCIDO)
+                    partes.append(parte)
+                if partes:
+                    mensajes.append(dataclasses.replace(mensaje, parts=partes))
+            else:
+                mensajes.append(mensaje)
+        return mensajes
+
+    def historial(self, system_prompt: str) -> List[ModelMessage]:
+        """
+        Historial para enviar al modelo: las instrucciones del sistema, el resumen de los turnos
+        anteriores y los últimos turnos completos, dentro del presupuesto de tokens
+        """
+        ahora = time.time()
+        with self._lock:
+            turnos = list(self.turnos)
+            self.ultimo_uso = ahora
+
+        # Los turnos más recientes van completos mientras entren en tres cuartos del presupuesto
+        completos: List[Turno] = []
+        usados = 0
+        for turno in reversed(turnos):
+            if len(completos) >= self.turnos_completos or usados + turno.tokens > self.presupuesto_tokens * 3 // 4:
+                break
+            completos.insert(0, turno)
+            usados += turno.tokens
+
+        # Los anteriores se resumen, del más nuevo al más viejo, con el presupuesto restante
+        anteriores = turnos[:len(turnos) - len(completos)]
+        lineas: List[str] = []
+        for turno in reversed(anteriores):
+            linea = (f"- Usuario: {_recortar(turno.prompt, _LARGO_RESUMEN_PREGUNTA)} → "
+                     f"Respuesta: {_recortar(turno.respuesta, _LARGO_RESUMEN_RESPUESTA)}")
+            costo = estimar_tokens(linea)
+            if usados + costo > self.presupuesto_tokens:
+                break
+            lineas.insert(0, linea)
+            usados += costo
+        omitidos = len(anteriores) - len(lineas)
+
+        partes_sistema = [SystemPromptPart(system_prompt)]
+        if lineas:
+            encabezado = "Resumen de la conversación anterior con este usuario"
+            if omitidos:
+                encabezado += f" (se omitieron {omitidos} intercambios más antiguos)"
+            partes_sistema.append(SystemPromptPart(encabezado + ":\n" + "\n".join(lineas)))
+
+        historial: List[ModelMessage] = [ModelRequest(parts=partes_sistema)]
+        for turno in completos:
+            historial.extend(self._mensajes_turno(turno, ahora))
+        return historial
+
+
+class AlmacenSesiones:
+    """Memorias de conversación por sesión, con cantidad acotada y descarte por inactividad"""
+
+    def __init__(self, max_sesiones: int = SESIONES_MAX, ttl: float = SESIONES_TTL):
+        self.max_sesiones = max_sesiones
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._sesiones: "OrderedDict[str, MemoriaConversacion]" = OrderedDict()
+
+    def obtener(self, sesion: str) -> MemoriaConversacion:
+        ahora = time.time()
+        with self._lock:
+            memoria = self._sesiones.get(sesion)
+            if memoria is None or ahora - memoria.ultimo_uso > self.ttl:
+                memoria = self._sesiones[sesion] = MemoriaConversacion()
+            self._sesiones.move_to_end(sesion)
+            while len(self._sesiones) > self.max_sesiones:
+                self._sesiones.popitem(last=False)
+            return memoria
+
+    def olvidar(self, sesion: str):
+        with self._lock:
+            self._sesiones.pop(sesion, None)
+
+    def estadisticas(self) -> Dict[str, int]:
+        with self._lock:
+            return {"sesiones": len(self._sesiones), "max_sesiones": self.max_sesiones}
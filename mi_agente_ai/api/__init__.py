@@ -0,0 +1,4 @@
+# Archivo de inicialización para el paquete api
+from mi_agente_ai.api.limitador import LimitadorConcurrencia, ColaLlena
+
+__all__ = ["LimitadorConcurrencia", "ColaLlena"]
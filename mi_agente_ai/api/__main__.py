@@ -0,0 +1,17 @@
+import os
+import uvicorn
+
+
+def main():
+    """Inicia el servidor HTTP del agente (python -m mi_agente_ai.api)"""
+    uvicorn.run(
+        "mi_agente_ai.api.server:app",
+        host=os.getenv("API_HOST", "0.0.0.0"),
+        port=int(os.getenv("API_PORT", "8000")),
+        # Cada worker es un proceso con su propio agente, limitador y pool de conexiones
+        workers=int(os.getenv("API_WORKERS", "1")),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import os
+import time
+import asyncio
+from typing import Dict, Any
+
+# Consultas al agente que se procesan en paralelo
+API_MAX_CONCURRENCIA = int(os.getenv("API_MAX_CONCURRENCIA", "8"))
+# Consultas que pueden esperar un lugar; con la cola llena se responde 429
+API_MAX_COLA = int(os.getenv("API_MAX_COLA", "32"))
+# Segundos máximos de espera en la cola
+API_ESPERA_COLA = float(os.getenv("API_ESPERA_COLA", "10"))
+
+
+class ColaLlena(Exception):
+    """No hay lugar para procesar ni para encolar la consulta"""
+
+    def __init__(self, reintentar_en: float):
+        super().__init__("Servidor ocupado, intente nuevamente más tarde")
+        self.reintentar_en = reintentar_en
+
+
+class LimitadorConcurrencia:
+    """
+    Limita las consultas simultáneas al agente y encola las que exceden el límite.
+    Cuando la cola está llena, o una consulta espera más de `espera_maxima`, se rechaza
+    con `ColaLlena` para que el servidor responda 429 en lugar de acumular trabajo.
+    """
+
+    def __init__(self, max_concurrencia: int = API_MAX_CONCURRENCIA, max_cola: int = API_MAX_COLA,
+                 espera_maxima: float = API_ESPERA_COLA):
+        self.max_concurrencia = max_concurrencia
+        self.max_cola = max_cola
+        self.espera_maxima = espera_maxima
+        self._semaforo = asyncio.Semaphore(max_concurrencia)
+        self.en_proceso = 0
+        self.en_cola = 0
+        self.rechazadas = 0
+        self.completadas = 0
+        # Duración media de las consultas (media móvil) para sugerir el Retry-After
+        self._duracion_media = 1.0
+
+    def _reintentar_en(self) -> float:
+        return round(max(1.0, self._duracion_media * (self.en_cola + 1) / self.max_concurrencia), 1)
+
+    async def adquirir(self):
+        if not self._semaforo.locked():
+            # Hay lugar libre: se ocupa sin ceder el control al event loop
+            await self._semaforo.acquire()
+        else:
+            if self.en_cola >= self.max_cola:
+                self.rechazadas += 1
+                raise ColaLlena(self._reintentar_en())
+            self.en_cola += 1
+            try:
+                await asyncio.wait_for(self._semaforo.acquire(), self.espera_maxima)
+            except asyncio.TimeoutError:
+                self.rechazadas += 1
+                raise ColaLlena(self._reintentar_en())
+            finally:
+                self.en_cola -= 1
+        self.en_proceso += 1
+
+    def liberar(self, duracion: float):
+        self.en_proceso -= 1
+        self.completadas += 1
+        self._duracion_media = 0.8 * self._duracion_media + 0.2 * duracion
+        self._semaforo.release()
+
+    def lugar(self) -> "_Lugar":
+        """Context manager asíncrono que ocupa un lugar mientras dura la consulta"""
+        return _Lugar(self)
+
+    def estadisticas(self) -> Dict[str, Any]:
+        return {
+            "max_concurrencia": self.max_concurrencia,
+            "max_cola": self.max_cola,
+            "en_proceso": self.en_proceso,
+            "en_cola": self.en_cola,
+            "completadas": self.completadas,
+            "rechazadas": self.rechazadas,
+            "duracion_media_s": round(self._duracion_media, 3),
+        }
+
+
+class _Lugar:
+    def __init__(self, limitador: LimitadorConcurrencia):
+        self.limitador = limitador
+        self.inicio = 0.0
+        self.ocupado = False
+
+    async def __aenter__(self):
+        await self.limitador.adquirir()
+        self.inicio = time.perf_counter()
+        self.ocupado = True
+        return self
+
+    async def __aexit__(self, *exc):
+        # Se puede llamar más de una vez: el lugar se devuelve solo la primera
+        if self.ocupado:
+            self.ocupado = False
+            self.limitador.liberar(time.perf_counter() - self.inicio)
+        return False
@@ -0,0 +1,163 @@
+import os
+import json
+import datetime
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, Any, AsyncIterator
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+
+from mi_agente_ai.agents.base_agent import Agent, TIMEOUT_AGENTE
+from mi_agente_ai.api.limitador import LimitadorConcurrencia, ColaLlena, _Lugar
+from mi_agente_ai.services.rukovoditel import obtener_cliente
+from mi_agente_ai.services.cache import obtener_cache
+from mi_agente_ai.services.cache_respuestas import obtener_cache_respuestas
+from mi_agente_ai.services.control_flujo import estadisticas_servicios
+from mi_agente_ai.services.coalescencia import obtener_coalescedor
+from mi_agente_ai.services.respaldo import estadisticas_respaldo
+from mi_agente_ai.tools.prebusqueda import estadisticas_prebusqueda
+from mi_agente_ai.utils.trazas import estadisticas_trazas
+from mi_agente_ai.tools.consulta_licencias_encargados import (
+    ConsultaLicenciasEncargadosInput, ConsultaLicenciasEncargadosOutput, consulta_licencias_encargados
+)
+from mi_agente_ai.utils.config import load_env_vars
+
+# Timeout máximo que puede pedir un cliente, en segundos
+API_TIMEOUT_MAX = float(os.getenv("API_TIMEOUT_MAX", str(TIMEOUT_AGENTE)))
+
+
+class ConsultaAgente(BaseModel):
+    """Consulta en lenguaje natural para el agente"""
+    prompt: str = Field(..., min_length=1, description="La consulta del usuario")
+    timeout: Optional[float] = Field(None, gt=0, description="Segundos máximos para responder")
+    sesion: Optional[str] = Field(None, max_length=128, description="Identificador de la conversación, para preguntas de seguimiento")
+
+
+class RespuestaAgente(BaseModel):
+    """Respuesta del agente"""
+    response: str
+    tool_used: bool = False
+    tool_result: Optional[Any] = None
+
+
+def respuesta_a_dict(respuesta) -> Dict[str, Any]:
+    """Convierte la respuesta del agente (objeto con atributos) a un diccionario serializable"""
+    tool_result = respuesta.tool_result
+    if isinstance(tool_result, str):
+        try:
+            tool_result = json.loads(tool_result)
+        except ValueError:
+            pass
+    return RespuestaAgente(
+        response=respuesta.response, tool_used=bool(respuesta.tool_used), tool_result=tool_result
+    ).model_dump()
+
+
+def _timeout(consulta: ConsultaAgente) -> float:
+    return min(consulta.timeout or API_TIMEOUT_MAX, API_TIMEOUT_MAX)
+
+
+class _RespuestaStreamConLugar(StreamingResponse):
+    """
+    Respuesta en streaming que devuelve el lugar del limitador al terminar de enviarse, también si
+    el generador nunca llegó a empezar (el cliente se desconectó o falló el envío de los encabezados)
+    """
+
+    def __init__(self, contenido: AsyncIterator[str], lugar: _Lugar, **kwargs):
+        super().__init__(contenido, **kwargs)
+        self.lugar = lugar
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.lugar.__aexit__(None, None, None)
+
+
+def _evento_sse(tipo: str, datos: Any) -> str:
+    return f"event: {tipo}\ndata: {json.dumps(datos, ensure_ascii=False, default=str)}\n\n"
+
+
+@asynccontextmanager
+async def _ciclo_de_vida(app: FastAPI):
+    # Un solo agente y un solo limitador para todo el proceso; los clientes HTTP
+    # de Rukovoditel ya son compartidos y se cierran al apagar el servidor
+    load_env_vars()
+    app.state.agente = Agent()
+    app.state.limitador = LimitadorConcurrencia()
+    yield
+    await obtener_cliente().aclose()
+
+
+def crear_app() -> FastAPI:
+    """Crea la aplicación ASGI que expone el agente y la herramienta de licencias"""
+    app = FastAPI(title="Mi Agente AI", lifespan=_ciclo_de_vida)
+
+    @app.exception_handler(ColaLlena)
+    async def _cola_llena(request: Request, error: ColaLlena):
+        return JSONResponse(
+            status_code=429,
+            content={"error": str(error), "reintentar_en": error.reintentar_en},
+            headers={"Retry-After": str(int(error.reintentar_en + 0.999))},
+        )
+
+    @app.get("/salud")
+    async def salud(request: Request) -> Dict[str, Any]:
+        return {
+            "status": "ok",
+            "timestamp": datetime.datetime.now().isoformat(),
+            "limitador": request.app.state.limitador.estadisticas(),
+            "cache": obtener_cache().estadisticas(),
+            "cache_respuestas": obtener_cache_respuestas().estadisticas(),
+            "enrutador": request.app.state.agente.enrutador.estadisticas(),
+            "sesiones": request.app.state.agente.sesiones.estadisticas(),
+            "servicios": estadisticas_servicios(),
+            "coalescencia": obtener_coalescedor().estadisticas(),
+            "respaldo": estadisticas_respaldo(),
+            "prebusqueda": estadisticas_prebusqueda.estadisticas(),
+            "trazas": estadisticas_trazas(),
+        }
+
+    @app.post("/consulta", response_model=RespuestaAgente)
+    async def consulta(consulta: ConsultaAgente, request: Request) -> Dict[str, Any]:
+        """Responde una consulta con el agente; el timeout cancela las llamadas en curso"""
+        async with request.app.state.limitador.lugar():
+            respuesta = await request.app.state.agente.arun(consulta.prompt, timeout=_timeout(consulta), sesion=consulta.sesion)
+        return respuesta_a_dict(respuesta)
+
+    @app.post("/consulta/stream")
+    async def consulta_stream(consulta: ConsultaAgente, request: Request) -> StreamingResponse:
+        """
+        Responde una consulta como server-sent events: `texto` con cada fragmento de la respuesta,
+        `herramienta_llamada` / `herramienta_resultado` y un evento `final` con la respuesta completa
+        """
+        limitador: LimitadorConcurrencia = request.app.state.limitador
+        # El lugar se reserva antes de responder para poder devolver 429 con la cola llena
+        lugar = limitador.lugar()
+        await lugar.__aenter__()
+
+        async def eventos() -> AsyncIterator[str]:
+            try:
+                async for evento in request.app.state.agente.astream(consulta.prompt, timeout=_timeout(consulta), sesion=consulta.sesion):
+                    if evento.tipo == "final":
+                        yield _evento_sse("final", respuesta_a_dict(evento.datos))
+                    else:
+                        yield _evento_sse(evento.tipo, evento.model_dump(exclude_none=True, exclude={"tipo"}))
+            finally:
+                await lugar.__aexit__(None, None, None)
+
+        return _RespuestaStreamConLugar(eventos(), lugar, media_type="text/event-stream",
+                                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    @app.post("/herramientas/consulta_licencias_encargados", response_model=ConsultaLicenciasEncargadosOutput)
+    async def herramienta_licencias(input_data: ConsultaLicenciasEncargadosInput,
+                                    request: Request) -> ConsultaLicenciasEncargadosOutput:
+        """Ejecuta la herramienta de licencias directamente, sin pasar por el LLM"""
+        async with request.app.state.limitador.lugar():
+            return await consulta_licencias_encargados(input_data)
+
+    return app
+
+
+app = crear_app()
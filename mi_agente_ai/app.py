@@ -1,4 +1,5 @@
 import sys
+import uuid
 from mi_agente_ai.utils.config import load_env_vars
 from mi_agente_ai.agents.base_agent import Agent
 
@@ -19,6 +20,9 @@ def main():
         print(f"Error al inicializar el agente: {str(e)}")
         sys.exit(1)
     
+    # Toda la sesión de la CLI es una misma conversación
+    sesion = uuid.uuid4().hex
+    
     # Loop de interacción
     while True:
         user_input = input("\n> ")
@@ -29,14 +33,30 @@ def main():
         
         # Procesar la consulta con el agente
         try:
-            result = agent.run(user_input)
-            print(f"\nRespuesta: {result.response}")
+            # La respuesta se imprime a medida que el modelo la genera
+            print("\nRespuesta: ", end="", flush=True)
+            result = None
+            escrito = False
+            for evento in agent.stream(user_input, sesion=sesion):
+                if evento.tipo == "texto":
+                    print(evento.texto, end="", flush=True)
+                    escrito = True
+                elif evento.tipo == "herramienta_llamada":
+                    print(f"[consultando {evento.herramienta}...] ", end="", flush=True)
+                elif evento.tipo == "final":
+                    result = evento.datos
+            if result is None:
+                print("\nError al procesar la consulta: la respuesta se interrumpió antes de terminar")
+                continue
+            if not escrito:
+                print(result.response, end="")
+            print()
             
             if result.tool_used and result.tool_result:
                 print(f"Resultado de herramienta: {result.tool_result}")
         
         except Exception as e:
-            print(f"Error al procesar la consulta: {str(e)}")
+            print(f"\nError al procesar la consulta: {str(e)}")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
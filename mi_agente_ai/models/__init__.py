@@ -1,4 +1,4 @@
 # Archivo de inicialización para el paquete models
-from .schema import UserQuery, ToolResponse, AgentResponse
+from .schema import UserQuery, ToolResponse, AgentResponse, ResultadoHerramienta, StreamEvent
 
-__all__ = ["UserQuery", "ToolResponse", "AgentResponse"] 
\ No newline at end of file
+__all__ = ["UserQuery", "ToolResponse", "AgentResponse", "ResultadoHerramienta", "StreamEvent"]
\ No newline at end of file
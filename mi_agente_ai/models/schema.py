@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Any, Literal
 
 class UserQuery(BaseModel):
     """Modelo para representar una consulta del usuario"""
@@ -12,4 +12,16 @@ class ToolResponse(BaseModel):
 class AgentResponse(BaseModel):
     """Modelo para representar la respuesta del agente"""
     response: str
-    tool_outputs: Optional[List[ToolResponse]] = None 
\ No newline at end of file
+    tool_outputs: Optional[List[ToolResponse]] = None
+
+class ResultadoHerramienta(BaseModel):
+    """Valor devuelto por una herramienta durante una ejecución del agente, tal como lo devolvió la herramienta"""
+    herramienta: str
+    datos: Any
+
+class StreamEvent(BaseModel):
+    """Evento emitido por el agente mientras genera una respuesta en modo streaming"""
+    tipo: Literal["texto", "herramienta_llamada", "herramienta_resultado", "final"]
+    texto: Optional[str] = None
+    herramienta: Optional[str] = None
+    datos: Optional[Any] = None
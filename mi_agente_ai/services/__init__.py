@@ -0,0 +1,18 @@
+# Archivo de inicialización para el paquete services
+from .rukovoditel import RukovoditelClient, RukovoditelJSONError, obtener_cliente
+from .cache import CacheConsultas, SQLiteCacheBackend, obtener_cache, clave_consulta
+from .sincronizacion import AlmacenLocal, SincronizadorLicencias, obtener_sincronizador
+from .cache_respuestas import CacheRespuestas, obtener_cache_respuestas, version_datos
+from .control_flujo import ControlServicio, CircuitoAbierto, obtener_control, estadisticas_servicios
+from .coalescencia import CoalescedorConsultas, obtener_coalescedor
+from .respaldo import PeticionesRespaldo, obtener_respaldo, estadisticas_respaldo
+
+__all__ = [
+    "RukovoditelClient", "RukovoditelJSONError", "obtener_cliente",
+    "CacheConsultas", "SQLiteCacheBackend", "obtener_cache", "clave_consulta",
+    "AlmacenLocal", "SincronizadorLicencias", "obtener_sincronizador",
+    "CacheRespuestas", "obtener_cache_respuestas", "version_datos",
+    "ControlServicio", "CircuitoAbierto", "obtener_control", "estadisticas_servicios",
+    "CoalescedorConsultas", "obtener_coalescedor",
+    "PeticionesRespaldo", "obtener_respaldo", "estadisticas_respaldo"
+]
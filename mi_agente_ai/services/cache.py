@@ -0,0 +1,267 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
+
+from dotenv import load_dotenv
+from pydantic import BaseModel
+
+# Cargar variables de entorno
+load_dotenv()
+
+CACHE_MAX_ENTRIES = int(os.getenv("RUKOVODITEL_CACHE_MAX_ENTRIES", "256"))
+CACHE_TTL = float(os.getenv("RUKOVODITEL_CACHE_TTL", "300"))
+# TTL por entidad con el formato "43:300,12:60"
+CACHE_TTL_POR_ENTIDAD = os.getenv("RUKOVODITEL_CACHE_TTL_POR_ENTIDAD", "")
+# Segundos que un resultado vencido se sigue entregando mientras se actualiza en segundo plano
+# (stale-while-revalidate); 0 = desactivado. Por entidad con el mismo formato que el TTL
+CACHE_VENCIDO = float(os.getenv("RUKOVODITEL_CACHE_VENCIDO", "0"))
+CACHE_VENCIDO_POR_ENTIDAD = os.getenv("RUKOVODITEL_CACHE_VENCIDO_POR_ENTIDAD", "")
+# Ruta del archivo SQLite para persistir el cache entre reinicios (vacío = solo memoria)
+CACHE_SQLITE = os.getenv("RUKOVODITEL_CACHE_SQLITE", "")
+
+# Campos que nunca forman parte de la clave del cache
+CAMPOS_CREDENCIALES = {"key", "username", "password"}
+
+
+def parsear_por_entidad(valor: str) -> Dict[int, float]:
+    """Convierte "43:300,12:60" en {43: 300.0, 12: 60.0}"""
+    valores = {}
+    for parte in valor.split(","):
+        if ":" not in parte:
+            continue
+        entidad, numero = parte.split(":", 1)
+        valores[int(entidad.strip())] = float(numero.strip())
+    return valores
+
+
+def _normalizar(valor: Any) -> Any:
+    """Normaliza recursivamente un valor para que consultas equivalentes generen la misma clave"""
+    if isinstance(valor, dict):
+        return {str(k): _normalizar(v) for k, v in sorted(valor.items(), key=lambda item: str(item[0]))}
+    if isinstance(valor, (list, tuple)):
+        return [_normalizar(v) for v in valor]
+    if isinstance(valor, str):
+        return valor.strip()
+    return valor
+
+
+def clave_consulta(input_data: BaseModel) -> str:
+    """
+    Genera la clave canónica de una consulta a partir de su modelo de entrada.
+    Excluye credenciales, ordena los filtros y los IDs de `select_fields`.
+    """
+    datos = input_data.model_dump(mode="json", exclude=CAMPOS_CREDENCIALES)
+    if isinstance(datos.get("select_fields"), str):
+        campos = {campo.strip() for campo in datos["select_fields"].split(",") if campo.strip()}
+        datos["select_fields"] = ",".join(sorted(campos))
+    return json.dumps(_normalizar(datos), sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+
+
+class SQLiteCacheBackend:
+    """Persistencia opcional del cache en SQLite, para no arrancar en frío tras un reinicio"""
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False)
+        with self._conexion:
+            self._conexion.execute(
+                "CREATE TABLE IF NOT EXISTS cache_consultas ("
+                " clave TEXT PRIMARY KEY,"
+                " entity_id INTEGER,"
+                " valor TEXT NOT NULL,"
+                " guardado REAL NOT NULL)"
+            )
+
+    def obtener(self, clave: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        with self._lock:
+            fila = self._conexion.execute(
+                "SELECT valor, guardado FROM cache_consultas WHERE clave = ?", (clave,)
+            ).fetchone()
+        if fila is None:
+            return None
+        return json.loads(fila[0]), fila[1]
+
+    def guardar(self, clave: str, entity_id: Optional[int], valor: Dict[str, Any], guardado: float):
+        with self._lock, self._conexion:
+            self._conexion.execute(
+                "INSERT OR REPLACE INTO cache_consultas (clave, entity_id, valor, guardado) VALUES (?, ?, ?, ?)",
+                (clave, entity_id, json.dumps(valor, ensure_ascii=False), guardado),
+            )
+
+    def eliminar(self, clave: str):
+        with self._lock, self._conexion:
+            self._conexion.execute("DELETE FROM cache_consultas WHERE clave = ?", (clave,))
+
+    def purgar(self, antes_de: float):
+        """Elimina las entradas guardadas antes del instante indicado"""
+        with self._lock, self._conexion:
+            self._conexion.execute("DELETE FROM cache_consultas WHERE guardado < ?", (antes_de,))
+
+    def limpiar(self, entity_id: Optional[int] = None):
+        with self._lock, self._conexion:
+            if entity_id is None:
+                self._conexion.execute("DELETE FROM cache_consultas")
+            else:
+                self._conexion.execute("DELETE FROM cache_consultas WHERE entity_id = ?", (entity_id,))
+
+
+class CacheConsultas:
+    """
+    Cache TTL + LRU para los resultados de consultas `select` a Rukovoditel.
+    La memoria está acotada por `max_entries`; el TTL se configura por entidad.
+    Pasado el TTL, una entrada se conserva durante el margen `vencido` de su entidad para que
+    quien la pida con `aceptar_vencida` la entregue mientras la actualiza en segundo plano.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        ttl: float = CACHE_TTL,
+        ttl_por_entidad: Optional[Dict[int, float]] = None,
+        backend: Optional[SQLiteCacheBackend] = None,
+        vencido: float = CACHE_VENCIDO,
+        vencido_por_entidad: Optional[Dict[int, float]] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.ttl_por_entidad = ttl_por_entidad or {}
+        self.vencido = vencido
+        self.vencido_por_entidad = vencido_por_entidad or {}
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        # Se incrementa en cada invalidación, o cuando una consulta guardada de nuevo trae otro resultado,
+        # para que los caches derivados sepan que los datos cambiaron
+        self.generacion = 0
+        self._lock = threading.Lock()
+        # clave -> (entity_id, valor, guardado)
+        self._entradas: "OrderedDict[str, Tuple[Optional[int], Dict[str, Any], float]]" = OrderedDict()
+
+    def ttl_para(self, entity_id: Optional[int]) -> float:
+        """TTL en segundos aplicable a una entidad"""
+        return self.ttl_por_entidad.get(entity_id, self.ttl)
+
+    def vencido_para(self, entity_id: Optional[int]) -> float:
+        """Segundos después del TTL en los que una entrada todavía se puede entregar vencida"""
+        return self.vencido_por_entidad.get(entity_id, self.vencido)
+
+    def obtener(self, clave: str, entity_id: Optional[int] = None,
+                aceptar_vencida: bool = False) -> Optional[Tuple[Dict[str, Any], float]]:
+        """
+        Busca una entrada vigente en el cache
+
+        Args:
+            clave: Clave canónica de la consulta
+            entity_id: Entidad, para aplicar su TTL
+            aceptar_vencida: Devolver también entradas vencidas dentro del margen de la entidad;
+                quien llama las reconoce porque su antigüedad supera `ttl_para(entity_id)`
+
+        Returns:
+            Tupla (valor, antigüedad en segundos) o None si no hay una entrada vigente
+        """
+        ahora = time.time()
+        ttl = self.ttl_para(entity_id)
+        limite = ttl + self.vencido_para(entity_id)
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None:
+                _, valor, guardado = entrada
+                if ahora - guardado <= ttl or (aceptar_vencida and ahora - guardado <= limite):
+                    self._entradas.move_to_end(clave)
+                    self._contar_hit(ahora - guardado > ttl)
+                    return valor, ahora - guardado
+                if ahora - guardado > limite:
+                    del self._entradas[clave]
+
+        # Si no está en memoria, intentar con el backend persistente
+        if self.backend is not None:
+            persistida = self.backend.obtener(clave)
+            if persistida is not None:
+                valor, guardado = persistida
+                if ahora - guardado <= ttl or (aceptar_vencida and ahora - guardado <= limite):
+                    with self._lock:
+                        self._insertar(clave, entity_id, valor, guardado)
+                        self._contar_hit(ahora - guardado > ttl)
+                    return valor, ahora - guardado
+                if ahora - guardado > limite:
+                    self.backend.eliminar(clave)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _contar_hit(self, vencida: bool):
+        """Cuenta un acierto (requiere el lock)"""
+        self.hits += 1
+        self.stale_hits += vencida
+
+    def guardar(self, clave: str, valor: Dict[str, Any], entity_id: Optional[int] = None):
+        """Guarda un resultado en el cache (y en el backend persistente si existe)"""
+        guardado = time.time()
+        with self._lock:
+            anterior = self._entradas.get(clave)
+            if anterior is not None and anterior[1] != valor:
+                # Los datos de esta consulta cambiaron (por ejemplo, al revalidar una entrada vencida)
+                self.generacion += 1
+            self._insertar(clave, entity_id, valor, guardado)
+        if self.backend is not None:
+            self.backend.guardar(clave, entity_id, valor, guardado)
+            entidades = {None, *self.ttl_por_entidad, *self.vencido_por_entidad}
+            ttl_maximo = max(self.ttl_para(e) + self.vencido_para(e) for e in entidades)
+            self.backend.purgar(guardado - ttl_maximo)
+
+    def _insertar(self, clave: str, entity_id: Optional[int], valor: Dict[str, Any], guardado: float):
+        """Inserta una entrada y desaloja las menos usadas recientemente (requiere el lock)"""
+        self._entradas[clave] = (entity_id, valor, guardado)
+        self._entradas.move_to_end(clave)
+        while len(self._entradas) > self.max_entries:
+            self._entradas.popitem(last=False)
+
+    def invalidar(self, entity_id: Optional[int] = None):
+        """Elimina todas las entradas, o solo las de una entidad"""
+        with self._lock:
+            self.generacion += 1
+            if entity_id is None:
+                self._entradas.clear()
+            else:
+                for clave in [c for c, (e, _, _) in self._entradas.items() if e == entity_id]:
+                    del self._entradas[clave]
+        if self.backend is not None:
+            self.backend.limpiar(entity_id)
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """Contadores de aciertos y fallos para reportar en los metadatos"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale_hits": self.stale_hits,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "entries": len(self._entradas),
+                "max_entries": self.max_entries,
+            }
+
+
+_cache_compartido: Optional[CacheConsultas] = None
+_cache_lock = threading.Lock()
+
+
+def obtener_cache() -> CacheConsultas:
+    """Devuelve el cache de consultas compartido por todo el proceso"""
+    global _cache_compartido
+    if _cache_compartido is None:
+        with _cache_lock:
+            if _cache_compartido is None:
+                _cache_compartido = CacheConsultas(
+                    ttl_por_entidad=parsear_por_entidad(CACHE_TTL_POR_ENTIDAD),
+                    backend=SQLiteCacheBackend(CACHE_SQLITE) if CACHE_SQLITE else None,
+                    vencido_por_entidad=parsear_por_entidad(CACHE_VENCIDO_POR_ENTIDAD),
+                )
+    return _cache_compartido
@@ -0,0 +1,248 @@
+import os
+import re
+import time
+import threading
+from collections import OrderedDict, Counter
+from typing import Optional, Dict, Any, Tuple, FrozenSet, Set
+
+from dotenv import load_dotenv
+
+from mi_agente_ai.services.cache import obtener_cache, CACHE_TTL, CACHE_TTL_POR_ENTIDAD, parsear_por_entidad
+from mi_agente_ai.services.sincronizacion import obtener_sincronizador
+from mi_agente_ai.utils.texto import normalizar_texto
+
+# Cargar variables de entorno
+load_dotenv()
+
+RESPUESTAS_MAX_ENTRIES = int(os.getenv("AGENTE_CACHE_RESPUESTAS_MAX", "256"))
+# Segundos de vigencia de una respuesta (0 = cache de respuestas desactivado). Sin espejo local
+# nunca supera el TTL del cache de consultas, para no sobrevivir a los datos con los que se armó.
+RESPUESTAS_TTL = float(os.getenv("AGENTE_CACHE_RESPUESTAS_TTL", "600"))
+# Similitud mínima (0 a 1) entre dos preguntas para reutilizar la respuesta; 1 = solo preguntas equivalentes.
+# Aun por debajo de 1, los nombres y números tienen que coincidir exactamente.
+RESPUESTAS_SIMILITUD = float(os.getenv("AGENTE_CACHE_RESPUESTAS_SIMILITUD", "1"))
+
+_NO_ALFANUMERICO = re.compile(r"[^a-z0-9 ]+")
+
+# Palabras que no cambian el sentido de la consulta
+_PALABRAS_VACIAS = {
+    "a", "al", "algun", "alguna", "con", "cual", "cuales", "de", "del", "dame", "decime", "el", "en", "es",
+    "esta", "estan", "fue", "fueron", "ha", "hay", "la", "las", "lo", "los", "me", "mostrame", "muestrame",
+    "para", "por", "porfa", "favor", "que", "quiero", "saber", "se", "sus", "su", "tiene", "tienen", "tuvo",
+    "tuvieron", "un", "una", "y", "hola", "podrias", "puedes", "podes", "necesito", "ver", "listar", "lista",
+}
+
+# Términos generales de las consultas (ya singularizados): solo en estos se toleran variaciones;
+# cualquier otro término (nombres, meses, números) tiene que coincidir exactamente
+_TERMINOS_GENERALES = {
+    "licencia", "encargado", "empleado", "persona", "dato", "informacion", "registro", "detalle",
+    "consulta", "consultar", "buscar", "busca", "mostrar", "todo", "toda",
+}
+
+# Términos de fechas y rangos: su orden cambia el sentido ("de enero a marzo" no es "de marzo a enero")
+_TERMINOS_FECHA = {
+    "enero", "febrero", "marzo", "abril", "mayo", "junio", "julio", "agosto", "septiembre", "setiembre",
+    "octubre", "noviembre", "diciembre", "hoy", "ayer", "manana",
+}
+
+
+def normalizar_prompt(prompt: str) -> str:
+    """Minúsculas, sin acentos, sin signos de puntuación y con espacios simples"""
+    return " ".join(_NO_ALFANUMERICO.sub(" ", normalizar_texto(prompt)).split())
+
+
+def _raiz(palabra: str) -> str:
+    """Singulariza de forma aproximada ("licencias" -> "licencia", "meses" -> "mes")"""
+    if len(palabra) > 4 and palabra.endswith("es") and not palabra.endswith("ees"):
+        return palabra[:-2] if palabra[-3] not in "aeiou" else palabra[:-1]
+    if len(palabra) > 3 and palabra.endswith("s"):
+        return palabra[:-1]
+    return palabra
+
+
+def terminos_prompt(prompt: str) -> FrozenSet[str]:
+    """
+    Términos significativos de una consulta: sin palabras vacías ni orden, salvo el de las fechas,
+    que se conserva en un término adicional con la secuencia de fechas de la consulta
+    """
+    palabras = normalizar_prompt(prompt).split()
+    terminos = {_raiz(p) for p in palabras if p not in _PALABRAS_VACIAS}
+    fechas = [p for p in palabras if p in _TERMINOS_FECHA or p.isdigit()]
+    if len(fechas) > 1:
+        terminos.add(">".join(fechas))
+    return frozenset(terminos)
+
+
+def _trigramas(texto: str) -> Counter:
+    texto = f"  {texto} "
+    return Counter(texto[i:i + 3] for i in range(len(texto) - 2))
+
+
+def similitud(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    """Coeficiente de Dice entre los trigramas de caracteres de dos conjuntos de términos"""
+    if a == b:
+        return 1.0
+    # Los nombres y números (años, días, IDs) deben coincidir exactamente: "Luis" y "Luisa" son
+    # personas distintas aunque sus trigramas se parezcan
+    if a - _TERMINOS_GENERALES != b - _TERMINOS_GENERALES:
+        return 0.0
+    ta, tb = _trigramas(" ".join(sorted(a))), _trigramas(" ".join(sorted(b)))
+    total = sum(ta.values()) + sum(tb.values())
+    return 2 * sum((ta & tb).values()) / total if total else 0.0
+
+
+def version_datos() -> Tuple[Optional[int], int]:
+    """
+    Versión de los datos de licencias: la del espejo local (si hay sincronización) y la
+    generación del cache de consultas. Si cambia, las respuestas guardadas dejan de valer.
+    """
+    sincronizador = obtener_sincronizador()
+    version_espejo = None
+    if sincronizador is not None:
+        version_espejo = sincronizador.almacen.estado(sincronizador.entity_id)["version"]
+    return version_espejo, obtener_cache().generacion
+
+
+def ttl_maximo_respuestas() -> float:
+    """
+    Vigencia máxima de una respuesta según el origen de los datos: con el espejo local su versión
+    detecta los cambios; sin él, una respuesta no puede durar más que los resultados de consultas
+    con los que se armó (el menor TTL del cache de consultas)
+    """
+    if obtener_sincronizador() is not None:
+        return float("inf")
+    return min([CACHE_TTL, *parsear_por_entidad(CACHE_TTL_POR_ENTIDAD).values()])
+
+
+class CacheRespuestas:
+    """
+    Cache de respuestas del agente por pregunta. Las preguntas se comparan normalizadas
+    (mayúsculas, tildes, espacios, puntuación, orden y palabras vacías) y, si la similitud
+    configurada es menor a 1, también por similitud de trigramas para reconocer variaciones menores.
+    """
+
+    def __init__(self, max_entries: int = RESPUESTAS_MAX_ENTRIES, ttl: float = RESPUESTAS_TTL,
+                 similitud_minima: float = RESPUESTAS_SIMILITUD):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similitud_minima = similitud_minima
+        self._lock = threading.Lock()
+        # términos -> (respuesta, versión de los datos, guardado, segundos que tardó generarla, vigencia)
+        self._entradas: "OrderedDict[FrozenSet[str], Tuple[Dict[str, Any], Any, float, float, float]]" = OrderedDict()
+        # término -> claves que lo contienen, para acotar la búsqueda de preguntas parecidas
+        self._por_termino: Dict[str, Set[FrozenSet[str]]] = {}
+        self.hits_exactos = 0
+        self.hits_similares = 0
+        self.misses = 0
+        self.ahorro_total = 0.0
+        self.busqueda_total = 0.0
+
+    @property
+    def activo(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def obtener(self, prompt: str, version: Any) -> Optional[Tuple[Dict[str, Any], float]]:
+        """
+        Busca la respuesta de una pregunta igual o parecida con la misma versión de datos
+
+        Returns:
+            Tupla (respuesta, similitud) o None
+        """
+        inicio = time.perf_counter()
+        terminos = terminos_prompt(prompt)
+        ahora = time.time()
+        with self._lock:
+            clave, puntaje = (terminos, 1.0) if terminos in self._entradas else self._mas_parecida(terminos)
+            entrada = self._entradas.get(clave) if clave is not None else None
+            if entrada is not None and (entrada[1] != version or ahora - entrada[2] > entrada[4]):
+                self._eliminar(clave)
+                entrada = None
+            duracion_busqueda = time.perf_counter() - inicio
+            self.busqueda_total += duracion_busqueda
+            if entrada is None:
+                self.misses += 1
+                return None
+            self._entradas.move_to_end(clave)
+            if puntaje == 1.0:
+                self.hits_exactos += 1
+            else:
+                self.hits_similares += 1
+            self.ahorro_total += max(0.0, entrada[3] - duracion_busqueda)
+            return dict(entrada[0]), puntaje
+
+    def _mas_parecida(self, terminos: FrozenSet[str]) -> Tuple[Optional[FrozenSet[str]], float]:
+        """Clave guardada más parecida por encima de la similitud mínima (requiere el lock)"""
+        if self.similitud_minima >= 1 or not terminos:
+            return None, 0.0
+        candidatas = set().union(*(self._por_termino.get(t, set()) for t in terminos))
+        mejor, mejor_puntaje = None, 0.0
+        for candidata in candidatas:
+            puntaje = similitud(terminos, candidata)
+            if puntaje >= self.similitud_minima and puntaje > mejor_puntaje:
+                mejor, mejor_puntaje = candidata, puntaje
+        return mejor, mejor_puntaje
+
+    def guardar(self, prompt: str, respuesta: Dict[str, Any], version: Any, duracion: float,
+                ttl_maximo: float = float("inf")):
+        """
+        Guarda la respuesta de una pregunta junto con la versión de los datos y lo que tardó;
+        `ttl_maximo` acota su vigencia (ver `ttl_maximo_respuestas`)
+        """
+        terminos = terminos_prompt(prompt)
+        vigencia = min(self.ttl, ttl_maximo)
+        if not terminos or vigencia <= 0:
+            return
+        with self._lock:
+            self._eliminar(terminos)
+            self._entradas[terminos] = (dict(respuesta), version, time.time(), duracion, vigencia)
+            for termino in terminos:
+                self._por_termino.setdefault(termino, set()).add(terminos)
+            while len(self._entradas) > self.max_entries:
+                self._eliminar(next(iter(self._entradas)))
+
+    def _eliminar(self, clave: FrozenSet[str]):
+        """Elimina una entrada y sus referencias en el índice (requiere el lock)"""
+        if self._entradas.pop(clave, None) is None:
+            return
+        for termino in clave:
+            claves = self._por_termino.get(termino)
+            if claves is not None:
+                claves.discard(clave)
+                if not claves:
+                    del self._por_termino[termino]
+
+    def invalidar(self):
+        with self._lock:
+            self._entradas.clear()
+            self._por_termino.clear()
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """Aciertos, fallos y tiempo ahorrado para exportar como métricas"""
+        with self._lock:
+            hits = self.hits_exactos + self.hits_similares
+            total = hits + self.misses
+            return {
+                "hits": hits,
+                "hits_exactos": self.hits_exactos,
+                "hits_similares": self.hits_similares,
+                "misses": self.misses,
+                "hit_rate": round(hits / total, 3) if total else 0.0,
+                "ahorro_s": round(self.ahorro_total, 3),
+                "busqueda_media_ms": round(self.busqueda_total / total * 1000, 3) if total else 0.0,
+                "entries": len(self._entradas),
+                "max_entries": self.max_entries,
+            }
+
+
+_cache_respuestas: Optional[CacheRespuestas] = None
+_cache_respuestas_lock = threading.Lock()
+
+
+def obtener_cache_respuestas() -> CacheRespuestas:
+    """Devuelve el cache de respuestas compartido por todo el proceso"""
+    global _cache_respuestas
+    if _cache_respuestas is None:
+        with _cache_respuestas_lock:
+            if _cache_respuestas is None:
+                _cache_respuestas = CacheRespuestas()
+    return _cache_respuestas
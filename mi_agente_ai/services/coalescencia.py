@@ -0,0 +1,182 @@
+import asyncio
+import threading
+import concurrent.futures
+from typing import Optional, Dict, Any, Callable, Awaitable, Tuple, TypeVar, Set
+
+from mi_agente_ai.utils.loop import loop_compartido
+
+T = TypeVar("T")
+
+
+class _Vuelo:
+    """Una petición en curso y quienes esperan su resultado"""
+    __slots__ = ("clave", "futuro", "esperando", "tarea", "loop")
+
+    def __init__(self, clave: str):
+        self.clave = clave
+        # Un Future de concurrent.futures se puede esperar desde hilos y, con `asyncio.wrap_future`,
+        # desde cualquier event loop, así que sirve a los dos tipos de llamadas
+        self.futuro: concurrent.futures.Future = concurrent.futures.Future()
+        self.esperando = 1
+        self.tarea: Optional[asyncio.Task] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+class CoalescedorConsultas:
+    """
+    Registro de peticiones en vuelo ("single-flight"): mientras una consulta está en curso,
+    las llamadas concurrentes con la misma clave esperan su resultado en lugar de repetirla.
+    Funciona con llamadas desde hilos (`ejecutar`) y desde asyncio (`aejecutar`), y entre ellas.
+
+    Si todas las llamadas asíncronas que esperan una petición se cancelan (por ejemplo por el
+    timeout del agente), la petición también se cancela.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._vuelos: Dict[str, _Vuelo] = {}
+        self.peticiones = 0
+        self.coalescidas = 0
+        self.revalidaciones = 0
+        self.revalidaciones_fallidas = 0
+        self.ultimo_error_revalidacion: Optional[str] = None
+        # Referencias a las revalidaciones en curso, para que no se pierdan antes de terminar
+        self._revalidando: Set[asyncio.Task] = set()
+
+    def _unirse(self, clave: str) -> Tuple[_Vuelo, bool]:
+        """Devuelve el vuelo de la clave y si quien llama es el primero (y por lo tanto debe ejecutarlo)"""
+        with self._lock:
+            vuelo = self._vuelos.get(clave)
+            if vuelo is not None:
+                vuelo.esperando += 1
+                self.coalescidas += 1
+                return vuelo, False
+            vuelo = self._vuelos[clave] = _Vuelo(clave)
+            self.peticiones += 1
+            return vuelo, True
+
+    def _terminar(self, vuelo: _Vuelo):
+        # Solo se quita si sigue registrado: un vuelo abandonado ya pudo haber sido reemplazado
+        if self._vuelos.get(vuelo.clave) is vuelo:
+            del self._vuelos[vuelo.clave]
+
+    def ejecutar(self, clave: str, funcion: Callable[[], T]) -> Tuple[T, bool]:
+        """
+        Ejecuta `funcion` o espera la ejecución en curso con la misma clave
+
+        Returns:
+            Tupla (resultado, True si se compartió el resultado de otra llamada)
+        """
+        while True:
+            vuelo, primero = self._unirse(clave)
+            if primero:
+                break
+            try:
+                return vuelo.futuro.result(), True
+            except concurrent.futures.CancelledError:
+                # La petición esperada se canceló (por ejemplo, la abandonaron las llamadas asíncronas
+                # que la iniciaron): se quita del registro y se vuelve a intentar, quizás como primera
+                with self._lock:
+                    self._terminar(vuelo)
+        try:
+            resultado = funcion()
+        except BaseException as e:
+            vuelo.futuro.set_exception(e)
+            raise
+        else:
+            vuelo.futuro.set_result(resultado)
+            return resultado, False
+        finally:
+            with self._lock:
+                self._terminar(vuelo)
+
+    async def aejecutar(self, clave: str, funcion: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """
+        Versión asíncrona de `ejecutar`. La petición corre en una tarea aparte, así que si quien
+        la inició se cancela, las demás llamadas que la esperan igual reciben el resultado.
+        """
+        vuelo, primero = self._unirse(clave)
+        if primero:
+            vuelo.loop = asyncio.get_running_loop()
+            vuelo.tarea = vuelo.loop.create_task(self._volar(vuelo, funcion))
+        try:
+            return await asyncio.shield(asyncio.wrap_future(vuelo.futuro)), not primero
+        except asyncio.CancelledError:
+            self._abandonar(vuelo)
+            raise
+
+    async def _volar(self, vuelo: _Vuelo, funcion: Callable[[], Awaitable[Any]]):
+        try:
+            resultado = await funcion()
+        except asyncio.CancelledError:
+            vuelo.futuro.cancel()
+            raise
+        except BaseException as e:
+            vuelo.futuro.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+        else:
+            vuelo.futuro.set_result(resultado)
+        finally:
+            with self._lock:
+                self._terminar(vuelo)
+
+    def _abandonar(self, vuelo: _Vuelo):
+        """
+        Una llamada dejó de esperar; sin nadie esperando la petición se cancela y se quita del
+        registro, para que una llamada nueva con la misma clave no reciba la cancelación
+        """
+        with self._lock:
+            vuelo.esperando -= 1
+            cancelar = vuelo.esperando == 0 and vuelo.tarea is not None and not vuelo.futuro.done()
+            if cancelar:
+                self._terminar(vuelo)
+        if cancelar:
+            vuelo.loop.call_soon_threadsafe(vuelo.tarea.cancel)
+
+    def revalidar(self, clave: str, funcion: Callable[[], Awaitable[Any]]) -> bool:
+        """
+        Ejecuta `funcion` en segundo plano sin esperarla (por ejemplo para actualizar un resultado
+        entregado vencido), salvo que ya haya una petición en curso con la misma clave. Fuera de un
+        event loop corre en el loop compartido del proceso. Los errores no se propagan: se cuentan en
+        las estadísticas junto con el último mensaje.
+
+        Returns:
+            True si se inició una revalidación
+        """
+        with self._lock:
+            if clave in self._vuelos:
+                return False
+            self.revalidaciones += 1
+        corrutina = self._revalidar(clave, funcion)
+        try:
+            tarea = asyncio.get_running_loop().create_task(corrutina)
+        except RuntimeError:
+            loop_compartido.enviar(corrutina)
+            return True
+        self._revalidando.add(tarea)
+        tarea.add_done_callback(self._revalidando.discard)
+        return True
+
+    async def _revalidar(self, clave: str, funcion: Callable[[], Awaitable[Any]]):
+        try:
+            await self.aejecutar(clave, funcion)
+        except Exception as e:
+            # Quien recibió el resultado vencido ya tiene su respuesta; la próxima consulta lo reintenta
+            with self._lock:
+                self.revalidaciones_fallidas += 1
+                self.ultimo_error_revalidacion = str(e)
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"en_curso": len(self._vuelos), "peticiones": self.peticiones, "coalescidas": self.coalescidas,
+                    "revalidaciones": self.revalidaciones, "revalidaciones_fallidas": self.revalidaciones_fallidas,
+                    "ultimo_error_revalidacion": self.ultimo_error_revalidacion}
+
+
+_coalescedor = CoalescedorConsultas()
+
+
+def obtener_coalescedor() -> CoalescedorConsultas:
+    """Devuelve el registro de peticiones en vuelo compartido por todo el proceso"""
+    return _coalescedor
@@ -0,0 +1,112 @@
+from typing import Optional, Dict, Any, Callable, Awaitable, Tuple
+
+from mi_agente_ai.services.cache import obtener_cache
+from mi_agente_ai.services.coalescencia import obtener_coalescedor
+from mi_agente_ai.services.respaldo import obtener_respaldo
+
+# `pedir` trae la respuesta cruda de la API; `transformar` la convierte en el resultado de la
+# herramienta ({"error": ...} si la API respondió con un error, que no se guarda en el cache)
+PedirAsync = Callable[[], Awaitable[Dict[str, Any]]]
+Pedir = Callable[[], Dict[str, Any]]
+Transformar = Callable[[Dict[str, Any]], Dict[str, Any]]
+
+
+def _guardar(clave: str, entity_id: Optional[int], transformar: Transformar,
+             response_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Transforma la respuesta de la API y la guarda en el cache si fue exitosa"""
+    resultado = transformar(response_data)
+    if "error" not in resultado:
+        obtener_cache().guardar(clave, resultado, entity_id)
+    return resultado
+
+
+async def _arefrescar(clave: str, entity_id: Optional[int], pedir: PedirAsync,
+                      transformar: Transformar) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+    """
+    Pide la consulta a la API, con una petición de respaldo si tarda más que lo habitual para la
+    entidad (ver `PeticionesRespaldo`), y guarda el resultado en el cache
+
+    Returns:
+        Tupla (resultado, datos del respaldo o None si no se lanzó)
+    """
+    response_data, respaldo = await obtener_respaldo(entity_id).aejecutar(pedir)
+    return _guardar(clave, entity_id, transformar, response_data), respaldo
+
+
+def _metadatos_consulta(respaldo: Optional[Dict[str, Any]], compartida: bool) -> Dict[str, Any]:
+    metadatos = {
+        "entrega": "duplicada" if respaldo is not None else "fresca",
+        "cache": {"hit": False},
+        "coalescencia": {"compartida": compartida},
+    }
+    if respaldo is not None:
+        metadatos["respaldo"] = respaldo
+    return metadatos
+
+
+def buscar_en_cache(clave: str, entity_id: Optional[int], pedir: PedirAsync,
+                    transformar: Transformar) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """
+    Resultado cacheado de una consulta. Una entrada vencida dentro del margen de su entidad también
+    se entrega, y se actualiza en segundo plano con `pedir` (una sola vez aunque la pidan varias llamadas)
+
+    Returns:
+        Tupla (resultado, metadatos de la entrega) o None si no hay una entrada utilizable
+    """
+    cache = obtener_cache()
+    encontrado = cache.obtener(clave, entity_id, aceptar_vencida=True)
+    if encontrado is None:
+        return None
+    resultado, antiguedad = encontrado
+    vencida = antiguedad > cache.ttl_para(entity_id)
+    if vencida:
+        obtener_coalescedor().revalidar(clave, lambda: _arefrescar(clave, entity_id, pedir, transformar))
+    return resultado, {"entrega": "vencida" if vencida else "fresca", "cache": {"hit": True, "age_s": round(antiguedad, 1)}}
+
+
+async def aconsultar(clave: str, entity_id: Optional[int], pedir: PedirAsync,
+                     transformar: Transformar) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Pide la consulta a la API sin pasar por el cache: las llamadas concurrentes con la misma clave
+    comparten una sola petición, que puede llevar respaldo, y el resultado queda en el cache
+
+    Returns:
+        Tupla (resultado, metadatos de la entrega)
+
+    Raises:
+        httpx.HTTPError, RukovoditelJSONError: Si falla la petición
+    """
+    (resultado, respaldo), compartida = await obtener_coalescedor().aejecutar(
+        clave, lambda: _arefrescar(clave, entity_id, pedir, transformar)
+    )
+    return resultado, _metadatos_consulta(respaldo, compartida)
+
+
+def consultar(clave: str, entity_id: Optional[int], pedir: Pedir,
+              transformar: Transformar) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Versión síncrona de `aconsultar`, sin peticiones de respaldo"""
+    # El valor compartido tiene la misma forma que en `aconsultar`, porque las llamadas síncronas y
+    # asíncronas con la misma clave pueden esperarse entre sí
+    (resultado, respaldo), compartida = obtener_coalescedor().ejecutar(
+        clave, lambda: (_guardar(clave, entity_id, transformar, pedir()), None)
+    )
+    return resultado, _metadatos_consulta(respaldo, compartida)
+
+
+async def aobtener(clave: str, entity_id: Optional[int], pedir: PedirAsync,
+                   transformar: Transformar) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Resultado de una consulta desde el cache (entregando vencidas mientras se revalidan) o, si no
+    está, desde la API con coalescencia y respaldo
+
+    Returns:
+        Tupla (resultado, metadatos de la entrega: `entrega`, `cache` y, si hubo petición,
+        `coalescencia` y `respaldo`)
+
+    Raises:
+        httpx.HTTPError, RukovoditelJSONError: Si falla la petición
+    """
+    cacheado = buscar_en_cache(clave, entity_id, pedir, transformar)
+    if cacheado is not None:
+        return cacheado
+    return await aconsultar(clave, entity_id, pedir, transformar)
@@ -0,0 +1,483 @@
+import os
+import time
+import random
+import asyncio
+import threading
+import email.utils
+import contextlib
+from collections import deque
+from typing import Optional, Dict, Any, Callable, Awaitable
+
+import httpx
+from dotenv import load_dotenv
+
+# Cargar variables de entorno
+load_dotenv()
+
+# Valores por defecto de cada servicio externo. Todos se pueden cambiar con variables
+# `<SERVICIO>_<PARAMETRO>`, por ejemplo RUKOVODITEL_TASA o GROQ_CONCURRENCIA_MAX.
+CONFIGURACION_POR_DEFECTO: Dict[str, Dict[str, float]] = {
+    "rukovoditel": {
+        "TASA": 10,                 # peticiones por segundo (0 = sin límite)
+        "RAFAGA": 20,               # peticiones que se pueden hacer de golpe
+        "CONCURRENCIA_MIN": 1,
+        "CONCURRENCIA_MAX": 8,
+        "LATENCIA_OBJETIVO": 2,     # segundos; por encima se reduce la concurrencia
+        "REINTENTOS": 3,
+        "ESPERA_BASE": 0.5,         # segundos del primer reintento (backoff exponencial con jitter)
+        "ESPERA_MAX": 10,
+        "CIRCUITO_FALLOS": 5,       # fallos seguidos que abren el circuito
+        "CIRCUITO_APERTURA": 30,    # segundos que el circuito queda abierto
+    },
+    "groq": {
+        "TASA": 0.5,
+        "RAFAGA": 5,
+        "CONCURRENCIA_MIN": 1,
+        "CONCURRENCIA_MAX": 4,
+        "LATENCIA_OBJETIVO": 15,
+        "REINTENTOS": 3,
+        "ESPERA_BASE": 1,
+        "ESPERA_MAX": 30,
+        "CIRCUITO_FALLOS": 5,
+        "CIRCUITO_APERTURA": 30,
+    },
+}
+
+# Respuestas que indican saturación o una falla transitoria y se pueden reintentar
+ESTADOS_SATURACION = {429}
+ESTADOS_TRANSITORIOS = {502, 503, 504}
+
+
+class CircuitoAbierto(httpx.TransportError):
+    """El servicio externo falló demasiadas veces seguidas y no se le envían peticiones por un tiempo"""
+
+    def __init__(self, servicio: str, reintentar_en: float, request: Optional[httpx.Request] = None):
+        super().__init__(
+            f"El servicio {servicio} no está disponible por fallas repetidas; reintentar en {reintentar_en:.0f} s",
+            request=request,
+        )
+        self.servicio = servicio
+        self.reintentar_en = reintentar_en
+
+
+def segundos_retry_after(response: httpx.Response) -> Optional[float]:
+    """Segundos indicados por el encabezado Retry-After (en segundos o como fecha HTTP), o None"""
+    valor = response.headers.get("retry-after")
+    if not valor:
+        return None
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+    try:
+        fecha = email.utils.parsedate_to_datetime(valor)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, fecha.timestamp() - time.time())
+
+
+class CuboTokens:
+    """
+    Limitador de tasa por cubo de tokens. Cada petición reserva un token y recibe cuánto debe
+    esperar; la espera se hace fuera del lock, así que sirve tanto para código síncrono como asíncrono.
+    """
+
+    def __init__(self, tasa: float, capacidad: float):
+        self.tasa = tasa
+        self.capacidad = max(1.0, capacidad)
+        self._tokens = self.capacidad
+        self._actualizado = time.monotonic()
+        self._pausa_hasta = 0.0
+        self._lock = threading.Lock()
+
+    def reservar(self) -> float:
+        """Reserva un token y devuelve los segundos a esperar antes de usarlo"""
+        with self._lock:
+            ahora = time.monotonic()
+            pausa = max(0.0, self._pausa_hasta - ahora)
+            if self.tasa <= 0:
+                return pausa
+            self._tokens = min(self.capacidad, self._tokens + (ahora - self._actualizado) * self.tasa)
+            self._actualizado = ahora
+            self._tokens -= 1
+            return max(pausa, -self._tokens / self.tasa)
+
+    def pausar(self, segundos: float):
+        """Detiene todas las peticiones por unos segundos (por ejemplo al recibir un Retry-After)"""
+        with self._lock:
+            self._pausa_hasta = max(self._pausa_hasta, time.monotonic() + segundos)
+
+    @property
+    def disponibles(self) -> float:
+        with self._lock:
+            if self.tasa <= 0:
+                return float("inf")
+            return min(self.capacidad, self._tokens + (time.monotonic() - self._actualizado) * self.tasa)
+
+
+class ConcurrenciaAdaptativa:
+    """
+    Límite de peticiones simultáneas ajustado por AIMD: crece de a poco mientras las respuestas
+    llegan rápido y se reduce a la mitad ante un 429 (o un poco ante respuestas lentas o fallidas).
+    Atiende en orden de llegada a quienes esperan desde hilos y desde corrutinas.
+    """
+
+    def __init__(self, minimo: int, maximo: int, latencia_objetivo: float):
+        self.minimo = max(1, minimo)
+        self.maximo = max(self.minimo, maximo)
+        self.latencia_objetivo = latencia_objetivo
+        self.limite = float(self.maximo)
+        self.en_curso = 0
+        self.reducciones = 0
+        self._ultima_reduccion = 0.0
+        self._lock = threading.Lock()
+        # threading.Event para los hilos, (loop, future) para las corrutinas
+        self._esperando: deque = deque()
+
+    def _tomar(self) -> bool:
+        if self.en_curso < int(self.limite):
+            self.en_curso += 1
+            return True
+        return False
+
+    def _repartir(self):
+        """Entrega los lugares libres a quienes esperan (se llama con el lock tomado)"""
+        while self._esperando and self.en_curso < int(self.limite):
+            esperando = self._esperando.popleft()
+            self.en_curso += 1
+            if isinstance(esperando, threading.Event):
+                esperando.set()
+            else:
+                loop, futuro = esperando
+                loop.call_soon_threadsafe(self._despertar, futuro)
+
+    @staticmethod
+    def _despertar(futuro: asyncio.Future):
+        # Si la corrutina ya fue cancelada, ella misma devuelve el lugar
+        if not futuro.done():
+            futuro.set_result(None)
+
+    def adquirir(self):
+        with self._lock:
+            if not self._esperando and self._tomar():
+                return
+            evento = threading.Event()
+            self._esperando.append(evento)
+        evento.wait()
+
+    async def aadquirir(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if not self._esperando and self._tomar():
+                return
+            futuro = loop.create_future()
+            self._esperando.append((loop, futuro))
+        try:
+            await futuro
+        except asyncio.CancelledError:
+            with self._lock:
+                try:
+                    self._esperando.remove((loop, futuro))
+                    raise
+                except ValueError:
+                    pass
+            # El lugar ya había sido asignado: se devuelve
+            self.liberar()
+            raise
+
+    def liberar(self):
+        with self._lock:
+            self.en_curso -= 1
+            self._repartir()
+
+    def registrar(self, latencia: float, saturado: bool = False, fallido: bool = False):
+        """Ajusta el límite según el resultado de una petición"""
+        with self._lock:
+            ahora = time.monotonic()
+            if saturado or fallido or latencia > self.latencia_objetivo:
+                # Una sola reducción por ventana, para no desplomar el límite con una ráfaga de respuestas lentas
+                if ahora - self._ultima_reduccion >= min(self.latencia_objetivo, 1.0):
+                    factor = 0.5 if saturado else 0.8
+                    self.limite = max(float(self.minimo), self.limite * factor)
+                    self._ultima_reduccion = ahora
+                    self.reducciones += 1
+            else:
+                self.limite = min(float(self.maximo), self.limite + 1.0 / self.limite)
+                self._repartir()
+
+
+class CircuitoInterruptor:
+    """
+    Circuito cerrado / abierto / semiabierto: tras `umbral` fallos seguidos se abre y rechaza las
+    peticiones durante `apertura` segundos; después deja pasar una sola petición de prueba
+    y vuelve a cerrarse si responde bien.
+    """
+
+    def __init__(self, umbral: int, apertura: float):
+        self.umbral = max(1, umbral)
+        self.apertura = apertura
+        self.estado = "cerrado"
+        self.fallos = 0
+        self.aperturas = 0
+        self._abierto_hasta = 0.0
+        self._prueba_en_curso = False
+        self._lock = threading.Lock()
+
+    def permitir(self) -> Optional[float]:
+        """None si la petición puede seguir; si no, los segundos que faltan para volver a intentar"""
+        with self._lock:
+            if self.estado == "cerrado":
+                return None
+            ahora = time.monotonic()
+            if self.estado == "abierto" and ahora >= self._abierto_hasta:
+                self.estado = "semiabierto"
+            if self.estado == "semiabierto" and not self._prueba_en_curso:
+                self._prueba_en_curso = True
+                return None
+            return max(1.0, self._abierto_hasta - ahora)
+
+    def exito(self):
+        with self._lock:
+            self.estado = "cerrado"
+            self.fallos = 0
+            self._prueba_en_curso = False
+
+    def fallo(self):
+        with self._lock:
+            self.fallos += 1
+            if self.estado == "semiabierto" or self.fallos >= self.umbral:
+                if self.estado != "abierto":
+                    self.aperturas += 1
+                self.estado = "abierto"
+                self._abierto_hasta = time.monotonic() + self.apertura
+            self._prueba_en_curso = False
+
+    def abandonar(self):
+        """
+        La petición de prueba terminó sin resultado (por ejemplo, se canceló): vuelve a abierto sin
+        contar un fallo, para que la próxima petición pueda hacer la prueba
+        """
+        with self._lock:
+            if self.estado == "semiabierto" and self._prueba_en_curso:
+                self.estado = "abierto"
+            self._prueba_en_curso = False
+
+
+class ControlServicio:
+    """
+    Control de flujo hacia un servicio externo: limitador de tasa, concurrencia adaptativa,
+    reintentos con backoff exponencial y jitter que respetan Retry-After, y circuito interruptor.
+    Se aplica a nivel de transporte HTTP, así que cubre todas las peticiones del cliente.
+    """
+
+    def __init__(self, nombre: str, configuracion: Optional[Dict[str, float]] = None):
+        self.nombre = nombre
+        config = {**CONFIGURACION_POR_DEFECTO.get(nombre, CONFIGURACION_POR_DEFECTO["rukovoditel"]), **(configuracion or {})}
+        self.reintentos = int(config["REINTENTOS"])
+        self.espera_base = float(config["ESPERA_BASE"])
+        self.espera_max = float(config["ESPERA_MAX"])
+        self.cubo = CuboTokens(float(config["TASA"]), float(config["RAFAGA"]))
+        self.concurrencia = ConcurrenciaAdaptativa(
+            int(config["CONCURRENCIA_MIN"]), int(config["CONCURRENCIA_MAX"]), float(config["LATENCIA_OBJETIVO"])
+        )
+        self.circuito = CircuitoInterruptor(int(config["CIRCUITO_FALLOS"]), float(config["CIRCUITO_APERTURA"]))
+
+        self._lock = threading.Lock()
+        self._contadores = {"peticiones": 0, "reintentos": 0, "saturadas": 0, "fallidas": 0, "rechazadas": 0}
+        self._latencia_media: Optional[float] = None
+
+    @classmethod
+    def desde_entorno(cls, nombre: str) -> "ControlServicio":
+        prefijo = nombre.upper()
+        configuracion = {
+            clave: float(os.getenv(f"{prefijo}_{clave}", str(valor)))
+            for clave, valor in CONFIGURACION_POR_DEFECTO.get(nombre, CONFIGURACION_POR_DEFECTO["rukovoditel"]).items()
+        }
+        return cls(nombre, configuracion)
+
+    def _contar(self, clave: str):
+        with self._lock:
+            self._contadores[clave] += 1
+
+    def _verificar_circuito(self, request: httpx.Request):
+        reintentar_en = self.circuito.permitir()
+        if reintentar_en is not None:
+            self._contar("rechazadas")
+            raise CircuitoAbierto(self.nombre, reintentar_en, request=request)
+
+    @contextlib.contextmanager
+    def _resguardar_circuito(self):
+        """
+        Cubre un intento desde que el circuito lo dejó pasar hasta que se evalúa su respuesta: una
+        excepción inesperada cuenta como fallo y una cancelación no cuenta, pero en ambos casos se
+        libera la petición de prueba del circuito semiabierto
+        """
+        try:
+            yield
+        except Exception:
+            self.circuito.fallo()
+            self._contar("fallidas")
+            raise
+        except BaseException:
+            self.circuito.abandonar()
+            raise
+
+    def _evaluar(self, response: Optional[httpx.Response], latencia: float, intento: int) -> Optional[float]:
+        """
+        Registra el resultado de un intento y decide si se reintenta.
+
+        Returns:
+            Segundos a esperar antes de reintentar, o None si el resultado es definitivo
+        """
+        with self._lock:
+            self._contadores["peticiones"] += 1
+            self._latencia_media = latencia if self._latencia_media is None else 0.8 * self._latencia_media + 0.2 * latencia
+
+        estado = response.status_code if response is not None else None
+        saturado = estado in ESTADOS_SATURACION
+        fallido = response is None or estado in ESTADOS_TRANSITORIOS or estado >= 500
+        self.concurrencia.registrar(latencia, saturado=saturado, fallido=fallido)
+        # Un 429 indica que el servicio responde: no cuenta como fallo para el circuito
+        if fallido:
+            self.circuito.fallo()
+            self._contar("fallidas")
+        else:
+            self.circuito.exito()
+        if saturado:
+            self._contar("saturadas")
+
+        reintentable = response is None or saturado or estado in ESTADOS_TRANSITORIOS
+        if not reintentable or intento >= self.reintentos:
+            return None
+
+        retry_after = segundos_retry_after(response) if response is not None else None
+        if retry_after is not None:
+            # El servidor pidió esperar: se frena a todas las peticiones, no solo a esta
+            self.cubo.pausar(retry_after)
+            return min(retry_after, self.espera_max)
+        # Backoff exponencial con jitter completo
+        return random.uniform(0, min(self.espera_max, self.espera_base * 2 ** intento))
+
+    def enviar(self, request: httpx.Request, enviar: Callable[[httpx.Request], httpx.Response]) -> httpx.Response:
+        intento = 0
+        while True:
+            self._verificar_circuito(request)
+            with self._resguardar_circuito():
+                espera = self.cubo.reservar()
+                if espera > 0:
+                    time.sleep(espera)
+                self.concurrencia.adquirir()
+                inicio = time.monotonic()
+                response, error = None, None
+                try:
+                    response = enviar(request)
+                except httpx.TransportError as e:
+                    error = e
+                finally:
+                    self.concurrencia.liberar()
+            reintentar_en = self._evaluar(response, time.monotonic() - inicio, intento)
+            if reintentar_en is None:
+                if error is not None:
+                    raise error
+                return response
+            if response is not None:
+                response.close()
+            intento += 1
+            self._contar("reintentos")
+            time.sleep(reintentar_en)
+
+    async def aenviar(self, request: httpx.Request,
+                      enviar: Callable[[httpx.Request], Awaitable[httpx.Response]]) -> httpx.Response:
+        intento = 0
+        while True:
+            self._verificar_circuito(request)
+            with self._resguardar_circuito():
+                espera = self.cubo.reservar()
+                if espera > 0:
+                    await asyncio.sleep(espera)
+                await self.concurrencia.aadquirir()
+                inicio = time.monotonic()
+                response, error = None, None
+                try:
+                    response = await enviar(request)
+                except httpx.TransportError as e:
+                    error = e
+                finally:
+                    self.concurrencia.liberar()
+            reintentar_en = self._evaluar(response, time.monotonic() - inicio, intento)
+            if reintentar_en is None:
+                if error is not None:
+                    raise error
+                return response
+            if response is not None:
+                await response.aclose()
+            intento += 1
+            self._contar("reintentos")
+            await asyncio.sleep(reintentar_en)
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            contadores = dict(self._contadores)
+            latencia = self._latencia_media
+        disponibles = self.cubo.disponibles
+        return {
+            **contadores,
+            "circuito": self.circuito.estado,
+            "fallos_seguidos": self.circuito.fallos,
+            "aperturas": self.circuito.aperturas,
+            "concurrencia_limite": round(self.concurrencia.limite, 2),
+            "concurrencia_max": self.concurrencia.maximo,
+            "en_curso": self.concurrencia.en_curso,
+            "en_espera": len(self.concurrencia._esperando),
+            "reducciones": self.concurrencia.reducciones,
+            "tokens_disponibles": None if disponibles == float("inf") else round(max(0.0, disponibles), 2),
+            "latencia_media_ms": round(latencia * 1000, 1) if latencia is not None else None,
+        }
+
+
+class TransporteControlado(httpx.BaseTransport):
+    """Transporte síncrono que pasa cada petición por el control de flujo del servicio"""
+
+    def __init__(self, control: ControlServicio, transporte: httpx.BaseTransport):
+        self.control = control
+        self.transporte = transporte
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        return self.control.enviar(request, self.transporte.handle_request)
+
+    def close(self):
+        self.transporte.close()
+
+
+class TransporteControladoAsync(httpx.AsyncBaseTransport):
+    """Transporte asíncrono que pasa cada petición por el control de flujo del servicio"""
+
+    def __init__(self, control: ControlServicio, transporte: httpx.AsyncBaseTransport):
+        self.control = control
+        self.transporte = transporte
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self.control.aenviar(request, self.transporte.handle_async_request)
+
+    async def aclose(self):
+        await self.transporte.aclose()
+
+
+_controles: Dict[str, ControlServicio] = {}
+_controles_lock = threading.Lock()
+
+
+def obtener_control(nombre: str) -> ControlServicio:
+    """Devuelve el control de flujo compartido de un servicio externo ("rukovoditel", "groq")"""
+    with _controles_lock:
+        control = _controles.get(nombre)
+        if control is None:
+            control = _controles[nombre] = ControlServicio.desde_entorno(nombre)
+        return control
+
+
+def estadisticas_servicios() -> Dict[str, Dict[str, Any]]:
+    """Estado del control de flujo de cada servicio externo usado hasta el momento"""
+    with _controles_lock:
+        controles = dict(_controles)
+    return {nombre: control.estadisticas() for nombre, control in controles.items()}
@@ -0,0 +1,166 @@
+import os
+import time
+import asyncio
+import threading
+from collections import deque
+from typing import Optional, Dict, Any, Callable, Awaitable, Tuple, TypeVar
+
+from dotenv import load_dotenv
+
+from mi_agente_ai.services.cache import parsear_por_entidad
+from mi_agente_ai.utils.trazas import span_actual
+
+# Cargar variables de entorno
+load_dotenv()
+
+# Fracción máxima de peticiones que se pueden duplicar con una petición de respaldo (0 = desactivado),
+# en general y por entidad con el formato "43:0.1,12:0"
+RESPALDO_FRACCION = float(os.getenv("RUKOVODITEL_RESPALDO", "0.1"))
+RESPALDO_POR_ENTIDAD = os.getenv("RUKOVODITEL_RESPALDO_POR_ENTIDAD", "")
+# Percentil de la latencia observada a partir del cual se lanza el respaldo
+RESPALDO_PERCENTIL = float(os.getenv("RUKOVODITEL_RESPALDO_PERCENTIL", "0.95"))
+# Peticiones recientes que se usan para el percentil y para el presupuesto de respaldos
+RESPALDO_VENTANA = int(os.getenv("RUKOVODITEL_RESPALDO_VENTANA", "200"))
+# Latencias que hay que observar antes de lanzar el primer respaldo
+RESPALDO_MIN_MUESTRAS = int(os.getenv("RUKOVODITEL_RESPALDO_MIN_MUESTRAS", "20"))
+
+T = TypeVar("T")
+
+
+class PeticionesRespaldo:
+    """
+    Peticiones de respaldo ("hedged requests") para una entidad: si una petición tarda más que el
+    percentil configurado de las latencias recientes, se lanza una copia y se usa la primera que
+    responda, cancelando la otra. Para no duplicar la carga sobre Rukovoditel, en la ventana de
+    peticiones recientes como mucho una fracción `fraccion` lleva respaldo.
+    """
+
+    def __init__(self, fraccion: float = RESPALDO_FRACCION, percentil: float = RESPALDO_PERCENTIL,
+                 ventana: int = RESPALDO_VENTANA, min_muestras: int = RESPALDO_MIN_MUESTRAS):
+        self.fraccion = fraccion
+        self.percentil = percentil
+        self.min_muestras = min_muestras
+        self._lock = threading.Lock()
+        self._latencias: deque = deque(maxlen=ventana)
+        # Por cada petición reciente, si llevó respaldo
+        self._respaldadas: deque = deque(maxlen=ventana)
+        self._en_ventana = 0
+        self.peticiones = 0
+        self.respaldos = 0
+        self.ganados = 0
+
+    def umbral(self) -> Optional[float]:
+        """Segundos de espera antes de lanzar el respaldo, o None si todavía no hay suficientes muestras"""
+        with self._lock:
+            if self.fraccion <= 0 or len(self._latencias) < self.min_muestras:
+                return None
+            ordenadas = sorted(self._latencias)
+        return ordenadas[min(len(ordenadas) - 1, int(self.percentil * len(ordenadas)))]
+
+    def _contar(self, respaldada: bool):
+        """Registra una petición en la ventana del presupuesto (requiere el lock)"""
+        if len(self._respaldadas) == self._respaldadas.maxlen:
+            self._en_ventana -= self._respaldadas[0]
+        self._respaldadas.append(respaldada)
+        self._en_ventana += respaldada
+
+    def _iniciar(self):
+        with self._lock:
+            self.peticiones += 1
+            self._contar(False)
+
+    def _reservar(self) -> bool:
+        """Convierte la última petición en respaldada si el presupuesto lo permite"""
+        with self._lock:
+            if self._en_ventana + 1 > self.fraccion * len(self._respaldadas):
+                return False
+            self._respaldadas[-1] = True
+            self._en_ventana += 1
+            self.respaldos += 1
+            return True
+
+    def _registrar(self, latencia: float):
+        with self._lock:
+            self._latencias.append(latencia)
+
+    async def aejecutar(self, funcion: Callable[[], Awaitable[T]]) -> Tuple[T, Optional[Dict[str, Any]]]:
+        """
+        Ejecuta `funcion`, con una segunda llamada de respaldo si la primera supera el umbral
+
+        Returns:
+            Tupla (resultado, None si no hubo respaldo o un dict con `ganadora` y `umbral_ms`)
+
+        Raises:
+            La excepción de la petición original si ninguna de las dos tuvo éxito
+        """
+        umbral = self.umbral()
+        self._iniciar()
+        inicio = time.perf_counter()
+        original = asyncio.ensure_future(funcion())
+        tareas = [original]
+        try:
+            if umbral is not None:
+                await asyncio.wait(tareas, timeout=umbral)
+            if original.done() or umbral is None or not self._reservar():
+                resultado = await original
+                self._registrar(time.perf_counter() - inicio)
+                return resultado, None
+
+            tareas.append(asyncio.ensure_future(funcion()))
+            pendientes = set(tareas)
+            while pendientes:
+                hechas, pendientes = await asyncio.wait(pendientes, return_when=asyncio.FIRST_COMPLETED)
+                exitosas = [tarea for tarea in hechas if not tarea.cancelled() and tarea.exception() is None]
+                if exitosas:
+                    ganadora = original if original in exitosas else exitosas[0]
+                    break
+            else:
+                return await original, None
+
+            # Si ganó el respaldo, la latencia de la original solo se conoce como cota inferior
+            self._registrar(time.perf_counter() - inicio)
+            respaldo = {"ganadora": "original" if ganadora is original else "respaldo", "umbral_ms": round(umbral * 1000)}
+            if ganadora is not original:
+                with self._lock:
+                    self.ganados += 1
+            actual = span_actual()
+            if actual is not None:
+                actual.atributo("respaldo.ganadora", respaldo["ganadora"])
+            return ganadora.result(), respaldo
+        finally:
+            for tarea in tareas:
+                if not tarea.done():
+                    tarea.cancel()
+
+    def estadisticas(self) -> Dict[str, Any]:
+        umbral = self.umbral()
+        with self._lock:
+            return {
+                "fraccion": self.fraccion,
+                "umbral_ms": round(umbral * 1000) if umbral is not None else None,
+                "muestras": len(self._latencias),
+                "peticiones": self.peticiones,
+                "respaldos": self.respaldos,
+                "ganados": self.ganados,
+            }
+
+
+_respaldos: Dict[int, PeticionesRespaldo] = {}
+_respaldos_lock = threading.Lock()
+_fraccion_por_entidad = parsear_por_entidad(RESPALDO_POR_ENTIDAD)
+
+
+def obtener_respaldo(entity_id: int) -> PeticionesRespaldo:
+    """Devuelve las peticiones de respaldo de una entidad, compartidas por todo el proceso"""
+    with _respaldos_lock:
+        respaldo = _respaldos.get(entity_id)
+        if respaldo is None:
+            respaldo = _respaldos[entity_id] = PeticionesRespaldo(_fraccion_por_entidad.get(entity_id, RESPALDO_FRACCION))
+        return respaldo
+
+
+def estadisticas_respaldo() -> Dict[int, Dict[str, Any]]:
+    """Umbral y respaldos lanzados de cada entidad consultada hasta el momento"""
+    with _respaldos_lock:
+        respaldos = dict(_respaldos)
+    return {entity_id: respaldo.estadisticas() for entity_id, respaldo in sorted(respaldos.items())}
@@ -0,0 +1,326 @@
+import os
+import asyncio
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Callable, Iterator, AsyncIterator
+
+import httpx
+from dotenv import load_dotenv
+
+from mi_agente_ai.utils.trazas import span
+from mi_agente_ai.services.control_flujo import (
+    ControlServicio, TransporteControlado, TransporteControladoAsync, obtener_control
+)
+
+# Cargar variables de entorno
+load_dotenv()
+
+API_URL = os.getenv("RUKOVODITEL_API_URL", "https://www.anastopulos.ar/ingresar/api/rest.php")
+
+# Límites del pool de conexiones keep-alive
+POOL_MAX_CONNECTIONS = int(os.getenv("RUKOVODITEL_POOL_MAX_CONNECTIONS", "20"))
+POOL_MAX_KEEPALIVE = int(os.getenv("RUKOVODITEL_POOL_MAX_KEEPALIVE", "10"))
+POOL_KEEPALIVE_EXPIRY = float(os.getenv("RUKOVODITEL_POOL_KEEPALIVE_EXPIRY", "60"))
+
+# Timeouts por fase de la petición (en segundos)
+TIMEOUT_CONNECT = float(os.getenv("RUKOVODITEL_TIMEOUT_CONNECT", "5"))
+TIMEOUT_READ = float(os.getenv("RUKOVODITEL_TIMEOUT_READ", "15"))
+TIMEOUT_WRITE = float(os.getenv("RUKOVODITEL_TIMEOUT_WRITE", "5"))
+TIMEOUT_POOL = float(os.getenv("RUKOVODITEL_TIMEOUT_POOL", "5"))
+
+# Registros por página en las consultas paginadas
+TAMANO_PAGINA = int(os.getenv("RUKOVODITEL_TAMANO_PAGINA", "200"))
+# Páginas máximas de una consulta paginada, por si el servidor no respeta el desplazamiento
+MAX_PAGINAS = int(os.getenv("RUKOVODITEL_MAX_PAGINAS", "1000"))
+
+
+def parametros_autenticacion() -> Dict[str, Any]:
+    """Credenciales de Rukovoditel tomadas de las variables de entorno"""
+    return {
+        "key": os.getenv("RUKOVODITEL_API_KEY"),
+        "username": os.getenv("RUKOVODITEL_USER"),
+        "password": os.getenv("RUKOVODITEL_PASSWORD"),
+    }
+
+
+def credenciales_configuradas() -> bool:
+    """Indica si están configuradas todas las credenciales de Rukovoditel"""
+    return all(parametros_autenticacion().values())
+
+
+class RukovoditelJSONError(ValueError):
+    """La API respondió, pero el cuerpo de la respuesta no es JSON válido"""
+
+    def __init__(self, texto: str):
+        super().__init__("La respuesta de la API no es JSON válido")
+        self.texto = texto
+
+
+def _http2_disponible() -> bool:
+    """HTTP/2 solo se activa si el paquete opcional `h2` está instalado"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def aplanar_parametros(params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convierte los parámetros de la consulta al formato de formulario que espera la API de PHP.
+    Los diccionarios anidados (por ejemplo `filters`) se envían como `filters[912]=valor`.
+    """
+    plano = {}
+    for clave, valor in params.items():
+        if valor is None:
+            continue
+        if isinstance(valor, dict):
+            for subclave, subvalor in aplanar_parametros(valor).items():
+                # Las subclaves ya aplanadas conservan sus corchetes: filters[651][desde]
+                base, _, resto = str(subclave).partition("[")
+                plano[f"{clave}[{base}]" + (f"[{resto}" if resto else "")] = subvalor
+        else:
+            plano[clave] = valor
+    return plano
+
+
+class RukovoditelClient:
+    """
+    Cliente HTTP compartido para la API REST de Rukovoditel.
+    Mantiene un pool de conexiones keep-alive (HTTP/2 si está disponible) para evitar
+    un nuevo handshake TCP+TLS en cada consulta, y ofrece métodos síncronos y asíncronos.
+    Todas las peticiones pasan por el control de flujo compartido del servicio (tasa, concurrencia
+    adaptativa, reintentos y circuito interruptor).
+    """
+
+    def __init__(
+        self,
+        api_url: str = API_URL,
+        limits: Optional[httpx.Limits] = None,
+        timeout: Optional[httpx.Timeout] = None,
+        http2: Optional[bool] = None,
+        transport: Optional[httpx.BaseTransport] = None,
+        async_transport: Optional[httpx.AsyncBaseTransport] = None,
+        control: Optional[ControlServicio] = None,
+    ):
+        self.api_url = api_url
+        self.limits = limits or httpx.Limits(
+            max_connections=POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=POOL_MAX_KEEPALIVE,
+            keepalive_expiry=POOL_KEEPALIVE_EXPIRY,
+        )
+        self.timeout = timeout or httpx.Timeout(
+            connect=TIMEOUT_CONNECT,
+            read=TIMEOUT_READ,
+            write=TIMEOUT_WRITE,
+            pool=TIMEOUT_POOL,
+        )
+        self.http2 = _http2_disponible() if http2 is None else http2
+        self._transport = transport
+        self._async_transport = async_transport
+        self.control = control or obtener_control("rukovoditel")
+
+        self._lock = threading.Lock()
+        self._client: Optional[httpx.Client] = None
+        # Un AsyncClient queda atado al event loop donde se usó por primera vez,
+        # así que guardamos uno por loop
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    @property
+    def client(self) -> httpx.Client:
+        """Cliente síncrono, creado de forma perezosa"""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    # Con un transporte explícito httpx ignora `limits` y `http2`, así que se pasan al transporte base
+                    transporte = self._transport or httpx.HTTPTransport(limits=self.limits, http2=self.http2)
+                    self._client = httpx.Client(
+                        timeout=self.timeout,
+                        transport=TransporteControlado(self.control, transporte),
+                    )
+        return self._client
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        """Cliente asíncrono para el event loop en ejecución"""
+        loop = asyncio.get_running_loop()
+        cliente = self._async_clients.get(loop)
+        if cliente is None:
+            transporte = self._async_transport or httpx.AsyncHTTPTransport(limits=self.limits, http2=self.http2)
+            cliente = httpx.AsyncClient(
+                timeout=self.timeout,
+                transport=TransporteControladoAsync(self.control, transporte),
+            )
+            self._async_clients[loop] = cliente
+        return cliente
+
+    @staticmethod
+    def _decodificar(response: httpx.Response) -> Dict[str, Any]:
+        """Verifica el estado HTTP y devuelve el cuerpo como JSON"""
+        response.raise_for_status()
+        try:
+            return response.json()
+        except ValueError:
+            raise RukovoditelJSONError(response.text)
+
+    def select(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Realiza una petición a la API de forma síncrona
+
+        Args:
+            params: Parámetros de la consulta (incluyendo credenciales y acción)
+
+        Returns:
+            Dict: Respuesta de la API decodificada
+
+        Raises:
+            httpx.HTTPError: Si falla la comunicación o el servidor responde con error
+            RukovoditelJSONError: Si la respuesta no es JSON válido
+        """
+        with span("rukovoditel.red", accion=params.get("action"), entity_id=params.get("entity_id")) as actual:
+            response = self.client.post(self.api_url, data=aplanar_parametros(params))
+            actual.atributo("http.status_code", response.status_code)
+            actual.atributo("bytes", len(response.content))
+        with span("rukovoditel.parseo"):
+            return self._decodificar(response)
+
+    async def aselect(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Versión asíncrona de `select`, para usar dentro del event loop del agente"""
+        with span("rukovoditel.red", accion=params.get("action"), entity_id=params.get("entity_id")) as actual:
+            response = await self.async_client.post(self.api_url, data=aplanar_parametros(params))
+            actual.atributo("http.status_code", response.status_code)
+            actual.atributo("bytes", len(response.content))
+        with span("rukovoditel.parseo"):
+            return self._decodificar(response)
+
+    @staticmethod
+    def _parametros_pagina(params: Dict[str, Any], pagina: int, tamano_pagina: int) -> Dict[str, Any]:
+        """La API pasa `limit` a la cláusula LIMIT de MySQL, por lo que acepta el formato offset,cantidad"""
+        return {**params, "limit": f"{pagina * tamano_pagina},{tamano_pagina}"}
+
+    @staticmethod
+    def _registros_pagina(response_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        if response_data.get("status") != "success":
+            raise RuntimeError(response_data.get("error", "Error desconocido al consultar la API"))
+        return response_data.get("data", [])
+
+    @staticmethod
+    def _pagina_repetida(registros: List[Dict[str, Any]], ids_anteriores: set) -> bool:
+        """
+        Indica si la página no trae ningún ID nuevo respecto de la anterior: el servidor ignoró el
+        desplazamiento de `limit` y seguir pidiendo páginas repetiría los mismos registros para siempre
+        """
+        ids = {registro.get("id") for registro in registros if registro.get("id") is not None}
+        return bool(ids) and ids <= ids_anteriores
+
+    @staticmethod
+    def _verificar_max_paginas(pagina: int):
+        if pagina >= MAX_PAGINAS:
+            raise RuntimeError(f"La consulta superó el máximo de {MAX_PAGINAS} páginas (RUKOVODITEL_MAX_PAGINAS)")
+
+    def iter_select(
+        self,
+        params: Dict[str, Any],
+        tamano_pagina: int = TAMANO_PAGINA,
+        detener_si: Optional[Callable[[Dict[str, Any]], bool]] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Recorre todos los registros de un `select` página por página.
+        Mientras se consume una página, la siguiente ya se está pidiendo en segundo plano,
+        y en memoria nunca hay más de dos páginas.
+
+        Args:
+            params: Parámetros de la consulta (se ignora el `limit` que traigan)
+            tamano_pagina: Registros por petición
+            detener_si: Predicado evaluado sobre cada registro; al cumplirse se entrega ese registro y se corta
+
+        Yields:
+            Dict: Registros crudos de la API
+
+        Raises:
+            httpx.HTTPError, RukovoditelJSONError: Si falla alguna página
+            RuntimeError: Si la API responde con un estado de error o se supera `MAX_PAGINAS`
+        """
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="rukovoditel-prefetch") as executor:
+            pagina = 0
+            ids_anteriores: set = set()
+            siguiente = executor.submit(self.select, self._parametros_pagina(params, pagina, tamano_pagina))
+            try:
+                while siguiente is not None:
+                    registros = self._registros_pagina(siguiente.result())
+                    siguiente = None
+                    if self._pagina_repetida(registros, ids_anteriores):
+                        return
+                    ids_anteriores = {registro.get("id") for registro in registros}
+                    pagina += 1
+                    if len(registros) >= tamano_pagina:
+                        self._verificar_max_paginas(pagina)
+                        siguiente = executor.submit(self.select, self._parametros_pagina(params, pagina, tamano_pagina))
+                    for registro in registros:
+                        yield registro
+                        if detener_si is not None and detener_si(registro):
+                            return
+            finally:
+                if siguiente is not None:
+                    siguiente.cancel()
+
+    async def aiter_select(
+        self,
+        params: Dict[str, Any],
+        tamano_pagina: int = TAMANO_PAGINA,
+        detener_si: Optional[Callable[[Dict[str, Any]], bool]] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Versión asíncrona de `iter_select`; la página siguiente se pide en una tarea concurrente"""
+        pagina = 0
+        ids_anteriores: set = set()
+        siguiente = asyncio.ensure_future(self.aselect(self._parametros_pagina(params, pagina, tamano_pagina)))
+        try:
+            while siguiente is not None:
+                registros = self._registros_pagina(await siguiente)
+                siguiente = None
+                if self._pagina_repetida(registros, ids_anteriores):
+                    return
+                ids_anteriores = {registro.get("id") for registro in registros}
+                pagina += 1
+                if len(registros) >= tamano_pagina:
+                    self._verificar_max_paginas(pagina)
+                    siguiente = asyncio.ensure_future(
+                        self.aselect(self._parametros_pagina(params, pagina, tamano_pagina))
+                    )
+                for registro in registros:
+                    yield registro
+                    if detener_si is not None and detener_si(registro):
+                        return
+        finally:
+            if siguiente is not None:
+                siguiente.cancel()
+
+    def close(self):
+        """Cierra el cliente síncrono y libera sus conexiones"""
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+    async def aclose(self):
+        """Cierra el cliente asíncrono del event loop actual"""
+        cliente = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if cliente is not None:
+            await cliente.aclose()
+
+
+_cliente_compartido: Optional[RukovoditelClient] = None
+_cliente_lock = threading.Lock()
+
+
+def obtener_cliente() -> RukovoditelClient:
+    """Devuelve el cliente de Rukovoditel compartido por todo el proceso"""
+    global _cliente_compartido
+    if _cliente_compartido is None:
+        with _cliente_lock:
+            if _cliente_compartido is None:
+                _cliente_compartido = RukovoditelClient()
+    return _cliente_compartido
@@ -0,0 +1,327 @@
+import os
+import json
+import time
+import sqlite3
+import datetime
+import threading
+from typing import Optional, Dict, Any, List, Iterable
+
+import httpx
+from dotenv import load_dotenv
+
+from mi_agente_ai.services.rukovoditel import (
+    obtener_cliente, parametros_autenticacion, credenciales_configuradas, RukovoditelClient, RukovoditelJSONError
+)
+
+# Cargar variables de entorno
+load_dotenv()
+
+# Ruta del archivo SQLite del espejo local (vacío = sincronización desactivada)
+SYNC_SQLITE = os.getenv("RUKOVODITEL_SYNC_SQLITE", "")
+# Segundos entre sincronizaciones incrementales
+SYNC_INTERVALO = float(os.getenv("RUKOVODITEL_SYNC_INTERVALO", "60"))
+# Segundos entre reconciliaciones completas de IDs (detección de registros borrados)
+SYNC_RECONCILIACION = float(os.getenv("RUKOVODITEL_SYNC_RECONCILIACION", "3600"))
+# Registros por página en las peticiones de sincronización
+SYNC_LIMITE = int(os.getenv("RUKOVODITEL_SYNC_LIMITE", "5000"))
+
+# Entidad espejada: licencias de encargados (entidad 43, reporte 3930)
+SYNC_ENTITY_ID = 43
+SYNC_REPORTS_ID = 3930
+SYNC_SELECT_FIELDS = "651,665,653,912"
+
+
+def _marca_actualizacion(registro: Dict[str, Any]) -> int:
+    """Timestamp UNIX de la última modificación del registro (date_updated, o date_added si no hay)"""
+    for campo in ("date_updated", "date_added"):
+        try:
+            valor = int(registro.get(campo) or 0)
+        except (TypeError, ValueError):
+            valor = 0
+        if valor:
+            return valor
+    return 0
+
+
+class AlmacenLocal:
+    """Almacén SQLite con el espejo de los registros de una o más entidades de Rukovoditel"""
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False)
+        with self._conexion:
+            self._conexion.execute(
+                "CREATE TABLE IF NOT EXISTS registros ("
+                " entity_id INTEGER NOT NULL,"
+                " id INTEGER NOT NULL,"
+                " datos TEXT NOT NULL,"
+                " actualizado INTEGER NOT NULL,"
+                " orden INTEGER,"
+                " PRIMARY KEY (entity_id, id))"
+            )
+            # Espejos creados antes de guardar el orden del reporte
+            columnas = {fila[1] for fila in self._conexion.execute("PRAGMA table_info(registros)")}
+            if "orden" not in columnas:
+                self._conexion.execute("ALTER TABLE registros ADD COLUMN orden INTEGER")
+            self._conexion.execute(
+                "CREATE TABLE IF NOT EXISTS sync_estado ("
+                " entity_id INTEGER PRIMARY KEY,"
+                " watermark INTEGER NOT NULL DEFAULT 0,"
+                " ultima_sync REAL,"
+                " ultima_reconciliacion REAL,"
+                " version INTEGER NOT NULL DEFAULT 0)"
+            )
+
+    def guardar_registros(self, entity_id: int, registros: Iterable[Dict[str, Any]]) -> int:
+        """Inserta o actualiza registros; devuelve cuántos cambiaron realmente"""
+        cambios = 0
+        with self._lock, self._conexion:
+            for registro in registros:
+                if "id" not in registro:
+                    continue
+                actualizado = _marca_actualizacion(registro)
+                cursor = self._conexion.execute(
+                    "INSERT INTO registros (entity_id, id, datos, actualizado) VALUES (?, ?, ?, ?)"
+                    " ON CONFLICT (entity_id, id) DO UPDATE SET datos = excluded.datos, actualizado = excluded.actualizado"
+                    " WHERE excluded.datos != registros.datos",
+                    (entity_id, int(registro["id"]), json.dumps(registro, ensure_ascii=False), actualizado),
+                )
+                cambios += cursor.rowcount
+        return cambios
+
+    def ids(self, entity_id: int) -> set:
+        """IDs de los registros espejados de una entidad"""
+        with self._lock:
+            return {fila[0] for fila in self._conexion.execute(
+                "SELECT id FROM registros WHERE entity_id = ?", (entity_id,)
+            )}
+
+    def eliminar_ausentes(self, entity_id: int, ids_remotos: Iterable[int]) -> int:
+        """Elimina los registros locales cuyos IDs ya no existen en el servidor"""
+        ids_remotos = set(ids_remotos)
+        with self._lock, self._conexion:
+            ids_locales = {fila[0] for fila in self._conexion.execute(
+                "SELECT id FROM registros WHERE entity_id = ?", (entity_id,)
+            )}
+            borrados = ids_locales - ids_remotos
+            self._conexion.executemany(
+                "DELETE FROM registros WHERE entity_id = ? AND id = ?",
+                [(entity_id, registro_id) for registro_id in borrados],
+            )
+        return len(borrados)
+
+    def actualizar_orden(self, entity_id: int, ids_en_orden: List[int]) -> int:
+        """Guarda la posición de cada registro en el reporte; devuelve cuántas posiciones cambiaron"""
+        with self._lock, self._conexion:
+            cursor = self._conexion.executemany(
+                "UPDATE registros SET orden = ? WHERE entity_id = ? AND id = ? AND orden IS NOT ?",
+                [(posicion, entity_id, registro_id, posicion) for posicion, registro_id in enumerate(ids_en_orden)],
+            )
+        return cursor.rowcount
+
+    def registros(self, entity_id: int) -> List[Dict[str, Any]]:
+        """
+        Devuelve todos los registros espejados de una entidad en el orden del reporte, para que una
+        consulta con `limit` entregue los mismos registros que la API (los que todavía no tienen
+        posición van al final, del más reciente al más antiguo)
+        """
+        with self._lock:
+            filas = self._conexion.execute(
+                "SELECT datos FROM registros WHERE entity_id = ? ORDER BY orden IS NULL, orden, id DESC", (entity_id,)
+            ).fetchall()
+        return [json.loads(fila[0]) for fila in filas]
+
+    def estado(self, entity_id: int) -> Dict[str, Any]:
+        """Watermark, momento de la última sincronización y versión de los datos de una entidad"""
+        with self._lock:
+            fila = self._conexion.execute(
+                "SELECT watermark, ultima_sync, ultima_reconciliacion, version FROM sync_estado WHERE entity_id = ?",
+                (entity_id,),
+            ).fetchone()
+        if fila is None:
+            return {"watermark": 0, "ultima_sync": None, "ultima_reconciliacion": None, "version": 0}
+        return {"watermark": fila[0], "ultima_sync": fila[1], "ultima_reconciliacion": fila[2], "version": fila[3]}
+
+    def actualizar_estado(self, entity_id: int, watermark: int, reconciliado: bool, hubo_cambios: bool):
+        """Registra el resultado de una sincronización"""
+        ahora = time.time()
+        with self._lock, self._conexion:
+            self._conexion.execute(
+                "INSERT INTO sync_estado (entity_id, watermark, ultima_sync, ultima_reconciliacion, version)"
+                " VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT (entity_id) DO UPDATE SET"
+                " watermark = MAX(sync_estado.watermark, excluded.watermark),"
+                " ultima_sync = excluded.ultima_sync,"
+                " ultima_reconciliacion = COALESCE(excluded.ultima_reconciliacion, sync_estado.ultima_reconciliacion),"
+                " version = sync_estado.version + excluded.version",
+                (entity_id, watermark, ahora, ahora if reconciliado else None, 1 if hubo_cambios else 0),
+            )
+
+
+class SincronizadorLicencias:
+    """
+    Mantiene un espejo local de los registros de licencias de encargados.
+    Cada ciclo trae solo los registros creados o modificados desde el último watermark (date_added
+    y date_updated) y, con menor frecuencia, reconcilia la lista completa de IDs para detectar
+    borrados, registros que el watermark no trajo y el orden del reporte. Si llegan registros
+    nuevos la reconciliación se adelanta a ese mismo ciclo, para conocer su posición en el reporte.
+    """
+
+    def __init__(
+        self,
+        almacen: AlmacenLocal,
+        cliente: Optional[RukovoditelClient] = None,
+        entity_id: int = SYNC_ENTITY_ID,
+        reports_id: Optional[int] = SYNC_REPORTS_ID,
+        select_fields: str = SYNC_SELECT_FIELDS,
+        intervalo: float = SYNC_INTERVALO,
+        intervalo_reconciliacion: float = SYNC_RECONCILIACION,
+        limite: int = SYNC_LIMITE,
+    ):
+        self.almacen = almacen
+        self.cliente = cliente
+        self.entity_id = entity_id
+        self.reports_id = reports_id
+        self.select_fields = select_fields
+        self.intervalo = intervalo
+        self.intervalo_reconciliacion = intervalo_reconciliacion
+        self.limite = limite
+        self.ultimo_error: Optional[str] = None
+
+        self._detener = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+
+    def _parametros(self, select_fields: str, filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        params = {
+            **parametros_autenticacion(),
+            "action": "select",
+            "entity_id": self.entity_id,
+            "limit": self.limite,
+            "select_fields": select_fields,
+        }
+        if self.reports_id:
+            params["reports_id"] = self.reports_id
+        if filters:
+            params["filters"] = filters
+        return params
+
+    def _select(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Ejecuta un `select` paginado y devuelve todos los registros crudos"""
+        return list((self.cliente or obtener_cliente()).iter_select(params, tamano_pagina=self.limite))
+
+    @staticmethod
+    def _filtros_desde(watermark: int) -> List[Optional[Dict[str, Any]]]:
+        """
+        Filtros de fechas para traer solo los registros creados o modificados desde el watermark.
+        Los registros nuevos tienen date_updated vacío, así que se pide también por date_added (los
+        filtros de la API se combinan con AND, por eso son dos consultas). Se filtra por día completo:
+        los registros de ese día se vuelven a recibir, pero como el guardado es idempotente no
+        generan cambios.
+        """
+        if not watermark:
+            return [None]
+        desde = datetime.datetime.fromtimestamp(watermark).strftime("%Y-%m-%d")
+        return [{"date_updated": f"{desde},"}, {"date_added": f"{desde},"}]
+
+    def sincronizar(self, reconciliar: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        Ejecuta un ciclo de sincronización
+
+        Args:
+            reconciliar: Fuerza (o evita) la reconciliación de IDs; por defecto se decide según el intervalo
+
+        Returns:
+            Dict: Resumen del ciclo (registros recibidos, cambios, borrados, faltantes y nuevo watermark)
+        """
+        estado = self.almacen.estado(self.entity_id)
+        if reconciliar is None:
+            ultima = estado["ultima_reconciliacion"]
+            reconciliar = ultima is None or time.time() - ultima >= self.intervalo_reconciliacion
+
+        # Traer solo los registros creados o modificados desde el último watermark
+        # (la API siempre incluye id, date_added y date_updated en cada registro)
+        registros = [registro for filtros in self._filtros_desde(estado["watermark"])
+                     for registro in self._select(self._parametros(self.select_fields, filtros))]
+        ids_locales = self.almacen.ids(self.entity_id)
+        if any("id" in r and int(r["id"]) not in ids_locales for r in registros):
+            reconciliar = True
+        cambios = self.almacen.guardar_registros(self.entity_id, registros)
+        watermark = max([estado["watermark"], *(_marca_actualizacion(r) for r in registros)])
+
+        # Reconciliar IDs para detectar registros eliminados en el servidor y registros que faltan
+        # localmente porque el filtro por date_updated no los trajo (fecha vacía o anterior al watermark)
+        borrados = faltantes = 0
+        if reconciliar:
+            campo_minimo = self.select_fields.split(",")[0]
+            orden_remoto = [int(r["id"]) for r in self._select(self._parametros(campo_minimo)) if "id" in r]
+            ids_remotos = set(orden_remoto)
+            borrados = self.almacen.eliminar_ausentes(self.entity_id, ids_remotos)
+            faltantes = len(ids_remotos - self.almacen.ids(self.entity_id))
+            if faltantes:
+                # No se puede pedir una lista de IDs: se trae el conjunto completo y el guardado idempotente
+                # solo escribe los registros nuevos o distintos
+                completos = self._select(self._parametros(self.select_fields))
+                cambios += self.almacen.guardar_registros(self.entity_id, completos)
+                watermark = max([watermark, *(_marca_actualizacion(r) for r in completos)])
+            cambios += self.almacen.actualizar_orden(self.entity_id, orden_remoto)
+
+        self.almacen.actualizar_estado(self.entity_id, watermark, reconciliar, bool(cambios or borrados))
+        return {
+            "recibidos": len(registros),
+            "cambios": cambios,
+            "borrados": borrados,
+            "faltantes": faltantes,
+            "watermark": watermark,
+            "reconciliado": reconciliar,
+        }
+
+    def vigente(self) -> bool:
+        """El espejo se considera utilizable si se sincronizó hace menos de dos intervalos"""
+        ultima = self.almacen.estado(self.entity_id)["ultima_sync"]
+        return ultima is not None and time.time() - ultima <= 2 * self.intervalo
+
+    def _bucle(self):
+        while not self._detener.is_set():
+            try:
+                self.sincronizar()
+                self.ultimo_error = None
+            except (httpx.HTTPError, RukovoditelJSONError, RuntimeError) as e:
+                # Un error de red no detiene la sincronización; se reintenta en el próximo ciclo
+                self.ultimo_error = str(e)
+            self._detener.wait(self.intervalo)
+
+    def iniciar(self):
+        """Inicia la sincronización periódica en un hilo en segundo plano"""
+        if self._hilo is not None and self._hilo.is_alive():
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._bucle, name="sync-rukovoditel", daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        """Detiene la sincronización en segundo plano"""
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout=5)
+            self._hilo = None
+
+
+_sincronizador: Optional[SincronizadorLicencias] = None
+_sincronizador_lock = threading.Lock()
+
+
+def obtener_sincronizador() -> Optional[SincronizadorLicencias]:
+    """
+    Devuelve el sincronizador compartido, iniciándolo en segundo plano la primera vez.
+    Devuelve None si el espejo local no está configurado.
+    """
+    global _sincronizador
+    if not SYNC_SQLITE or not credenciales_configuradas():
+        return None
+    if _sincronizador is None:
+        with _sincronizador_lock:
+            if _sincronizador is None:
+                _sincronizador = SincronizadorLicencias(AlmacenLocal(SYNC_SQLITE))
+                _sincronizador.iniciar()
+    return _sincronizador
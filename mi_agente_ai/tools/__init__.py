@@ -1,6 +1,18 @@
 # Archivo de inicialización para el paquete tools
-from .consulta_licencias_encargados import consulta_licencias_encargados, ConsultaLicenciasEncargadosInput, ConsultaLicenciasEncargadosOutput
+from .consulta_licencias_encargados import consulta_licencias_encargados, consulta_licencias_encargados_sync, ConsultaLicenciasEncargadosInput, ConsultaLicenciasEncargadosOutput
+from .consulta_licencias_lote import consulta_licencias_lote, ConsultaLicenciasLoteInput, ConsultaLicenciasLoteOutput
+from .indice_licencias import consulta_licencias_por_fecha, ConsultaLicenciasPorFechaInput, ConsultaLicenciasPorFechaOutput
+from .analisis_licencias import analisis_licencias, AnalisisLicenciasInput, AnalisisLicenciasOutput
+from .indice_empleados import buscar_empleado, BuscarEmpleadoInput, BuscarEmpleadoOutput
+from .fabrica import herramientas_entidades, crear_herramienta, ConsultaEntidadInput, ConsultaEntidadOutput
+from .ver_pagina_resultado import ver_pagina_resultado, VerPaginaResultadoInput, VerPaginaResultadoOutput
 
 __all__ = [
-    "consulta_licencias_encargados", "ConsultaLicenciasEncargadosInput", "ConsultaLicenciasEncargadosOutput"
-] 
\ No newline at end of file
+    "consulta_licencias_encargados", "consulta_licencias_encargados_sync", "ConsultaLicenciasEncargadosInput", "ConsultaLicenciasEncargadosOutput",
+    "consulta_licencias_lote", "ConsultaLicenciasLoteInput", "ConsultaLicenciasLoteOutput",
+    "consulta_licencias_por_fecha", "ConsultaLicenciasPorFechaInput", "ConsultaLicenciasPorFechaOutput",
+    "analisis_licencias", "AnalisisLicenciasInput", "AnalisisLicenciasOutput",
+    "buscar_empleado", "BuscarEmpleadoInput", "BuscarEmpleadoOutput",
+    "herramientas_entidades", "crear_herramienta", "ConsultaEntidadInput", "ConsultaEntidadOutput",
+    "ver_pagina_resultado", "VerPaginaResultadoInput", "VerPaginaResultadoOutput"
+]
\ No newline at end of file
@@ -0,0 +1,335 @@
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, Any, List, Literal, Tuple
+import time
+import datetime
+import threading
+import httpx
+import numpy as np
+import pandas as pd
+
+from mi_agente_ai.services.rukovoditel import credenciales_configuradas, RukovoditelJSONError
+from mi_agente_ai.services.sincronizacion import obtener_sincronizador
+from mi_agente_ai.tools.indice_licencias import IndiceLicencias, obtener_indice
+from mi_agente_ai.utils.fechas import parsear_fecha
+from mi_agente_ai.utils.texto import normalizar_texto
+
+# Rangos de duración (en días) del histograma: [desde, hasta) y su etiqueta
+RANGOS_DURACION = [(1, 2, "1"), (2, 4, "2-3"), (4, 8, "4-7"), (8, 15, "8-14"), (15, 31, "15-30"),
+                   (31, 61, "31-60"), (61, np.iinfo(np.int64).max, "61+")]
+# Pares superpuestos que se calculan como máximo (el total se informa igual)
+MAX_PARES = 200_000
+
+_UN_DIA = np.timedelta64(1, "D")
+
+
+class AnalisisLicenciasInput(BaseModel):
+    """Entrada para la herramienta de análisis de licencias"""
+    operacion: Literal["por_empleado", "por_mes", "superposiciones", "duraciones"] = Field(
+        ..., description="por_empleado: licencias y días por empleado; por_mes: licencias, días y máximo de encargados "
+                         "simultáneos por mes; superposiciones: licencias de distintos empleados que coinciden en el tiempo; "
+                         "duraciones: histograma y estadísticas de la duración de las licencias"
+    )
+    desde: Optional[datetime.date] = Field(None, description="Inicio del período analizado (AAAA-MM-DD); las licencias se recortan al período")
+    hasta: Optional[datetime.date] = Field(None, description="Fin del período analizado (AAAA-MM-DD); por defecto hoy")
+    empleado: Optional[str] = Field(None, description="Nombre (o parte del nombre) del empleado, para analizar solo sus licencias")
+    ordenar_por: Optional[Literal["licencias", "dias"]] = Field(
+        None, description="Ordenar las filas de mayor a menor por esta columna (por defecto: días por empleado, meses en orden cronológico)"
+    )
+    limit: int = Field(20, description="Cantidad máxima de filas del resultado")
+
+
+class AnalisisLicenciasOutput(BaseModel):
+    """Salida de la herramienta de análisis de licencias"""
+    resultado: Dict[str, Any] = Field(..., description="Filas agregadas y totales")
+    metadata: Dict[str, Any] = Field(..., description="Metadatos del análisis")
+
+
+def _fechas(columna: pd.Series) -> np.ndarray:
+    """Fechas de una columna como `datetime64[D]` (NaT si faltan); cada valor distinto se parsea una sola vez"""
+    parseadas = {valor: parsear_fecha(valor) for valor in columna.dropna().unique()}
+    return pd.to_datetime(columna.map(parseadas)).to_numpy("datetime64[D]")
+
+
+class TablaLicencias:
+    """
+    Licencias del índice en formato de columnas NumPy: empleado (nombre y normalizado), inicio y fin
+    como `datetime64[D]` con la misma regla que `intervalo_licencia` (sin finalización se usa el día
+    anterior a la reincorporación; sin ninguna de las dos la licencia sigue abierta). Todas las
+    operaciones se calculan de forma vectorizada sobre estas columnas.
+    """
+
+    def __init__(self, registros: List[Dict[str, Any]]):
+        datos = pd.DataFrame(registros, columns=["Empleado", "Fecha de inicio", "Fecha Finalización", "Reincorporación"])
+        inicio = _fechas(datos["Fecha de inicio"])
+        fin = _fechas(datos["Fecha Finalización"])
+        reincorporacion = _fechas(datos["Reincorporación"])
+        fin = np.where(np.isnat(fin), reincorporacion - _UN_DIA, fin)
+
+        validas = ~np.isnat(inicio)
+        self.inicio = inicio[validas]
+        self.fin = np.where(np.isnat(fin[validas]), fin[validas], np.maximum(self.inicio, fin[validas]))
+        self.abiertas = np.isnat(self.fin)
+        empleados = datos["Empleado"].fillna("").astype(str)[validas]
+        self.empleados = empleados.to_numpy(dtype=object)
+        # Código entero de cada empleado, para agrupar sin comparar textos
+        self.codigos, self.nombres = pd.factorize(self.empleados)
+        normalizados = {nombre: normalizar_texto(nombre) for nombre in empleados.unique()}
+        self.normalizados = empleados.map(normalizados).to_numpy(dtype=object)
+        self.sin_fecha = int((~validas).sum())
+
+    def __len__(self) -> int:
+        return len(self.inicio)
+
+    def recortar(self, desde: np.datetime64, hasta: np.datetime64,
+                 empleados: Optional[List[str]] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Licencias que se superponen con [desde, hasta], recortadas al período. Las abiertas se
+        consideran vigentes hasta hoy (o solo su primer día, si empiezan más adelante).
+
+        Returns:
+            Tupla (posiciones, inicio recortado, fin recortado)
+        """
+        hoy = np.datetime64(datetime.date.today(), "D")
+        fin = np.where(self.abiertas, np.maximum(self.inicio, hoy), self.fin)
+        a = np.maximum(self.inicio, desde)
+        b = np.minimum(fin, hasta)
+        seleccion = a <= b
+        if empleados is not None:
+            seleccion &= np.isin(self.normalizados, empleados)
+        posiciones = np.flatnonzero(seleccion)
+        return posiciones, a[posiciones], b[posiciones]
+
+
+def _fecha(valor: np.datetime64) -> str:
+    return str(valor.astype("datetime64[D]"))
+
+
+def _activas_por_dia(a: np.ndarray, b: np.ndarray, desde: np.datetime64, hasta: np.datetime64) -> np.ndarray:
+    """Licencias vigentes en cada día de [desde, hasta], por suma acumulada de inicios y fines"""
+    dias = int((hasta - desde) / _UN_DIA) + 1
+    cambios = np.zeros(dias + 1, dtype=np.int64)
+    np.add.at(cambios, ((a - desde) / _UN_DIA).astype(np.int64), 1)
+    np.add.at(cambios, ((b - desde) / _UN_DIA).astype(np.int64) + 1, -1)
+    return np.cumsum(cambios[:-1])
+
+
+def por_empleado(tabla: TablaLicencias, posiciones: np.ndarray, a: np.ndarray, b: np.ndarray,
+                 ordenar_por: Optional[str]) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    codigos = tabla.codigos[posiciones]
+    orden = np.lexsort((a, codigos))
+    codigos, a, b = codigos[orden], a[orden], b[orden]
+    datos = pd.DataFrame({"codigo": codigos, "desde": a, "hasta": b, "abierta": tabla.abiertas[posiciones[orden]]})
+    # Días de calendario: con las licencias de cada empleado ordenadas, cada una solo aporta los días
+    # posteriores al fin más tardío de las anteriores, así las superpuestas no se cuentan dos veces
+    fin_anterior = datos.groupby("codigo")["hasta"].cummax().to_numpy("datetime64[D]")
+    fin_anterior = np.concatenate([[np.datetime64("NaT", "D")], fin_anterior[:-1]])
+    primera_del_empleado = np.concatenate([[True], codigos[1:] != codigos[:-1]])
+    desde_nuevo = np.where(primera_del_empleado, a, np.maximum(a, fin_anterior + _UN_DIA))
+    datos["dias"] = np.maximum(((b - desde_nuevo) / _UN_DIA).astype(np.int64) + 1, 0)
+    grupos = datos.groupby("codigo", sort=False).agg(
+        licencias=("dias", "size"), dias=("dias", "sum"), primera=("desde", "min"), ultima=("hasta", "max"),
+        abiertas=("abierta", "sum"),
+    )
+    grupos.insert(0, "Empleado", tabla.nombres[grupos.index.to_numpy()])
+    grupos = grupos.reset_index(drop=True)
+    columna = ordenar_por or "dias"
+    grupos = grupos.sort_values([columna, "Empleado"], ascending=[False, True], kind="stable")
+    totales = {"empleados": len(grupos), "licencias": int(len(datos)), "dias": int(datos["dias"].sum())}
+    return grupos, totales
+
+
+def por_mes(tabla: TablaLicencias, posiciones: np.ndarray, a: np.ndarray, b: np.ndarray, ordenar_por: Optional[str],
+            desde: np.datetime64, hasta: np.datetime64) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    activas = _activas_por_dia(a, b, desde, hasta)
+    dias = np.arange(desde, hasta + _UN_DIA, _UN_DIA)
+    meses = dias.astype("datetime64[M]")
+    diario = pd.DataFrame({"mes": meses, "activas": activas})
+    grupos = diario.groupby("mes").agg(dias=("activas", "sum"), max_simultaneas=("activas", "max"))
+
+    # Licencias que tocan cada mes: +1 en el mes de inicio y -1 después del mes de fin
+    primer_mes = meses[0]
+    indice_a = ((a.astype("datetime64[M]") - primer_mes) / np.timedelta64(1, "M")).astype(np.int64)
+    indice_b = ((b.astype("datetime64[M]") - primer_mes) / np.timedelta64(1, "M")).astype(np.int64)
+    cambios = np.zeros(len(grupos) + 1, dtype=np.int64)
+    np.add.at(cambios, indice_a, 1)
+    np.add.at(cambios, indice_b + 1, -1)
+    grupos["licencias"] = np.cumsum(cambios[:-1])
+    # Licencias que empiezan en cada mes (las que vienen de antes del período no cuentan)
+    iniciadas = tabla.inicio[posiciones] >= desde
+    grupos["iniciadas"] = np.bincount(indice_a[iniciadas], minlength=len(grupos))
+
+    grupos = grupos.reset_index()
+    grupos["mes"] = grupos["mes"].dt.strftime("%Y-%m")
+    grupos = grupos[["mes", "licencias", "iniciadas", "dias", "max_simultaneas"]]
+    if ordenar_por:
+        grupos = grupos.sort_values([ordenar_por, "mes"], ascending=[False, True], kind="stable")
+    pico = int(np.argmax(activas)) if len(activas) else 0
+    totales = {
+        "meses": len(grupos),
+        "licencias": int(len(posiciones)),
+        "dias": int(activas.sum()),
+        "max_simultaneas": int(activas[pico]) if len(activas) else 0,
+        "fecha_max_simultaneas": _fecha(dias[pico]) if len(activas) and activas[pico] > 0 else None,
+    }
+    return grupos, totales
+
+
+def superposiciones(tabla: TablaLicencias, posiciones: np.ndarray, a: np.ndarray, b: np.ndarray,
+                    desde: np.datetime64, hasta: np.datetime64) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    orden = np.argsort(a, kind="stable")
+    posiciones, a, b = posiciones[orden], a[orden], b[orden]
+    # Con las licencias ordenadas por inicio, la i se superpone con las siguientes que empiezan antes de su fin
+    hasta_indice = np.searchsorted(a, b, side="right")
+    cantidades = np.maximum(hasta_indice - np.arange(len(a)) - 1, 0)
+    total_pares = int(cantidades.sum())
+    if total_pares > MAX_PARES:
+        cantidades = np.minimum(cantidades, MAX_PARES // max(1, len(a)))
+    i = np.repeat(np.arange(len(a)), cantidades)
+    desplazamientos = np.arange(len(i)) - np.repeat(np.cumsum(cantidades) - cantidades, cantidades)
+    j = i + 1 + desplazamientos
+
+    empleados_i = tabla.normalizados[posiciones[i]]
+    empleados_j = tabla.normalizados[posiciones[j]]
+    mismo_empleado = empleados_i == empleados_j
+    fin = np.minimum(b[i], b[j])
+    pares = pd.DataFrame({
+        "Empleado": tabla.empleados[posiciones[i]],
+        "Otro empleado": tabla.empleados[posiciones[j]],
+        "desde": a[j],
+        "hasta": fin,
+        "dias": ((fin - a[j]) / _UN_DIA).astype(np.int64) + 1,
+    })[~mismo_empleado]
+    pares = pares.sort_values(["dias", "desde"], ascending=[False, True], kind="stable")
+
+    activas = _activas_por_dia(a, b, desde, hasta) if len(a) else np.zeros(0, dtype=np.int64)
+    totales = {
+        "pares": int(len(pares)) if total_pares <= MAX_PARES else None,
+        "pares_calculados": int(len(pares)),
+        # Licencias del mismo empleado que se pisan suelen ser registros duplicados o mal cargados
+        "pares_mismo_empleado": int(mismo_empleado.sum()),
+        "dias_con_superposicion": int((activas >= 2).sum()),
+        "max_simultaneas": int(activas.max()) if len(activas) else 0,
+    }
+    return pares, totales
+
+
+def duraciones(tabla: TablaLicencias, posiciones: np.ndarray) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    # Duración completa de cada licencia (sin recortar al período); las abiertas no tienen duración
+    cerradas = posiciones[~tabla.abiertas[posiciones]]
+    dias = ((tabla.fin[cerradas] - tabla.inicio[cerradas]) / _UN_DIA).astype(np.int64) + 1
+    limites = [desde for desde, _, _ in RANGOS_DURACION] + [RANGOS_DURACION[-1][1]]
+    cantidades, _ = np.histogram(dias, bins=limites)
+    histograma = pd.DataFrame({"duracion_dias": [etiqueta for _, _, etiqueta in RANGOS_DURACION],
+                               "licencias": cantidades})
+    totales = {
+        "licencias": int(len(dias)),
+        "abiertas": int(len(posiciones) - len(cerradas)),
+        "dias": int(dias.sum()),
+        "media_dias": round(float(dias.mean()), 1) if len(dias) else None,
+        "mediana_dias": float(np.median(dias)) if len(dias) else None,
+        "p90_dias": float(np.percentile(dias, 90)) if len(dias) else None,
+        "max_dias": int(dias.max()) if len(dias) else None,
+    }
+    return histograma, totales
+
+
+def _filas(tabla: pd.DataFrame, limit: int) -> List[Dict[str, Any]]:
+    """Primeras filas de un resultado con tipos nativos de Python y fechas AAAA-MM-DD"""
+    tabla = tabla.head(limit).copy()
+    for columna in tabla.columns:
+        if pd.api.types.is_datetime64_any_dtype(tabla[columna]):
+            tabla[columna] = tabla[columna].dt.strftime("%Y-%m-%d")
+    return [{clave: valor.item() if isinstance(valor, np.generic) else valor for clave, valor in fila.items()}
+            for fila in tabla.to_dict("records")]
+
+
+_tabla: Optional[Tuple[IndiceLicencias, TablaLicencias]] = None
+_tabla_lock = threading.Lock()
+
+
+def obtener_tabla(indice: IndiceLicencias) -> TablaLicencias:
+    """Tabla de columnas del índice, construida una sola vez por cada versión del índice"""
+    global _tabla
+    with _tabla_lock:
+        if _tabla is not None and _tabla[0] is indice:
+            return _tabla[1]
+    tabla = TablaLicencias(indice.registros)
+    with _tabla_lock:
+        _tabla = (indice, tabla)
+    return tabla
+
+
+def _error(mensaje: str, detalle: str) -> AnalisisLicenciasOutput:
+    return AnalisisLicenciasOutput(
+        resultado={"error": mensaje},
+        metadata={"success": False, "timestamp": datetime.datetime.now().isoformat(), "error": detalle}
+    )
+
+
+async def analisis_licencias(input_data: AnalisisLicenciasInput) -> AnalisisLicenciasOutput:
+    """
+    Herramienta que calcula agregados sobre todas las licencias de encargados en forma local:
+    licencias y días por empleado, licencias y días por mes, licencias superpuestas y duraciones.
+    Devuelve solo los totales y las filas agregadas, no los registros, así los números son exactos.
+
+    Args:
+        input_data: Operación, período, empleado y orden del análisis
+
+    Returns:
+        Filas agregadas y totales
+    """
+    if obtener_sincronizador() is None and not credenciales_configuradas():
+        return _error("Faltan credenciales de Rukovoditel", "Configuración incompleta")
+
+    try:
+        indice = await obtener_indice()
+    except (httpx.HTTPError, RukovoditelJSONError, RuntimeError) as e:
+        return _error(f"Error al construir el índice de licencias: {str(e)}", str(e))
+
+    inicio = time.perf_counter()
+    tabla = obtener_tabla(indice)
+    empleados = None
+    if input_data.empleado:
+        empleados = indice.empleados(input_data.empleado)
+        if not empleados:
+            return _error(f"No se encontraron licencias del empleado {input_data.empleado}", "Empleado desconocido")
+
+    hoy = np.datetime64(datetime.date.today(), "D")
+    hasta = np.datetime64(input_data.hasta, "D") if input_data.hasta else hoy
+    if input_data.desde:
+        desde = np.datetime64(input_data.desde, "D")
+    else:
+        desde = tabla.inicio.min() if len(tabla) else hasta
+    if desde > hasta:
+        return _error("El inicio del período es posterior a su fin", "Período inválido")
+
+    posiciones, a, b = tabla.recortar(desde, hasta, empleados)
+    if input_data.operacion == "por_empleado":
+        filas, totales = por_empleado(tabla, posiciones, a, b, input_data.ordenar_por)
+    elif input_data.operacion == "por_mes":
+        filas, totales = por_mes(tabla, posiciones, a, b, input_data.ordenar_por, desde, hasta)
+    elif input_data.operacion == "superposiciones":
+        filas, totales = superposiciones(tabla, posiciones, a, b, desde, hasta)
+    else:
+        filas, totales = duraciones(tabla, posiciones)
+    registros = _filas(filas, input_data.limit)
+    tiempo_calculo = (time.perf_counter() - inicio) * 1000
+
+    return AnalisisLicenciasOutput(
+        resultado={"registros": registros, "totales": totales},
+        metadata={
+            "success": True,
+            "origen": "indice",
+            "operacion": input_data.operacion,
+            "desde": _fecha(desde),
+            "hasta": _fecha(hasta),
+            "compute_ms": round(tiempo_calculo, 3),
+            "timestamp": datetime.datetime.now().isoformat(),
+            "record_count": len(registros),
+            "total_filas": len(filas),
+            "licencias_analizadas": int(len(posiciones)),
+            "index_size": len(indice.registros),
+            "sin_fecha_inicio": tabla.sin_fecha,
+            "index_built_at": datetime.datetime.fromtimestamp(indice.construido).isoformat(),
+        }
+    )
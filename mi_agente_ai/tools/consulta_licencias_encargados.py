@@ -1,11 +1,20 @@
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any, List, Union
-import requests
-import json
+from typing import Optional, Dict, Any, List, Union, AsyncIterator
+from contextlib import aclosing, closing
+import httpx
 import os
 import datetime
 from dotenv import load_dotenv
 
+from mi_agente_ai.services.rukovoditel import obtener_cliente, RukovoditelJSONError, TAMANO_PAGINA
+from mi_agente_ai.services import consulta_cacheada
+from mi_agente_ai.services.cache import clave_consulta
+from mi_agente_ai.services.sincronizacion import obtener_sincronizador
+from mi_agente_ai.tools.planificador import FiltrosLicencias, PlanConsulta, planificar
+from mi_agente_ai.tools.esquema import ESQUEMA_LICENCIAS, obtener_transformador
+from mi_agente_ai.tools.prebusqueda import prebusqueda_actual
+from mi_agente_ai.utils.trazas import span
+
 # Cargar variables de entorno
 load_dotenv()
 
@@ -13,15 +22,15 @@ load_dotenv()
 API_KEY = os.getenv("RUKOVODITEL_API_KEY")
 USER = os.getenv("RUKOVODITEL_USER")
 PASSWORD = os.getenv("RUKOVODITEL_PASSWORD")
-API_URL = "https://www.anastopulos.ar/ingresar/api/rest.php"
 
 class ConsultaLicenciasEncargadosInput(BaseModel):
     """Entrada para la herramienta de consulta de licencias de encargados"""
     entity_id: int = Field(43, description="ID de la entidad a consultar")
     reports_id: Optional[int] = Field(3930, description="ID del reporte a utilizar")
-    limit: int = Field(10, description="Límite de registros a obtener")
+    limit: int = Field(10, description="Límite de registros a obtener (los límites grandes se obtienen paginando)")
     select_fields: str = Field("651,665,653,912", description="IDs de campos a seleccionar, separados por comas")
     filters: Optional[Dict[str, Any]] = Field(None, description="Filtros adicionales para la consulta")
+    filtro: Optional[FiltrosLicencias] = Field(None, description="Filtros tipados: empleado, rango de fechas e igualdad por campo")
 
 class ConsultaLicenciasEncargadosOutput(BaseModel):
     """Salida de la herramienta de consulta de licencias de encargados"""
@@ -31,15 +40,12 @@ class ConsultaLicenciasEncargadosOutput(BaseModel):
 def _obtener_nombre_campo(campo_id):
     """
     Obtiene el nombre descriptivo de un campo según su ID.
-    Este mapping contiene los campos específicos de las licencias de encargados.
+    Los nombres de los campos de las licencias de encargados están en `ESQUEMA_LICENCIAS`.
     """
-    campo_mapping = {
-        "651": "Fecha de inicio",
-        "665": "Fecha Finalización",
-        "653": "Reincorporación",
-        "912": "Empleado"
-    }
-    return campo_mapping.get(str(campo_id), f"Campo {campo_id}")
+    return ESQUEMA_LICENCIAS.nombre_campo(campo_id)
+
+# Transformador compilado de los registros de licencias (ver `mi_agente_ai/tools/esquema.py`)
+_transformar_registro = obtener_transformador(ESQUEMA_LICENCIAS.entity_id)
 
 def transformar_respuesta(response_data):
     """
@@ -66,72 +72,33 @@ def transformar_respuesta(response_data):
     registros = response_data.get("data", [])
     
     # Preparar registros con nombres de campos descriptivos y orden específico
-    registros_procesados = []
-    
-    for registro in registros:
-        # Nuevo diccionario vacío para el registro procesado
-        registro_procesado = {}
-        
-        # 1. Primero agregamos el empleado si existe
-        for key, value in registro.items():
-            if key == "912":  # ID del campo Empleado
-                registro_procesado["Empleado"] = value
-                break
-        
-        # 2. Luego agregamos las fechas en orden específico
-        # Fecha de inicio
-        if "651" in registro:
-            registro_procesado["Fecha de inicio"] = registro["651"]
-            
-        # Fecha Finalización
-        if "665" in registro:
-            registro_procesado["Fecha Finalización"] = registro["665"]
-            
-        # Reincorporación
-        if "653" in registro:
-            registro_procesado["Reincorporación"] = registro["653"]
-        
-        # 3. Agregar cualquier otro campo que no sea de sistema y que no hayamos procesado aún
-        for key, value in registro.items():
-            if key not in ["id", "date_added", "date_updated", "created_by", "parent_item_id", 
-                          "912", "651", "665", "653"]:
-                nombre_campo = _obtener_nombre_campo(key)
-                registro_procesado[nombre_campo] = value
-        
-        registros_procesados.append(registro_procesado)
+    registros_procesados = _transformar_registro.transformar(registros)
     
     return {
         "registros": registros_procesados
     }
 
-def consulta_licencias_encargados(input_data: ConsultaLicenciasEncargadosInput) -> ConsultaLicenciasEncargadosOutput:
-    """
-    Herramienta que consulta licencias y permisos de encargados en el sistema Rukovoditel.
-    Permite obtener información detallada sobre las licencias, incluyendo fechas y empleados.
-    
-    Args:
-        input_data: Datos para realizar la consulta
-        
-    Returns:
-        Respuesta transformada de la consulta
-    """
-    # Verificar que tenemos las credenciales
-    if not API_KEY or not USER or not PASSWORD:
-        return ConsultaLicenciasEncargadosOutput(
-            resultado={
-                "error": "Faltan credenciales de Rukovoditel"
-            },
-            metadata={
-                "success": False,
-                "timestamp": datetime.datetime.now().isoformat(),
-                "error": "Configuración incompleta"
-            }
-        )
-    
-    # Registrar hora de inicio
-    inicio = datetime.datetime.now()
-    
-    # Construir parámetros
+def _salida_sin_credenciales() -> ConsultaLicenciasEncargadosOutput:
+    """Salida de error cuando faltan las credenciales de Rukovoditel"""
+    return ConsultaLicenciasEncargadosOutput(
+        resultado={
+            "error": "Faltan credenciales de Rukovoditel"
+        },
+        metadata={
+            "success": False,
+            "timestamp": datetime.datetime.now().isoformat(),
+            "error": "Configuración incompleta"
+        }
+    )
+
+def _campos(select_fields: str) -> List[str]:
+    """IDs de campos de `select_fields`, sin espacios ni vacíos"""
+    return [campo.strip() for campo in select_fields.split(",") if campo.strip()]
+
+def _construir_parametros(input_data: ConsultaLicenciasEncargadosInput, plan: PlanConsulta) -> Dict[str, Any]:
+    """Construye los parámetros de la petición `select` a la API según el plan de la consulta"""
+    campos = _campos(input_data.select_fields)
+    campos += sorted(plan.campos_requeridos - set(campos))
     params = {
         "key": API_KEY,
         "username": USER,
@@ -139,73 +106,281 @@ def consulta_licencias_encargados(input_data: ConsultaLicenciasEncargadosInput)
         "action": "select",
         "entity_id": input_data.entity_id,
         "limit": input_data.limit,
-        "select_fields": input_data.select_fields,
+        "select_fields": ",".join(campos),
     }
     
     # Añadir reports_id si está especificado
     if input_data.reports_id:
         params["reports_id"] = input_data.reports_id
     
-    # Añadir filtros si hay
-    if input_data.filters:
-        params["filters"] = input_data.filters
+    # Añadir los filtros que el plan delega al servidor
+    if plan.filtros_remotos:
+        params["filters"] = plan.filtros_remotos
     
+    return params
+
+def _proyectar(registro: Dict[str, Any], campos: set) -> Dict[str, Any]:
+    """Quita los campos pedidos solo para evaluar condiciones locales"""
+    return {k: v for k, v in registro.items() if k in campos or not k.isdigit()}
+
+async def _aobtener_respuesta(input_data: ConsultaLicenciasEncargadosInput, plan: PlanConsulta) -> Dict[str, Any]:
+    """
+    Obtiene la respuesta de la API. Si el límite supera el tamaño de página, o si el plan requiere
+    filtrar localmente, los registros se piden página por página (con la siguiente precargada)
+    hasta reunir `limit` coincidencias.
+    """
+    params = _construir_parametros(input_data, plan)
+    cliente = obtener_cliente()
+    if input_data.limit <= TAMANO_PAGINA and not plan.requiere_post_filtro:
+        return await cliente.aselect(params)
+    
+    campos = set(_campos(input_data.select_fields))
+    registros = []
     try:
-        # Realizar la petición
-        response = requests.post(API_URL, data=params, timeout=15)
-        
-        # Verificar si la respuesta es exitosa
-        response.raise_for_status()
+        async with aclosing(cliente.aiter_select(params)) as paginas:
+            async for registro in paginas:
+                if plan.coincide_local(registro):
+                    registros.append(_proyectar(registro, campos))
+                    if len(registros) >= input_data.limit:
+                        break
+    except RuntimeError as e:
+        return {"status": "error", "error": str(e)}
+    return {"status": "success", "data": registros}
+
+def _obtener_respuesta(input_data: ConsultaLicenciasEncargadosInput, plan: PlanConsulta) -> Dict[str, Any]:
+    """Versión síncrona de `_aobtener_respuesta`"""
+    params = _construir_parametros(input_data, plan)
+    cliente = obtener_cliente()
+    if input_data.limit <= TAMANO_PAGINA and not plan.requiere_post_filtro:
+        return cliente.select(params)
+    
+    campos = set(_campos(input_data.select_fields))
+    registros = []
+    try:
+        with closing(cliente.iter_select(params)) as paginas:
+            for registro in paginas:
+                if plan.coincide_local(registro):
+                    registros.append(_proyectar(registro, campos))
+                    if len(registros) >= input_data.limit:
+                        break
+    except RuntimeError as e:
+        return {"status": "error", "error": str(e)}
+    return {"status": "success", "data": registros}
+
+def planificar_consulta(input_data: ConsultaLicenciasEncargadosInput) -> PlanConsulta:
+    """Plan de ejecución (pushdown y post-filtro) de una consulta"""
+    return planificar(input_data.filters, input_data.filtro, input_data.reports_id)
+
+async def iterar_licencias(input_data: ConsultaLicenciasEncargadosInput,
+                           tamano_pagina: int = TAMANO_PAGINA) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Recorre todos los registros que coinciden con la consulta (ignorando `limit`), ya transformados.
+    La memoria usada depende del tamaño de página y no del total de registros.
+    
+    Args:
+        input_data: Datos de la consulta
+        tamano_pagina: Registros por petición
         
-        # Intentar parsear la respuesta como JSON
-        try:
-            response_data = response.json()
-            
-            # Calcular tiempo de respuesta
-            fin = datetime.datetime.now()
-            tiempo_respuesta = (fin - inicio).total_seconds() * 1000  # Convertir a milisegundos
-            
-            # Transformar la respuesta
-            resultado_transformado = transformar_respuesta(response_data)
-            
-            # Devolver el resultado
-            return ConsultaLicenciasEncargadosOutput(
-                resultado=resultado_transformado,
-                metadata={
-                    "success": response_data.get("status") == "success",
-                    "entity_id": input_data.entity_id,
-                    "reports_id": input_data.reports_id,
-                    "response_time_ms": round(tiempo_respuesta),
-                    "timestamp": fin.isoformat(),
-                    "limit": input_data.limit,
-                    "select_fields": input_data.select_fields,
-                    "record_count": len(resultado_transformado.get("registros", []))
-                }
-            )
-            
-        except json.JSONDecodeError:
-            # Si la respuesta no es JSON válido
-            return ConsultaLicenciasEncargadosOutput(
-                resultado={
-                    "error": "La respuesta de la API no es JSON válido"
-                },
-                metadata={
-                    "success": False,
-                    "timestamp": datetime.datetime.now().isoformat(),
-                    "error": "Error al decodificar JSON",
-                    "response_text": response.text[:200] + "..." if len(response.text) > 200 else response.text
-                }
-            )
-    
-    except requests.exceptions.RequestException as e:
-        # En caso de error con la petición
+    Yields:
+        Dict: Registro con nombres de campos descriptivos
+    """
+    plan = planificar_consulta(input_data)
+    campos = set(_campos(input_data.select_fields))
+    params = _construir_parametros(input_data, plan)
+    async with aclosing(obtener_cliente().aiter_select(params, tamano_pagina)) as paginas:
+        async for registro in paginas:
+            if plan.coincide_local(registro):
+                yield _transformar_registro(_proyectar(registro, campos))
+
+def _construir_salida(input_data: ConsultaLicenciasEncargadosInput, resultado_transformado: Dict[str, Any],
+                      inicio: datetime.datetime, **metadata_extra) -> ConsultaLicenciasEncargadosOutput:
+    """Arma la salida de la herramienta con sus metadatos a partir del resultado ya transformado"""
+    # Calcular tiempo de respuesta
+    fin = datetime.datetime.now()
+    tiempo_respuesta = (fin - inicio).total_seconds() * 1000  # Convertir a milisegundos
+    
+    # Devolver el resultado
+    return ConsultaLicenciasEncargadosOutput(
+        resultado=resultado_transformado,
+        metadata={
+            "success": "error" not in resultado_transformado,
+            "entity_id": input_data.entity_id,
+            "reports_id": input_data.reports_id,
+            "response_time_ms": round(tiempo_respuesta),
+            "timestamp": fin.isoformat(),
+            "limit": input_data.limit,
+            "select_fields": input_data.select_fields,
+            "record_count": len(resultado_transformado.get("registros", [])),
+            "plan": planificar_consulta(input_data).explicar(),
+            **metadata_extra
+        }
+    )
+
+def _buscar_en_espejo(input_data: ConsultaLicenciasEncargadosInput, plan: PlanConsulta,
+                      inicio: datetime.datetime) -> Optional[ConsultaLicenciasEncargadosOutput]:
+    """
+    Responde la consulta desde el espejo local sincronizado, si está vigente y la consulta
+    se puede resolver localmente (misma entidad y reporte, campos espejados y filtros evaluables)
+    """
+    sincronizador = obtener_sincronizador()
+    if sincronizador is None or not sincronizador.vigente():
+        return None
+    if input_data.entity_id != sincronizador.entity_id or input_data.reports_id != sincronizador.reports_id:
+        return None
+    
+    campos = set(_campos(input_data.select_fields))
+    if not campos | plan.campos_requeridos <= set(_campos(sincronizador.select_fields)):
+        return None
+    
+    if any(isinstance(valor, (dict, list)) for valor in (input_data.filters or {}).values()):
+        return None
+    
+    # Evaluar todas las condiciones del plan sobre los registros espejados
+    coincidencias = []
+    for registro in sincronizador.almacen.registros(input_data.entity_id):
+        if plan.coincide(registro):
+            coincidencias.append(_proyectar(registro, campos))
+            if len(coincidencias) >= input_data.limit:
+                break
+    
+    estado = sincronizador.almacen.estado(input_data.entity_id)
+    return _construir_salida(
+        input_data,
+        transformar_respuesta({"status": "success", "data": coincidencias}),
+        inicio,
+        origen="local",
+        entrega="fresca",
+        sync={"watermark": estado["watermark"], "version": estado["version"], "ultima_sync": estado["ultima_sync"]}
+    )
+
+def _transformar_con_traza(response_data: Dict[str, Any]) -> Dict[str, Any]:
+    with span("licencias.transformar", registros=len(response_data.get("data") or [])):
+        return transformar_respuesta(response_data)
+
+def _salida_prebuscada(input_data: ConsultaLicenciasEncargadosInput, salida: ConsultaLicenciasEncargadosOutput,
+                       inicio: datetime.datetime, ahorro_ms: float) -> ConsultaLicenciasEncargadosOutput:
+    """
+    Salida a partir de una consulta especulativa equivalente con un límite mayor: sus primeros
+    `limit` registros son los mismos que devolvería la consulta pedida
+    """
+    resultado = dict(salida.resultado)
+    resultado["registros"] = resultado.get("registros", [])[:input_data.limit]
+    extra = {clave: salida.metadata[clave] for clave in ("origen", "entrega", "respaldo", "sync") if clave in salida.metadata}
+    return _construir_salida(input_data, resultado, inicio, **extra,
+                             prebusqueda={"hit": True, "ahorro_ms": round(ahorro_ms)})
+
+
+def _salida_error(error: Exception) -> ConsultaLicenciasEncargadosOutput:
+    """Convierte un error de comunicación o de formato en una salida de la herramienta"""
+    if isinstance(error, RukovoditelJSONError):
+        # Si la respuesta no es JSON válido
         return ConsultaLicenciasEncargadosOutput(
             resultado={
-                "error": f"Error al comunicarse con la API: {str(e)}"
+                "error": "La respuesta de la API no es JSON válido"
             },
             metadata={
                 "success": False,
                 "timestamp": datetime.datetime.now().isoformat(),
-                "error": str(e)
+                "error": "Error al decodificar JSON",
+                "response_text": error.texto[:200] + "..." if len(error.texto) > 200 else error.texto
             }
-        ) 
\ No newline at end of file
+        )
+    
+    # En caso de error con la petición
+    return ConsultaLicenciasEncargadosOutput(
+        resultado={
+            "error": f"Error al comunicarse con la API: {str(error)}"
+        },
+        metadata={
+            "success": False,
+            "timestamp": datetime.datetime.now().isoformat(),
+            "error": str(error)
+        }
+    )
+
+async def consulta_licencias_encargados(input_data: ConsultaLicenciasEncargadosInput) -> ConsultaLicenciasEncargadosOutput:
+    """
+    Herramienta que consulta licencias y permisos de encargados en el sistema Rukovoditel.
+    Permite obtener información detallada sobre las licencias, incluyendo fechas y empleados.
+    
+    Args:
+        input_data: Datos para realizar la consulta
+        
+    Returns:
+        Respuesta transformada de la consulta
+    """
+    # Verificar que tenemos las credenciales
+    if not API_KEY or not USER or not PASSWORD:
+        return _salida_sin_credenciales()
+    
+    # Registrar hora de inicio
+    inicio = datetime.datetime.now()
+    
+    # Usar la consulta que el agente inició especulativamente mientras el modelo planificaba, si es equivalente
+    prebusqueda = prebusqueda_actual()
+    if prebusqueda is not None:
+        prebuscada = await prebusqueda.servir(input_data)
+        if prebuscada is not None:
+            salida, ahorro_ms = prebuscada
+            return _salida_prebuscada(input_data, salida, inicio, ahorro_ms)
+    
+    # Planificar qué filtros se delegan al servidor y cuáles se aplican localmente
+    plan = planificar_consulta(input_data)
+    
+    # Responder desde el espejo local si está sincronizado
+    salida_local = _buscar_en_espejo(input_data, plan, inicio)
+    if salida_local is not None:
+        return salida_local
+    
+    try:
+        # Consultar luego el cache y, si no está, la API con el pool de conexiones compartido; las
+        # llamadas concurrentes con la misma consulta esperan esta misma petición en lugar de repetirla
+        resultado, metadatos = await consulta_cacheada.aobtener(
+            clave_consulta(input_data), input_data.entity_id,
+            lambda: _aobtener_respuesta(input_data, plan), _transformar_con_traza
+        )
+    except (httpx.HTTPError, RukovoditelJSONError) as e:
+        return _salida_error(e)
+    return _construir_salida(input_data, resultado, inicio, **metadatos)
+
+def consulta_licencias_encargados_sync(input_data: ConsultaLicenciasEncargadosInput) -> ConsultaLicenciasEncargadosOutput:
+    """
+    Versión síncrona de `consulta_licencias_encargados`, para scripts y código fuera del event loop.
+    
+    Args:
+        input_data: Datos para realizar la consulta
+        
+    Returns:
+        Respuesta transformada de la consulta
+    """
+    # Verificar que tenemos las credenciales
+    if not API_KEY or not USER or not PASSWORD:
+        return _salida_sin_credenciales()
+    
+    # Registrar hora de inicio
+    inicio = datetime.datetime.now()
+    
+    # Planificar qué filtros se delegan al servidor y cuáles se aplican localmente
+    plan = planificar_consulta(input_data)
+    
+    # Responder desde el espejo local si está sincronizado
+    salida_local = _buscar_en_espejo(input_data, plan, inicio)
+    if salida_local is not None:
+        return salida_local
+    
+    # Consultar luego el cache (las entradas vencidas se revalidan con la consulta asíncrona)
+    clave = clave_consulta(input_data)
+    cacheado = consulta_cacheada.buscar_en_cache(
+        clave, input_data.entity_id, lambda: _aobtener_respuesta(input_data, plan), _transformar_con_traza
+    )
+    if cacheado is not None:
+        return _construir_salida(input_data, cacheado[0], inicio, **cacheado[1])
+    
+    try:
+        # Realizar la petición usando el pool de conexiones compartido, o esperar la idéntica en curso
+        resultado, metadatos = consulta_cacheada.consultar(
+            clave, input_data.entity_id, lambda: _obtener_respuesta(input_data, plan), _transformar_con_traza
+        )
+    except (httpx.HTTPError, RukovoditelJSONError) as e:
+        return _salida_error(e)
+    return _construir_salida(input_data, resultado, inicio, **metadatos)
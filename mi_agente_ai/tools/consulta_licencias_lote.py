@@ -0,0 +1,91 @@
+from pydantic import BaseModel, Field
+from typing import Dict, Any, List
+import os
+import time
+import asyncio
+import datetime
+
+from mi_agente_ai.services.cache import clave_consulta
+from mi_agente_ai.tools.consulta_licencias_encargados import (
+    ConsultaLicenciasEncargadosInput, consulta_licencias_encargados
+)
+
+# Subconsultas de un lote que se ejecutan a la vez sobre el pool de conexiones compartido
+LOTE_CONCURRENCIA = int(os.getenv("RUKOVODITEL_LOTE_CONCURRENCIA", "4"))
+# Subconsultas máximas por lote
+LOTE_MAX_CONSULTAS = int(os.getenv("RUKOVODITEL_LOTE_MAX_CONSULTAS", "10"))
+
+
+class ConsultaLicenciasLoteInput(BaseModel):
+    """Entrada para la herramienta de consulta de licencias en lote"""
+    consultas: List[ConsultaLicenciasEncargadosInput] = Field(
+        ..., description="Consultas a realizar juntas, por ejemplo una por empleado o por rango de fechas"
+    )
+
+
+class ConsultaLicenciasLoteOutput(BaseModel):
+    """Salida de la herramienta de consulta de licencias en lote"""
+    resultado: Dict[str, Any] = Field(..., description="Resultado de cada consulta, por su posición en la lista")
+    metadata: Dict[str, Any] = Field(..., description="Metadatos del lote")
+
+
+async def consulta_licencias_lote(input_data: ConsultaLicenciasLoteInput) -> ConsultaLicenciasLoteOutput:
+    """
+    Herramienta que realiza varias consultas de licencias de encargados en una sola llamada
+    (por ejemplo, las licencias de tres empleados distintos o de varios meses). Las consultas
+    repetidas se hacen una sola vez y el resto se ejecutan en paralelo.
+
+    Args:
+        input_data: Lista de consultas, con los mismos parámetros que consulta_licencias_encargados
+
+    Returns:
+        El resultado de cada consulta en `resultado["resultados"]`, con la posición de la consulta como clave
+    """
+    consultas = input_data.consultas
+    if not consultas:
+        return ConsultaLicenciasLoteOutput(
+            resultado={"error": "Debe indicar al menos una consulta"},
+            metadata={"success": False, "timestamp": datetime.datetime.now().isoformat(), "error": "Lote vacío"}
+        )
+    if len(consultas) > LOTE_MAX_CONSULTAS:
+        return ConsultaLicenciasLoteOutput(
+            resultado={"error": f"El lote admite hasta {LOTE_MAX_CONSULTAS} consultas"},
+            metadata={"success": False, "timestamp": datetime.datetime.now().isoformat(), "error": "Lote demasiado grande"}
+        )
+
+    inicio = time.perf_counter()
+
+    # Agrupar las consultas idénticas por su clave canónica
+    posiciones_por_clave: Dict[str, List[int]] = {}
+    for posicion, consulta in enumerate(consultas):
+        posiciones_por_clave.setdefault(clave_consulta(consulta), []).append(posicion)
+
+    semaforo = asyncio.Semaphore(LOTE_CONCURRENCIA)
+
+    async def ejecutar(posicion: int):
+        async with semaforo:
+            return await consulta_licencias_encargados(consultas[posicion])
+
+    unicas = [posiciones[0] for posiciones in posiciones_por_clave.values()]
+    salidas = await asyncio.gather(*(ejecutar(posicion) for posicion in unicas))
+
+    resultados: Dict[str, Any] = {}
+    for posiciones, salida in zip(posiciones_por_clave.values(), salidas):
+        resultados[str(posiciones[0])] = {**salida.resultado, "record_count": salida.metadata.get("record_count", 0)}
+        # Las repetidas solo remiten a la primera para no enviar los mismos registros dos veces
+        for posicion in posiciones[1:]:
+            resultados[str(posicion)] = {"igual_a": str(posiciones[0])}
+
+    tiempo_total = (time.perf_counter() - inicio) * 1000
+    return ConsultaLicenciasLoteOutput(
+        resultado={"resultados": dict(sorted(resultados.items(), key=lambda item: int(item[0])))},
+        metadata={
+            "success": all(salida.metadata.get("success", False) for salida in salidas),
+            "consultas": len(consultas),
+            "consultas_unicas": len(unicas),
+            "duplicadas": len(consultas) - len(unicas),
+            "response_time_ms": round(tiempo_total, 2),
+            "suma_tiempos_ms": round(sum(salida.metadata.get("response_time_ms", 0) for salida in salidas), 2),
+            "timestamp": datetime.datetime.now().isoformat(),
+        }
+    )
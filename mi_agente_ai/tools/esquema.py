@@ -0,0 +1,151 @@
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, Any, List, Literal, Callable, Tuple
+import functools
+
+from mi_agente_ai.tools.planificador import CAMPO_EMPLEADO, CAMPO_INICIO, CAMPO_FIN, CAMPO_REINCORPORACION
+from mi_agente_ai.utils.fechas import parsear_fecha
+
+# Campos de sistema que Rukovoditel agrega a todos los registros
+CAMPOS_SISTEMA = ("id", "date_added", "date_updated", "created_by", "parent_item_id")
+
+
+class CampoEsquema(BaseModel):
+    """Definición de un campo de una entidad de Rukovoditel"""
+    id: str = Field(..., description="ID del campo en Rukovoditel")
+    nombre: str = Field(..., description="Nombre descriptivo que se muestra al LLM y en la UI")
+    tipo: Literal["texto", "fecha", "numero"] = Field("texto", description="Tipo de valor del campo")
+    orden: int = Field(0, description="Posición del campo en los registros transformados")
+    sistema: bool = Field(False, description="Si el campo se omite en los registros transformados")
+
+
+class EsquemaEntidad(BaseModel):
+    """Campos de una entidad: a partir de este esquema se compila un transformador de registros"""
+    entity_id: int
+    campos: List[CampoEsquema]
+
+    def nombre_campo(self, campo_id: Any) -> str:
+        for campo in self.campos:
+            if campo.id == str(campo_id):
+                return campo.nombre
+        return f"Campo {campo_id}"
+
+    def compilar(self, parsear_fechas: bool = False) -> "TransformadorRegistros":
+        return TransformadorRegistros(self, parsear_fechas)
+
+
+@functools.lru_cache(maxsize=8192)
+def _fecha(valor: Any):
+    # Las fechas se repiten mucho entre registros: se parsea cada texto una sola vez
+    return parsear_fecha(valor)
+
+
+def _convertir_fecha(valor: Any):
+    return _fecha(valor) if isinstance(valor, (str, int, float)) else parsear_fecha(valor)
+
+
+def _convertir_numero(valor: Any):
+    if valor in (None, ""):
+        return None
+    try:
+        numero = float(valor)
+    except (TypeError, ValueError):
+        return valor
+    return int(numero) if numero.is_integer() else numero
+
+
+_CONVERSORES: Dict[str, Callable[[Any], Any]] = {"fecha": _convertir_fecha, "numero": _convertir_numero}
+
+
+class TransformadorRegistros:
+    """
+    Transformador de registros crudos de una entidad, compilado una sola vez a partir de su esquema.
+    Los IDs, nombres y conversores de los campos se calculan una vez por entidad, así cada registro
+    se recorre una sola vez y sin armar mappings ni listas por registro.
+
+    Con `parsear_fechas=True` los campos de tipo fecha se convierten en objetos `date`
+    (y los numéricos en números); si no, los valores se conservan tal como los devuelve la API.
+    """
+
+    def __init__(self, esquema: EsquemaEntidad, parsear_fechas: bool = False):
+        self.esquema = esquema
+        self.parsear_fechas = parsear_fechas
+        visibles = sorted((c for c in esquema.campos if not c.sistema), key=lambda c: c.orden)
+        self._campos: Tuple[Tuple[str, str, Optional[Callable[[Any], Any]]], ...] = tuple(
+            (c.id, c.nombre, _CONVERSORES.get(c.tipo) if parsear_fechas else None) for c in visibles
+        )
+        # IDs que no deben aparecer entre los campos adicionales (de sistema o ya procesados)
+        self._omitidos = frozenset(CAMPOS_SISTEMA) | {c.id for c in esquema.campos}
+        self._nombres_adicionales: Dict[str, str] = {}
+        self._funcion = self._compilar()
+
+    def _compilar(self) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+        """Arma la función que transforma un registro: campos conocidos en orden y después los adicionales"""
+        campos = self._campos
+        omitidos = self._omitidos
+        nombre_adicional = self._nombre_adicional
+
+        def transformar(registro: Dict[str, Any]) -> Dict[str, Any]:
+            procesado = {}
+            for campo_id, nombre, convertir in campos:
+                if campo_id in registro:
+                    valor = registro[campo_id]
+                    procesado[nombre] = convertir(valor) if convertir is not None else valor
+            if len(registro) > len(procesado):
+                for campo_id, valor in registro.items():
+                    if campo_id not in omitidos:
+                        procesado[nombre_adicional(campo_id)] = valor
+            return procesado
+        return transformar
+
+    @property
+    def columnas(self) -> List[str]:
+        return [nombre for _, nombre, _ in self._campos]
+
+    def _nombre_adicional(self, campo_id: Any) -> str:
+        nombre = self._nombres_adicionales.get(campo_id)
+        if nombre is None:
+            nombre = self._nombres_adicionales[campo_id] = f"Campo {campo_id}"
+        return nombre
+
+    def __call__(self, registro: Dict[str, Any]) -> Dict[str, Any]:
+        """Transforma un registro crudo de la API en un diccionario con nombres descriptivos y orden lógico"""
+        return self._funcion(registro)
+
+    def transformar(self, registros: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return list(map(self._funcion, registros))
+
+    def columnar(self, registros: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+        """
+        Transforma muchos registros a formato de columnas ({nombre: [valores]}), listo para
+        `pandas.DataFrame`. Cada columna se arma de una vez y las fechas se parsean una vez por valor distinto.
+        Los campos que faltan en un registro quedan como None.
+        """
+        columnas: Dict[str, List[Any]] = {}
+        for campo_id, nombre, convertir in self._campos:
+            valores = [registro.get(campo_id) for registro in registros]
+            if any(valor is not None for valor in valores):
+                if convertir is not None:
+                    valores = [convertir(valor) if valor is not None else None for valor in valores]
+                columnas[nombre] = valores
+        adicionales = {campo_id for registro in registros for campo_id in registro} - self._omitidos
+        for campo_id in sorted(adicionales):
+            columnas[self._nombre_adicional(campo_id)] = [registro.get(campo_id) for registro in registros]
+        return columnas
+
+
+ESQUEMA_LICENCIAS = EsquemaEntidad(entity_id=43, campos=[
+    CampoEsquema(id=CAMPO_EMPLEADO, nombre="Empleado", orden=0),
+    CampoEsquema(id=CAMPO_INICIO, nombre="Fecha de inicio", tipo="fecha", orden=1),
+    CampoEsquema(id=CAMPO_FIN, nombre="Fecha Finalización", tipo="fecha", orden=2),
+    CampoEsquema(id=CAMPO_REINCORPORACION, nombre="Reincorporación", tipo="fecha", orden=3),
+])
+
+# Esquemas conocidos por ID de entidad
+ESQUEMAS: Dict[int, EsquemaEntidad] = {ESQUEMA_LICENCIAS.entity_id: ESQUEMA_LICENCIAS}
+
+
+@functools.lru_cache(maxsize=None)
+def obtener_transformador(entity_id: int = 43, parsear_fechas: bool = False) -> TransformadorRegistros:
+    """Transformador compilado para una entidad (se compila una vez por entidad y modo)"""
+    esquema = ESQUEMAS.get(entity_id) or EsquemaEntidad(entity_id=entity_id, campos=[])
+    return esquema.compilar(parsear_fechas)
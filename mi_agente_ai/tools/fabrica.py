@@ -0,0 +1,294 @@
+from pydantic import BaseModel, Field, ConfigDict, create_model
+from pydantic_ai import RunContext
+from pydantic_ai.tools import Tool, ToolDefinition, GenerateToolJsonSchema
+from typing import Optional, Dict, Any, List, Tuple, Type, Literal
+import os
+import time
+import dataclasses
+import datetime
+import functools
+import threading
+import httpx
+from dotenv import load_dotenv
+
+from mi_agente_ai.services.rukovoditel import (
+    obtener_cliente, parametros_autenticacion, credenciales_configuradas, RukovoditelJSONError
+)
+from mi_agente_ai.services import consulta_cacheada
+from mi_agente_ai.services.cache import clave_consulta
+from mi_agente_ai.tools.esquema import CampoEsquema, EsquemaEntidad, TransformadorRegistros, ESQUEMAS, CAMPOS_SISTEMA
+from mi_agente_ai.utils.serializacion import salida_compacta
+from mi_agente_ai.utils.texto import normalizar_texto
+
+# Cargar variables de entorno
+load_dotenv()
+
+# Entidades consultables además de las licencias, con el formato "nombre:entity_id[:reports_id]" separadas por comas
+# (por ejemplo "consorcios:21,expensas:25:120,proveedores:30")
+ENTIDADES = os.getenv("RUKOVODITEL_ENTIDADES", "")
+# Acción de la API que devuelve los campos de una entidad
+ACCION_CAMPOS = os.getenv("RUKOVODITEL_ACCION_CAMPOS", "get_fields")
+# Segundos de vigencia de los metadatos de campos
+METADATOS_TTL = float(os.getenv("RUKOVODITEL_METADATOS_TTL", "86400"))
+
+# Tipos de campo de Rukovoditel y su tipo en el esquema
+TIPOS_SISTEMA = {"fieldtype_id", "fieldtype_date_added", "fieldtype_date_updated", "fieldtype_created_by",
+                 "fieldtype_parent_item_id", "fieldtype_action"}
+TIPOS_FECHA = {"fieldtype_input_date", "fieldtype_input_datetime", "fieldtype_dynamic_date", "fieldtype_date_updated"}
+TIPOS_NUMERO = {"fieldtype_input_numeric", "fieldtype_input_numeric_comments", "fieldtype_formula", "fieldtype_auto_increment"}
+
+
+class EntidadConfig(BaseModel):
+    """Entidad de Rukovoditel para la que se genera una herramienta"""
+    nombre: str = Field(..., description="Nombre corto de la entidad, usado en el nombre de la herramienta")
+    entity_id: int
+    reports_id: Optional[int] = None
+
+
+class ConsultaEntidadInput(BaseModel):
+    """Entrada de las herramientas de consulta generadas por entidad"""
+    campos: Optional[List[str]] = Field(None, description="Nombres de los campos a devolver (todos si se omite)")
+    filtros: Optional[Dict[str, Any]] = Field(None, description="Filtros por nombre de campo; las fechas como rango \"AAAA-MM-DD,AAAA-MM-DD\"")
+    limit: int = Field(10, description="Límite de registros a obtener")
+
+
+class ConsultaEntidadOutput(BaseModel):
+    """Salida de las herramientas de consulta generadas por entidad"""
+    resultado: Dict[str, Any] = Field(..., description="Registros con nombres de campos descriptivos")
+    metadata: Dict[str, Any] = Field(..., description="Metadatos de la consulta")
+
+
+def parsear_entidades(valor: str) -> List[EntidadConfig]:
+    """Convierte "consorcios:21,expensas:25:120" en la lista de entidades configuradas"""
+    entidades = []
+    for parte in valor.split(","):
+        piezas = [p.strip() for p in parte.split(":")]
+        if len(piezas) < 2 or not piezas[0] or not piezas[1].isdigit():
+            continue
+        reports_id = int(piezas[2]) if len(piezas) > 2 and piezas[2].isdigit() else None
+        entidades.append(EntidadConfig(nombre=piezas[0], entity_id=int(piezas[1]), reports_id=reports_id))
+    return entidades
+
+
+def modelo_entrada(esquema: EsquemaEntidad) -> Type[ConsultaEntidadInput]:
+    """
+    Entrada de la herramienta de una entidad con sus campos tipados: los nombres válidos como enum y
+    un filtro opcional por campo. Solo se usa para la definición que ve el LLM; la validación de los
+    nombres la hace `consultar_entidad`.
+    """
+    visibles = [c for c in esquema.campos if not c.sistema]
+    if not visibles:
+        return ConsultaEntidadInput
+    filtros = create_model(
+        f"FiltrosEntidad{esquema.entity_id}",
+        __config__=ConfigDict(extra="forbid"),
+        **{
+            f"campo_{c.id}": (Optional[str], Field(
+                None, alias=c.nombre,
+                description="Rango \"AAAA-MM-DD,AAAA-MM-DD\"" if c.tipo == "fecha" else f"Valor ({c.tipo})",
+            ))
+            for c in visibles
+        },
+    )
+    return create_model(
+        f"ConsultaEntidad{esquema.entity_id}Input",
+        __base__=ConsultaEntidadInput,
+        __doc__=ConsultaEntidadInput.__doc__,
+        campos=(Optional[List[Literal[tuple(c.nombre for c in visibles)]]],
+                Field(None, description=ConsultaEntidadInput.model_fields["campos"].description)),
+        filtros=(Optional[filtros], Field(None, description=ConsultaEntidadInput.model_fields["filtros"].description)),
+    )
+
+
+def esquema_desde_metadatos(entity_id: int, campos: List[Dict[str, Any]]) -> EsquemaEntidad:
+    """Arma el esquema de una entidad a partir de la lista de campos que devuelve la API"""
+    esquema = []
+    for posicion, campo in enumerate(campos):
+        tipo = str(campo.get("type", ""))
+        esquema.append(CampoEsquema(
+            id=str(campo["id"]),
+            nombre=str(campo.get("name") or f"Campo {campo['id']}"),
+            tipo="fecha" if tipo in TIPOS_FECHA else "numero" if tipo in TIPOS_NUMERO else "texto",
+            orden=int(campo.get("sort_order") or posicion),
+            sistema=tipo in TIPOS_SISTEMA or str(campo["id"]) in CAMPOS_SISTEMA,
+        ))
+    return EsquemaEntidad(entity_id=entity_id, campos=esquema)
+
+
+class CatalogoMetadatos:
+    """
+    Metadatos de campos por entidad, pedidos a Rukovoditel la primera vez que se consulta cada entidad
+    y guardados junto con su transformador compilado. Si la API no devuelve metadatos se usa el esquema
+    conocido de la entidad (o uno vacío, con los campos nombrados por su ID).
+    """
+
+    def __init__(self, ttl: float = METADATOS_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # entity_id -> (esquema, transformador, cargado, origen, esquema de parámetros de la herramienta)
+        self._entradas: Dict[int, Tuple[EsquemaEntidad, TransformadorRegistros, float, str, Dict[str, Any]]] = {}
+
+    def en_cache(self, entity_id: int) -> Optional[Tuple[EsquemaEntidad, Dict[str, Any]]]:
+        """Esquema ya cargado de una entidad y el esquema de parámetros de su herramienta, sin pedirlos a la API"""
+        with self._lock:
+            entrada = self._entradas.get(entity_id)
+        if entrada is None or time.time() - entrada[2] > self.ttl:
+            return None
+        return entrada[0], entrada[4]
+
+    async def obtener(self, entity_id: int) -> Tuple[EsquemaEntidad, TransformadorRegistros, str]:
+        """Esquema, transformador y origen ("api", "local" o "vacio") de una entidad"""
+        with self._lock:
+            entrada = self._entradas.get(entity_id)
+        if entrada is not None and time.time() - entrada[2] <= self.ttl:
+            return entrada[0], entrada[1], entrada[3]
+
+        esquema, origen = None, "api"
+        try:
+            response_data = await obtener_cliente().aselect({
+                **parametros_autenticacion(), "action": ACCION_CAMPOS, "entity_id": entity_id,
+            })
+            if response_data.get("status") == "success" and isinstance(response_data.get("data"), list):
+                esquema = esquema_desde_metadatos(entity_id, response_data["data"])
+        except (httpx.HTTPError, RukovoditelJSONError, KeyError, ValueError):
+            esquema = None
+        if esquema is None or not esquema.campos:
+            esquema = ESQUEMAS.get(entity_id)
+            origen = "local" if esquema is not None else "vacio"
+            esquema = esquema or EsquemaEntidad(entity_id=entity_id, campos=[])
+
+        transformador = esquema.compilar()
+        parametros = modelo_entrada(esquema).model_json_schema(schema_generator=GenerateToolJsonSchema)
+        with self._lock:
+            self._entradas[entity_id] = (esquema, transformador, time.time(), origen, parametros)
+        return esquema, transformador, origen
+
+
+catalogo_metadatos = CatalogoMetadatos()
+
+
+def _resolver_campo(esquema: EsquemaEntidad, nombre: Any) -> Optional[str]:
+    """ID de un campo a partir de su nombre (sin importar mayúsculas ni tildes) o de su ID"""
+    texto = str(nombre).strip()
+    normalizado = normalizar_texto(texto)
+    for campo in esquema.campos:
+        if campo.id == texto or normalizar_texto(campo.nombre) == normalizado:
+            return campo.id
+    return texto if texto.isdigit() and not esquema.campos else None
+
+
+def _error(mensaje: str, detalle: str) -> ConsultaEntidadOutput:
+    return ConsultaEntidadOutput(
+        resultado={"error": mensaje},
+        metadata={"success": False, "timestamp": datetime.datetime.now().isoformat(), "error": detalle}
+    )
+
+
+def _transformar_respuesta(transformador: TransformadorRegistros, response_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Registros con nombres de campos descriptivos, o {"error": ...} si la API respondió con un error"""
+    if response_data.get("status") != "success":
+        return {"error": response_data.get("error", "Error desconocido al consultar la API")}
+    return {"registros": transformador.transformar(response_data.get("data", []))}
+
+
+async def consultar_entidad(entidad: EntidadConfig, input_data: ConsultaEntidadInput) -> ConsultaEntidadOutput:
+    """Consulta los registros de una entidad traduciendo los nombres de campos a IDs con sus metadatos"""
+    if not credenciales_configuradas():
+        return _error("Faltan credenciales de Rukovoditel", "Configuración incompleta")
+
+    inicio = datetime.datetime.now()
+    esquema, transformador, origen = await catalogo_metadatos.obtener(entidad.entity_id)
+    visibles = [c.nombre for c in esquema.campos if not c.sistema]
+
+    # Traducir nombres de campos a IDs
+    campos, filtros, desconocidos = [], {}, []
+    for nombre in input_data.campos or []:
+        campo_id = _resolver_campo(esquema, nombre)
+        if campo_id:
+            campos.append(campo_id)
+        else:
+            desconocidos.append(nombre)
+    for nombre, valor in (input_data.filtros or {}).items():
+        campo_id = _resolver_campo(esquema, nombre)
+        if campo_id:
+            filtros[campo_id] = valor
+        else:
+            desconocidos.append(nombre)
+    if desconocidos:
+        return _error(f"Campos desconocidos en {entidad.nombre}: {', '.join(map(str, desconocidos))}. "
+                      f"Campos disponibles: {', '.join(visibles)}", "Campos desconocidos")
+    if not campos:
+        campos = [c.id for c in esquema.campos if not c.sistema]
+
+    params = {**parametros_autenticacion(), "action": "select", "entity_id": entidad.entity_id, "limit": input_data.limit}
+    if campos:
+        params["select_fields"] = ",".join(campos)
+    if entidad.reports_id:
+        params["reports_id"] = entidad.reports_id
+    if filtros:
+        params["filters"] = filtros
+
+    clave = f"entidad:{entidad.entity_id}:{clave_consulta(input_data)}"
+    try:
+        resultado, metadatos = await consulta_cacheada.aobtener(
+            clave, entidad.entity_id, lambda: obtener_cliente().aselect(params),
+            functools.partial(_transformar_respuesta, transformador)
+        )
+    except (httpx.HTTPError, RukovoditelJSONError) as e:
+        return _error(f"Error al consultar {entidad.nombre}: {str(e)}", str(e))
+    if "error" in resultado:
+        return _error(resultado["error"], resultado["error"])
+
+    return ConsultaEntidadOutput(
+        resultado=resultado,
+        metadata={
+            "success": True,
+            "entidad": entidad.nombre,
+            "entity_id": entidad.entity_id,
+            "reports_id": entidad.reports_id,
+            "esquema": origen,
+            "limit": input_data.limit,
+            "record_count": len(resultado["registros"]),
+            "response_time_ms": round((datetime.datetime.now() - inicio).total_seconds() * 1000, 2),
+            "timestamp": datetime.datetime.now().isoformat(),
+            **metadatos,
+        }
+    )
+
+
+def _descripcion(entidad: EntidadConfig, esquema: Optional[EsquemaEntidad]) -> str:
+    descripcion = (f"Consulta registros de {entidad.nombre} (entidad {entidad.entity_id} de Rukovoditel). "
+                   "Los resultados llegan como tabla con nombres de campos descriptivos.")
+    if esquema is not None:
+        nombres = [c.nombre for c in esquema.campos if not c.sistema]
+        if nombres:
+            descripcion += f" Campos: {', '.join(nombres)}."
+    return descripcion
+
+
+def crear_herramienta(entidad: EntidadConfig) -> Tool:
+    """
+    Genera la herramienta de consulta de una entidad. No pide metadatos al crearse: se piden en la
+    primera consulta y, una vez cargados, la definición de la herramienta enumera los campos válidos.
+    """
+    async def herramienta(input_data: ConsultaEntidadInput) -> ConsultaEntidadOutput:
+        return await consultar_entidad(entidad, input_data)
+
+    herramienta.__name__ = f"consulta_{entidad.nombre}"
+    herramienta.__doc__ = _descripcion(entidad, None)
+
+    async def preparar(ctx: RunContext, definicion: ToolDefinition) -> ToolDefinition:
+        # Con los metadatos cargados, los nombres de campos quedan tipados en el esquema de parámetros
+        cargado = catalogo_metadatos.en_cache(entidad.entity_id)
+        if cargado is None:
+            return definicion
+        esquema, parametros = cargado
+        return dataclasses.replace(definicion, description=_descripcion(entidad, esquema), parameters_json_schema=parametros)
+
+    return Tool(salida_compacta(herramienta), name=herramienta.__name__, description=herramienta.__doc__, prepare=preparar)
+
+
+@functools.lru_cache(maxsize=None)
+def herramientas_entidades(entidades: str = ENTIDADES) -> Tuple[Tool, ...]:
+    """Herramientas de las entidades configuradas en `RUKOVODITEL_ENTIDADES` (sin pedir metadatos)"""
+    return tuple(crear_herramienta(entidad) for entidad in parsear_entidades(entidades))
@@ -0,0 +1,255 @@
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, Any, List, Tuple
+import time
+import bisect
+import datetime
+import threading
+import httpx
+
+from mi_agente_ai.services.rukovoditel import credenciales_configuradas, RukovoditelJSONError
+from mi_agente_ai.services.sincronizacion import obtener_sincronizador
+from mi_agente_ai.tools.indice_licencias import IndiceLicencias, obtener_indice
+from mi_agente_ai.tools.planificador import CAMPO_EMPLEADO
+from mi_agente_ai.utils.texto import normalizar_texto
+
+# Puntaje mínimo (0 a 1) para considerar que un empleado coincide con el nombre buscado
+PUNTAJE_MINIMO = 0.6
+
+
+class BuscarEmpleadoInput(BaseModel):
+    """Entrada para la herramienta de búsqueda de empleados por nombre"""
+    nombre: str = Field(..., description="Nombre del empleado tal como lo escribió el usuario (en cualquier orden, con o sin tildes o errores menores)")
+    limit: int = Field(5, description="Cantidad máxima de candidatos a devolver")
+
+
+class BuscarEmpleadoOutput(BaseModel):
+    """Salida de la herramienta de búsqueda de empleados por nombre"""
+    resultado: Dict[str, Any] = Field(..., description="Empleados candidatos ordenados por puntaje")
+    metadata: Dict[str, Any] = Field(..., description="Metadatos de la búsqueda")
+
+
+def _tokens(nombre: str) -> List[str]:
+    return normalizar_texto(nombre).replace(",", " ").split()
+
+
+def distancia_edicion(a: str, b: str, maximo: int) -> int:
+    """Distancia de Levenshtein entre dos palabras; corta en `maximo + 1` si la supera"""
+    if abs(len(a) - len(b)) > maximo:
+        return maximo + 1
+    anterior = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        actual = [i]
+        for j, cb in enumerate(b, 1):
+            actual.append(min(anterior[j] + 1, actual[j - 1] + 1, anterior[j - 1] + (ca != cb)))
+        if min(actual) > maximo:
+            return maximo + 1
+        anterior = actual
+    return anterior[-1]
+
+
+def tolerancia(palabra: str) -> int:
+    """Errores de tipeo admitidos según el largo de la palabra"""
+    return 0 if len(palabra) <= 3 else 1 if len(palabra) <= 6 else 2
+
+
+class _ArbolBK:
+    """Árbol BK de palabras para buscar las que están a poca distancia de edición"""
+
+    def __init__(self):
+        self._raiz: Optional[Tuple[str, Dict[int, Any]]] = None
+
+    def agregar(self, palabra: str):
+        if self._raiz is None:
+            self._raiz = (palabra, {})
+            return
+        nodo = self._raiz
+        while True:
+            distancia = distancia_edicion(palabra, nodo[0], len(palabra) + len(nodo[0]))
+            if distancia == 0:
+                return
+            hijo = nodo[1].get(distancia)
+            if hijo is None:
+                nodo[1][distancia] = (palabra, {})
+                return
+            nodo = hijo
+
+    def buscar(self, palabra: str, maximo: int) -> List[Tuple[str, int]]:
+        """Palabras a distancia <= maximo, con su distancia"""
+        encontradas = []
+        pendientes = [self._raiz] if self._raiz is not None else []
+        while pendientes:
+            actual, hijos = pendientes.pop()
+            distancia = distancia_edicion(palabra, actual, len(palabra) + len(actual))
+            if distancia <= maximo:
+                encontradas.append((actual, distancia))
+            # Por la desigualdad triangular solo pueden servir los hijos a distancia [d - maximo, d + maximo]
+            for d, hijo in hijos.items():
+                if distancia - maximo <= d <= distancia + maximo:
+                    pendientes.append(hijo)
+        return encontradas
+
+
+class IndiceEmpleados:
+    """
+    Índice de los nombres de empleados del campo 912. Los nombres se normalizan (minúsculas, sin tildes
+    ni comas) y se indexan por palabra, de modo que "Celestino Ayvar", "ayvar celestino" o "Celestino Aybar"
+    resuelven a "AYVAR, Celestino". Las palabras con errores de tipeo se buscan en un árbol BK y las
+    incompletas por prefijo.
+    """
+
+    def __init__(self, registros: List[Dict[str, Any]], licencias_indice: Optional[IndiceLicencias] = None):
+        self.construido = time.time()
+        # Índice de licencias del que se construyó (para consultar las licencias del empleado resuelto)
+        self.licencias_indice = licencias_indice
+        # nombre canónico (tal como está en Rukovoditel) -> cantidad de licencias
+        self.licencias: Dict[str, int] = {}
+        self._tokens_empleado: Dict[str, List[str]] = {}
+        self._por_token: Dict[str, List[str]] = {}
+        self._arbol = _ArbolBK()
+
+        for registro in registros:
+            nombre = str(registro.get("Empleado") or "").strip()
+            if nombre:
+                self.licencias[nombre] = self.licencias.get(nombre, 0) + 1
+
+        for nombre in self.licencias:
+            tokens = _tokens(nombre)
+            self._tokens_empleado[nombre] = tokens
+            for token in set(tokens):
+                self._por_token.setdefault(token, []).append(nombre)
+        for token in self._por_token:
+            self._arbol.agregar(token)
+        self._tokens_ordenados = sorted(self._por_token)
+
+    def _similares(self, token: str) -> Dict[str, float]:
+        """Palabras del índice parecidas a `token`, con un puntaje entre 0 y 1"""
+        if token in self._por_token:
+            return {token: 1.0}
+        similares = {}
+        for palabra, distancia in self._arbol.buscar(token, tolerancia(token)):
+            similares[palabra] = 1.0 - distancia / max(len(token), len(palabra))
+        # Palabras incompletas ("Cele" -> "celestino")
+        if len(token) >= 3:
+            posicion = bisect.bisect_left(self._tokens_ordenados, token)
+            while posicion < len(self._tokens_ordenados) and self._tokens_ordenados[posicion].startswith(token):
+                palabra = self._tokens_ordenados[posicion]
+                similares[palabra] = max(similares.get(palabra, 0.0), 0.5 + 0.5 * len(token) / len(palabra))
+                posicion += 1
+        return similares
+
+    def buscar(self, nombre: str, limit: int = 5, puntaje_minimo: float = PUNTAJE_MINIMO) -> List[Dict[str, Any]]:
+        """
+        Empleados que coinciden con el nombre buscado, del más al menos parecido
+
+        Returns:
+            Lista de candidatos con `empleado` (nombre canónico), `puntaje` y `licencias`
+        """
+        tokens = _tokens(nombre)
+        if not tokens:
+            return []
+        puntajes: Dict[str, float] = {}
+        for token in tokens:
+            mejores: Dict[str, float] = {}
+            for palabra, puntaje in self._similares(token).items():
+                for empleado in self._por_token[palabra]:
+                    mejores[empleado] = max(mejores.get(empleado, 0.0), puntaje)
+            for empleado, puntaje in mejores.items():
+                puntajes[empleado] = puntajes.get(empleado, 0.0) + puntaje
+
+        candidatos = []
+        for empleado, total in puntajes.items():
+            # Las palabras buscadas pesan más; las del nombre que no se mencionaron restan un poco
+            cubiertas = total / len(tokens)
+            extra = max(0, len(self._tokens_empleado[empleado]) - len(tokens))
+            puntaje = cubiertas * (1.0 - 0.05 * extra)
+            if puntaje >= puntaje_minimo:
+                candidatos.append({"empleado": empleado, "puntaje": round(puntaje, 3), "licencias": self.licencias[empleado]})
+        candidatos.sort(key=lambda c: (-c["puntaje"], c["empleado"]))
+        return candidatos[:limit]
+
+    def resolver(self, nombre: str, margen: float = 0.1) -> Optional[str]:
+        """Nombre canónico del empleado buscado si hay un único candidato claro; None si no hay o es ambiguo"""
+        candidatos = self.buscar(nombre, limit=2, puntaje_minimo=0.8)
+        if not candidatos:
+            return None
+        if len(candidatos) > 1:
+            primero, segundo = candidatos[0]["puntaje"], candidatos[1]["puntaje"]
+            # Una coincidencia exacta gana; si no, el primero debe destacarse por un margen
+            if primero < 1.0 and primero - segundo < margen or segundo == 1.0:
+                return None
+        return candidatos[0]["empleado"]
+
+
+_indice_empleados: Optional[IndiceEmpleados] = None
+_indice_origen: Optional[IndiceLicencias] = None
+_indice_empleados_lock = threading.Lock()
+
+
+def indice_empleados_cargado() -> Optional[IndiceEmpleados]:
+    """Índice de empleados ya construido, sin construirlo ni actualizarlo (None si todavía no existe)"""
+    with _indice_empleados_lock:
+        return _indice_empleados
+
+
+async def obtener_indice_empleados() -> IndiceEmpleados:
+    """
+    Índice de empleados compartido. Se construye a partir del índice de licencias
+    (espejo local o recorrido paginado) y se reconstruye cuando este cambia.
+    """
+    global _indice_empleados, _indice_origen
+    indice_licencias = await obtener_indice()
+    with _indice_empleados_lock:
+        if _indice_empleados is not None and _indice_origen is indice_licencias:
+            return _indice_empleados
+    indice = IndiceEmpleados(indice_licencias.registros, indice_licencias)
+    with _indice_empleados_lock:
+        _indice_empleados, _indice_origen = indice, indice_licencias
+    return indice
+
+
+async def buscar_empleado(input_data: BuscarEmpleadoInput) -> BuscarEmpleadoOutput:
+    """
+    Herramienta que resuelve el nombre de un empleado escrito por el usuario ("Celestino Ayvar",
+    "ayvar", "Daniel Biola") al nombre exacto registrado en Rukovoditel ("AYVAR, Celestino").
+    Úsala antes de consultar licencias de una persona cuando no conoces su nombre exacto;
+    luego filtra con `filtro.campos` = {"912": <empleado>}.
+
+    Args:
+        input_data: Nombre buscado y cantidad máxima de candidatos
+
+    Returns:
+        Candidatos ordenados por puntaje, con su cantidad de licencias
+    """
+    if obtener_sincronizador() is None and not credenciales_configuradas():
+        return BuscarEmpleadoOutput(
+            resultado={"error": "Faltan credenciales de Rukovoditel"},
+            metadata={"success": False, "timestamp": datetime.datetime.now().isoformat(), "error": "Configuración incompleta"}
+        )
+
+    try:
+        indice = await obtener_indice_empleados()
+    except (httpx.HTTPError, RukovoditelJSONError, RuntimeError) as e:
+        return BuscarEmpleadoOutput(
+            resultado={"error": f"Error al construir el índice de empleados: {str(e)}"},
+            metadata={"success": False, "timestamp": datetime.datetime.now().isoformat(), "error": str(e)}
+        )
+
+    inicio = time.perf_counter()
+    candidatos = indice.buscar(input_data.nombre, input_data.limit)
+    tiempo_busqueda = (time.perf_counter() - inicio) * 1000
+
+    return BuscarEmpleadoOutput(
+        resultado={
+            "candidatos": [
+                {**candidato, "filtro": {"campos": {CAMPO_EMPLEADO: candidato["empleado"]}}}
+                for candidato in candidatos
+            ],
+        },
+        metadata={
+            "success": True,
+            "query_ms": round(tiempo_busqueda, 3),
+            "timestamp": datetime.datetime.now().isoformat(),
+            "record_count": len(candidatos),
+            "empleados_indexados": len(indice.licencias),
+        }
+    )
@@ -0,0 +1,280 @@
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, Any, List, Tuple
+import os
+import time
+import datetime
+import threading
+import httpx
+
+from mi_agente_ai.services.rukovoditel import credenciales_configuradas, RukovoditelJSONError
+from mi_agente_ai.services.sincronizacion import obtener_sincronizador, SincronizadorLicencias
+from mi_agente_ai.services.coalescencia import obtener_coalescedor
+from mi_agente_ai.tools.consulta_licencias_encargados import (
+    ConsultaLicenciasEncargadosInput, iterar_licencias, transformar_respuesta
+)
+from mi_agente_ai.utils.fechas import intervalo_licencia
+from mi_agente_ai.utils.texto import normalizar_texto
+
+# Segundos que el índice se considera vigente cuando no hay espejo local
+INDICE_TTL = float(os.getenv("RUKOVODITEL_INDICE_TTL", "300"))
+
+# Extremo abierto para licencias sin fecha de finalización ni reincorporación
+_SIN_FIN = datetime.date.max.toordinal()
+
+# Intervalo indexado: (inicio, fin, posición del registro), con fechas como ordinales
+Intervalo = Tuple[int, int, int]
+
+
+class ConsultaLicenciasPorFechaInput(BaseModel):
+    """Entrada para la herramienta de consulta de licencias por fecha"""
+    fecha: Optional[datetime.date] = Field(None, description="Fecha puntual (AAAA-MM-DD): devuelve quién estaba de licencia ese día")
+    desde: Optional[datetime.date] = Field(None, description="Inicio del rango (AAAA-MM-DD): licencias que se superponen con el rango")
+    hasta: Optional[datetime.date] = Field(None, description="Fin del rango (AAAA-MM-DD): licencias que se superponen con el rango")
+    empleado: Optional[str] = Field(None, description="Nombre (o parte del nombre) del empleado")
+    limit: int = Field(50, description="Límite de registros a devolver")
+
+
+class ConsultaLicenciasPorFechaOutput(BaseModel):
+    """Salida de la herramienta de consulta de licencias por fecha"""
+    resultado: Dict[str, Any] = Field(..., description="Licencias que cumplen la consulta")
+    metadata: Dict[str, Any] = Field(..., description="Metadatos de la consulta")
+
+
+class _NodoIntervalos:
+    """Nodo de un árbol de intervalos centrado"""
+    __slots__ = ("centro", "por_inicio", "por_fin", "izquierda", "derecha")
+
+    def __init__(self, intervalos: List[Intervalo]):
+        extremos = sorted([i[0] for i in intervalos] + [i[1] for i in intervalos])
+        self.centro = extremos[len(extremos) // 2]
+        izquierda = [i for i in intervalos if i[1] < self.centro]
+        derecha = [i for i in intervalos if i[0] > self.centro]
+        medio = [i for i in intervalos if i[0] <= self.centro <= i[1]]
+        # Los intervalos que contienen al centro se guardan ordenados por inicio y por fin
+        self.por_inicio = sorted(medio, key=lambda i: i[0])
+        self.por_fin = sorted(medio, key=lambda i: i[1], reverse=True)
+        self.izquierda = _NodoIntervalos(izquierda) if izquierda else None
+        self.derecha = _NodoIntervalos(derecha) if derecha else None
+
+
+def _superpuestos(raiz: Optional[_NodoIntervalos], desde: int, hasta: int) -> List[int]:
+    """Posiciones de los intervalos que se superponen con [desde, hasta], en O(log n + k)"""
+    posiciones = []
+    pendientes = [raiz] if raiz is not None else []
+    while pendientes:
+        nodo = pendientes.pop()
+        if hasta < nodo.centro:
+            # El rango está a la izquierda del centro: sirven los que empiezan antes de `hasta`
+            for inicio, _, posicion in nodo.por_inicio:
+                if inicio > hasta:
+                    break
+                posiciones.append(posicion)
+            if nodo.izquierda is not None:
+                pendientes.append(nodo.izquierda)
+        elif desde > nodo.centro:
+            # El rango está a la derecha del centro: sirven los que terminan después de `desde`
+            for _, fin, posicion in nodo.por_fin:
+                if fin < desde:
+                    break
+                posiciones.append(posicion)
+            if nodo.derecha is not None:
+                pendientes.append(nodo.derecha)
+        else:
+            # El rango contiene al centro: todos los intervalos del nodo se superponen
+            posiciones.extend(posicion for _, _, posicion in nodo.por_inicio)
+            if nodo.izquierda is not None:
+                pendientes.append(nodo.izquierda)
+            if nodo.derecha is not None:
+                pendientes.append(nodo.derecha)
+    return posiciones
+
+
+class IndiceLicencias:
+    """
+    Índice de intervalos sobre las licencias de encargados.
+    Las fechas de inicio, finalización y reincorporación se parsean una sola vez;
+    las consultas por fecha, por rango y por empleado devuelven solo los registros que coinciden.
+    """
+
+    def __init__(self, registros: List[Dict[str, Any]]):
+        self.registros = registros
+        self.construido = time.time()
+
+        intervalos: List[Intervalo] = []
+        self._intervalos: List[Optional[Tuple[int, int]]] = []
+        self._inicios: List[int] = []
+        self._empleados: Dict[str, List[int]] = {}
+        self._tokens: Dict[str, set] = {}
+
+        for posicion, registro in enumerate(registros):
+            intervalo = self._intervalo(registro)
+            self._intervalos.append(intervalo)
+            self._inicios.append(intervalo[0] if intervalo else _SIN_FIN)
+            if intervalo:
+                intervalos.append((intervalo[0], intervalo[1], posicion))
+
+            nombre = normalizar_texto(registro.get("Empleado") or "")
+            if nombre:
+                self._empleados.setdefault(nombre, []).append(posicion)
+                for token in nombre.replace(",", " ").split():
+                    self._tokens.setdefault(token, set()).add(nombre)
+
+        # Las licencias de cada empleado quedan ordenadas por fecha de inicio
+        for posiciones in self._empleados.values():
+            posiciones.sort(key=lambda p: self._inicios[p])
+
+        self._raiz = _NodoIntervalos(intervalos) if intervalos else None
+
+    @staticmethod
+    def _intervalo(registro: Dict[str, Any]) -> Optional[Tuple[int, int]]:
+        """Intervalo [inicio, fin] de una licencia, con las fechas como ordinales"""
+        intervalo = intervalo_licencia(
+            registro.get("Fecha de inicio"), registro.get("Fecha Finalización"), registro.get("Reincorporación")
+        )
+        if intervalo is None:
+            return None
+        return intervalo[0].toordinal(), intervalo[1].toordinal()
+
+    def _ordenar(self, posiciones: List[int]) -> List[int]:
+        return sorted(posiciones, key=lambda p: self._inicios[p])
+
+    def en_fecha(self, fecha: datetime.date) -> List[Dict[str, Any]]:
+        """Licencias vigentes en una fecha"""
+        return self.entre(fecha, fecha)
+
+    def entre(self, desde: datetime.date, hasta: datetime.date) -> List[Dict[str, Any]]:
+        """Licencias que se superponen con el rango [desde, hasta]"""
+        posiciones = _superpuestos(self._raiz, desde.toordinal(), hasta.toordinal())
+        return [self.registros[p] for p in self._ordenar(posiciones)]
+
+    def empleados(self, nombre: str) -> List[str]:
+        """Nombres normalizados de los empleados que contienen todas las palabras buscadas"""
+        normalizado = normalizar_texto(nombre)
+        if normalizado in self._empleados:
+            return [normalizado]
+        tokens = normalizado.replace(",", " ").split()
+        if not tokens:
+            return []
+        candidatos = None
+        for token in tokens:
+            coincidentes = self._tokens.get(token, set())
+            candidatos = coincidentes if candidatos is None else candidatos & coincidentes
+            if not candidatos:
+                return []
+        return sorted(candidatos)
+
+    def de_empleado(self, nombre: str, desde: Optional[datetime.date] = None,
+                    hasta: Optional[datetime.date] = None) -> List[Dict[str, Any]]:
+        """Licencias de un empleado, opcionalmente restringidas a un rango de fechas"""
+        posiciones = [p for empleado in self.empleados(nombre) for p in self._empleados[empleado]]
+        if desde is not None or hasta is not None:
+            desde_ordinal = (desde or datetime.date.min).toordinal()
+            hasta_ordinal = (hasta or datetime.date.max).toordinal()
+            posiciones = [p for p in posiciones if self._superpone(p, desde_ordinal, hasta_ordinal)]
+        return [self.registros[p] for p in self._ordenar(posiciones)]
+
+    def _superpone(self, posicion: int, desde: int, hasta: int) -> bool:
+        intervalo = self._intervalos[posicion]
+        return intervalo is not None and intervalo[0] <= hasta and intervalo[1] >= desde
+
+
+_indice: Optional[IndiceLicencias] = None
+_indice_version: Optional[int] = None
+_indice_lock = threading.Lock()
+
+
+async def _construir_indice(sincronizador: Optional[SincronizadorLicencias], version: Optional[int]) -> IndiceLicencias:
+    """Construye el índice desde el espejo local (si hay `version`) o recorriendo la entidad completa"""
+    global _indice, _indice_version
+    if version is not None:
+        crudos = sincronizador.almacen.registros(sincronizador.entity_id)
+        registros = transformar_respuesta({"status": "success", "data": crudos})["registros"]
+    else:
+        registros = [registro async for registro in iterar_licencias(ConsultaLicenciasEncargadosInput())]
+    indice = IndiceLicencias(registros)
+    with _indice_lock:
+        _indice, _indice_version = indice, version
+    return indice
+
+
+async def obtener_indice() -> IndiceLicencias:
+    """
+    Devuelve el índice de licencias compartido, reconstruyéndolo cuando cambian los datos.
+    Si hay espejo local vigente se construye desde SQLite y se invalida al cambiar su versión;
+    si no, se recorre la entidad completa página por página y se reconstruye cada `INDICE_TTL` segundos.
+    Las llamadas concurrentes mientras se construye esperan esa misma construcción.
+    """
+    sincronizador = obtener_sincronizador()
+    if sincronizador is not None and sincronizador.vigente():
+        version = sincronizador.almacen.estado(sincronizador.entity_id)["version"]
+        with _indice_lock:
+            if _indice is not None and _indice_version == version:
+                return _indice
+    else:
+        sincronizador, version = None, None
+        with _indice_lock:
+            if _indice is not None and _indice_version is None and time.time() - _indice.construido < INDICE_TTL:
+                return _indice
+
+    indice, _ = await obtener_coalescedor().aejecutar(
+        f"indice_licencias:{version}", lambda: _construir_indice(sincronizador, version)
+    )
+    return indice
+
+
+async def consulta_licencias_por_fecha(input_data: ConsultaLicenciasPorFechaInput) -> ConsultaLicenciasPorFechaOutput:
+    """
+    Herramienta que responde consultas temporales sobre licencias de encargados usando un índice local:
+    quién estaba de licencia en una fecha, qué licencias se superponen con un rango (por ejemplo un mes)
+    y qué licencias tuvo un empleado. Devuelve solo los registros que coinciden.
+
+    Args:
+        input_data: Fecha puntual, rango de fechas y/o empleado a consultar
+
+    Returns:
+        Licencias que cumplen la consulta
+    """
+    if input_data.fecha is None and input_data.desde is None and input_data.hasta is None and not input_data.empleado:
+        return ConsultaLicenciasPorFechaOutput(
+            resultado={"error": "Debe indicar una fecha, un rango de fechas o un empleado"},
+            metadata={"success": False, "timestamp": datetime.datetime.now().isoformat(), "error": "Consulta vacía"}
+        )
+
+    if obtener_sincronizador() is None and not credenciales_configuradas():
+        return ConsultaLicenciasPorFechaOutput(
+            resultado={"error": "Faltan credenciales de Rukovoditel"},
+            metadata={"success": False, "timestamp": datetime.datetime.now().isoformat(), "error": "Configuración incompleta"}
+        )
+
+    try:
+        indice = await obtener_indice()
+    except (httpx.HTTPError, RukovoditelJSONError, RuntimeError) as e:
+        return ConsultaLicenciasPorFechaOutput(
+            resultado={"error": f"Error al construir el índice de licencias: {str(e)}"},
+            metadata={"success": False, "timestamp": datetime.datetime.now().isoformat(), "error": str(e)}
+        )
+
+    # Resolver la consulta sobre el índice
+    inicio = time.perf_counter()
+    desde = input_data.fecha or input_data.desde
+    hasta = input_data.fecha or input_data.hasta
+    if input_data.empleado:
+        coincidencias = indice.de_empleado(input_data.empleado, desde, hasta)
+    else:
+        coincidencias = indice.entre(desde or datetime.date.min, hasta or datetime.date.max)
+    tiempo_consulta = (time.perf_counter() - inicio) * 1000
+
+    registros = coincidencias[:input_data.limit]
+    return ConsultaLicenciasPorFechaOutput(
+        resultado={"registros": registros},
+        metadata={
+            "success": True,
+            "origen": "indice",
+            "query_ms": round(tiempo_consulta, 3),
+            "timestamp": datetime.datetime.now().isoformat(),
+            "record_count": len(registros),
+            "total_coincidencias": len(coincidencias),
+            "index_size": len(indice.registros),
+            "index_built_at": datetime.datetime.fromtimestamp(indice.construido).isoformat(),
+        }
+    )
@@ -0,0 +1,165 @@
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, Any, List, Tuple, Callable, Set
+import os
+import datetime
+
+from mi_agente_ai.utils.fechas import intervalo_licencia, parsear_fecha
+from mi_agente_ai.utils.texto import normalizar_texto
+
+# IDs de los campos de licencias de encargados
+CAMPO_EMPLEADO = "912"
+CAMPO_INICIO = "651"
+CAMPO_FIN = "665"
+CAMPO_REINCORPORACION = "653"
+CAMPOS_FECHA = {CAMPO_INICIO, CAMPO_FIN, CAMPO_REINCORPORACION}
+
+# Campos que el servidor sabe filtrar (texto por coincidencia parcial, fechas por rango "desde,hasta").
+# Lo que no se pueda delegar al servidor se filtra localmente después de recibir los registros.
+CAMPOS_PUSHDOWN = {c.strip() for c in os.getenv("RUKOVODITEL_CAMPOS_PUSHDOWN", "912,651").split(",") if c.strip()}
+
+Condicion = Tuple[str, Callable[[Dict[str, Any]], bool]]
+
+
+class FiltrosLicencias(BaseModel):
+    """Filtros tipados para la consulta de licencias de encargados"""
+    empleado: Optional[str] = Field(None, description="Nombre o parte del nombre del empleado (sin importar mayúsculas ni tildes)")
+    desde: Optional[datetime.date] = Field(None, description="Licencias que siguen vigentes en o después de esta fecha (AAAA-MM-DD)")
+    hasta: Optional[datetime.date] = Field(None, description="Licencias que comienzan en o antes de esta fecha (AAAA-MM-DD)")
+    campos: Dict[str, str] = Field(default_factory=dict, description="Igualdad exacta por ID de campo, por ejemplo {\"912\": \"VIOLA, Daniel\"}")
+
+
+def _tokens(texto: Any) -> List[str]:
+    return normalizar_texto(texto or "").replace(",", " ").split()
+
+
+class PlanConsulta:
+    """
+    Plan de ejecución de una consulta: qué filtros se envían a Rukovoditel
+    y qué condiciones se evalúan localmente sobre los registros recibidos.
+    """
+
+    def __init__(self, reports_id: Optional[int]):
+        self.reports_id = reports_id
+        self.filtros_remotos: Dict[str, Any] = {}
+        # Campos que deben pedirse al servidor para poder evaluar las condiciones locales
+        self.campos_requeridos: Set[str] = set()
+        # Condiciones que el servidor ya aplica (se reevalúan solo al consultar el espejo local)
+        self.condiciones_remotas: List[Condicion] = []
+        # Condiciones que el servidor no puede aplicar y se evalúan al recibir los registros
+        self.condiciones_locales: List[Condicion] = []
+
+    @property
+    def requiere_post_filtro(self) -> bool:
+        return bool(self.condiciones_locales)
+
+    def coincide_local(self, registro: Dict[str, Any]) -> bool:
+        """Evalúa las condiciones que no se delegaron al servidor sobre un registro crudo"""
+        return all(condicion(registro) for _, condicion in self.condiciones_locales)
+
+    def coincide(self, registro: Dict[str, Any]) -> bool:
+        """Evalúa todas las condiciones sobre un registro crudo (para el espejo local)"""
+        return all(condicion(registro) for _, condicion in self.condiciones_remotas + self.condiciones_locales)
+
+    def explicar(self) -> Dict[str, Any]:
+        """Descripción del plan para incluir en los metadatos"""
+        return {
+            "reports_id": self.reports_id,
+            "pushdown": self.filtros_remotos,
+            "post_filtro": [descripcion for descripcion, _ in self.condiciones_locales],
+        }
+
+
+def _igualdad(campo: str, valor: Any) -> Callable[[Dict[str, Any]], bool]:
+    esperado = normalizar_texto(valor)
+    return lambda registro: normalizar_texto(registro.get(campo, "")) == esperado
+
+
+def _como_servidor(campo: str, valor: Any) -> Callable[[Dict[str, Any]], bool]:
+    """
+    Condición equivalente a un filtro crudo tal como lo aplica Rukovoditel: "desde,hasta" en un campo
+    de fecha es un rango inclusivo (cualquiera de los extremos puede faltar) y el resto es una
+    coincidencia parcial sin distinguir mayúsculas ni tildes
+    """
+    texto = str(valor)
+    if campo in CAMPOS_FECHA and "," in texto:
+        desde_texto, _, hasta_texto = texto.partition(",")
+        desde = parsear_fecha(desde_texto.strip()) if desde_texto.strip() else None
+        hasta = parsear_fecha(hasta_texto.strip()) if hasta_texto.strip() else None
+
+        def en_rango(registro: Dict[str, Any]) -> bool:
+            fecha = parsear_fecha(registro.get(campo))
+            return fecha is not None and (desde is None or fecha >= desde) and (hasta is None or fecha <= hasta)
+        return en_rango
+    esperado = normalizar_texto(texto)
+    return lambda registro: esperado in normalizar_texto(registro.get(campo, ""))
+
+
+def _contiene_tokens(campo: str, tokens: List[str]) -> Callable[[Dict[str, Any]], bool]:
+    return lambda registro: all(token in _tokens(registro.get(campo)) for token in tokens)
+
+
+def _superpone(desde: datetime.date, hasta: datetime.date) -> Callable[[Dict[str, Any]], bool]:
+    def condicion(registro: Dict[str, Any]) -> bool:
+        intervalo = intervalo_licencia(
+            registro.get(CAMPO_INICIO), registro.get(CAMPO_FIN), registro.get(CAMPO_REINCORPORACION)
+        )
+        return intervalo is not None and intervalo[0] <= hasta and intervalo[1] >= desde
+    return condicion
+
+
+def planificar(filters: Optional[Dict[str, Any]], filtro: Optional[FiltrosLicencias],
+               reports_id: Optional[int]) -> PlanConsulta:
+    """
+    Decide qué parte de la consulta se delega a los `filters` de Rukovoditel y qué parte
+    se filtra localmente.
+
+    Args:
+        filters: Filtros crudos de la API (se envían tal cual)
+        filtro: Filtros tipados
+        reports_id: Reporte de Rukovoditel usado en la consulta
+
+    Returns:
+        El plan de la consulta
+    """
+    plan = PlanConsulta(reports_id)
+
+    # Los filtros crudos siempre se delegan al servidor; para el espejo local se evalúan con la misma
+    # semántica que aplica Rukovoditel (rango de fechas o coincidencia parcial)
+    for campo, valor in (filters or {}).items():
+        plan.filtros_remotos[str(campo)] = valor
+        if not isinstance(valor, (dict, list)):
+            plan.condiciones_remotas.append((f"{campo} ~ {valor}", _como_servidor(str(campo), valor)))
+
+    if filtro is None:
+        return plan
+
+    # Igualdades exactas por campo: el servidor las aplica como coincidencia parcial, así que
+    # acota los registros pero la igualdad se verifica siempre localmente
+    for campo, valor in filtro.campos.items():
+        plan.filtros_remotos[campo] = valor
+        plan.campos_requeridos.add(campo)
+        plan.condiciones_locales.append((f"{campo} = {valor}", _igualdad(campo, valor)))
+
+    # Empleado: se delega la palabra más larga y se verifica el nombre completo localmente
+    tokens = _tokens(filtro.empleado)
+    if tokens:
+        if CAMPO_EMPLEADO in CAMPOS_PUSHDOWN and CAMPO_EMPLEADO not in plan.filtros_remotos:
+            plan.filtros_remotos[CAMPO_EMPLEADO] = max(tokens, key=len)
+        plan.campos_requeridos.add(CAMPO_EMPLEADO)
+        plan.condiciones_locales.append(
+            (f"{CAMPO_EMPLEADO} contiene '{' '.join(tokens)}'", _contiene_tokens(CAMPO_EMPLEADO, tokens))
+        )
+
+    # Rango de fechas: el servidor puede acotar por fecha de inicio (<= hasta), pero la superposición
+    # completa depende de la finalización y la reincorporación, así que se verifica localmente
+    if filtro.desde is not None or filtro.hasta is not None:
+        desde = filtro.desde or datetime.date.min
+        hasta = filtro.hasta or datetime.date.max
+        if filtro.hasta is not None and CAMPO_INICIO in CAMPOS_PUSHDOWN and CAMPO_INICIO not in plan.filtros_remotos:
+            plan.filtros_remotos[CAMPO_INICIO] = f",{filtro.hasta.isoformat()}"
+        plan.campos_requeridos.update({CAMPO_INICIO, CAMPO_FIN, CAMPO_REINCORPORACION})
+        plan.condiciones_locales.append(
+            (f"licencia superpuesta con [{desde.isoformat()}, {hasta.isoformat()}]", _superpone(desde, hasta))
+        )
+
+    return plan
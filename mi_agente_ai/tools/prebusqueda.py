@@ -0,0 +1,275 @@
+import os
+import re
+import json
+import time
+import asyncio
+import datetime
+import threading
+import contextlib
+import contextvars
+from typing import Optional, Dict, Any, List, Tuple, Type, Callable, Awaitable, Iterator
+
+from pydantic import BaseModel
+
+from mi_agente_ai.services.cache import clave_consulta
+from mi_agente_ai.tools.planificador import FiltrosLicencias
+from mi_agente_ai.utils.fechas import rango_mes, MESES
+from mi_agente_ai.utils.texto import normalizar_texto
+
+# Iniciar consultas especulativas mientras el modelo planifica (0 = desactivado)
+PREBUSQUEDA_ACTIVA = os.getenv("AGENTE_PREBUSQUEDA", "1") != "0"
+# Consultas especulativas como máximo por pregunta
+PREBUSQUEDA_MAX = int(os.getenv("AGENTE_PREBUSQUEDA_MAX", "2"))
+# Límite de registros de cada consulta especulativa; sirve a las llamadas con un límite igual o menor
+PREBUSQUEDA_LIMITE = int(os.getenv("AGENTE_PREBUSQUEDA_LIMITE", "100"))
+
+# Palabras con mayúscula que no son nombres de empleados
+PALABRAS_COMUNES = {
+    "licencia", "licencias", "permiso", "permisos", "encargado", "encargada", "encargados", "consorcio", "consorcios",
+    "quien", "quienes", "que", "cual", "cuales", "cuando", "cuantas", "cuantos", "como", "donde",
+    "el", "la", "los", "las", "de", "del", "en", "y", "a", "se", "su", "sus", "por", "para", "con",
+    "dame", "mostrame", "muestrame", "listame", "necesito", "quiero", "busca", "buscar", "ver", "hola", "gracias",
+    "tuvo", "tiene", "tienen", "tomo", "pidio", "estuvo", "estuvieron", "reincorporo", "volvio", "regreso",
+    "carlos", "zapier", "administracion", "anastopulos", "fecha", "fechas", "mes", "anio", "ano", "dia",
+    "este", "esta", "ese", "esa", "todas", "todos", "ultima", "ultimas", "ultimo", "ultimos",
+    *MESES,
+}
+# Palabras tras las que suele venir el nombre del empleado en una pregunta en minúsculas
+_ANTES_DEL_NOMBRE = re.compile(
+    r"\b(?:licencias? (?:de|del|que tuvo|tuvo|tiene|pidio|tomo)|reincorporo|volvio|regreso) (?:el |la )?(?:encargad[oa] )?"
+)
+_PALABRA_CON_MAYUSCULA = re.compile(r"[A-ZÁÉÍÓÚÑ][A-Za-zÁÉÍÓÚÑáéíóúñü]+")
+_MES_ANIO = re.compile(r"\b(" + "|".join(MESES) + r")(?: de| del)? (\d{4})\b")
+_ANIO = re.compile(r"\b(?:en|del?|durante) (?:el )?(?:ano |anio )?(\d{4})\b")
+
+_prebusqueda_actual: contextvars.ContextVar[Optional["Prebusqueda"]] = contextvars.ContextVar("prebusqueda", default=None)
+
+
+def _tokens(texto: str) -> List[str]:
+    return normalizar_texto(texto or "").replace(",", " ").split()
+
+
+def clave_prebusqueda(input_data: BaseModel) -> str:
+    """
+    Clave de una consulta de licencias sin su `limit` y con el empleado como conjunto de palabras
+    normalizadas, que es como lo compara el planificador ("Celestino Ayvar" = "AYVAR, Celestino")
+    """
+    datos = json.loads(clave_consulta(input_data))
+    datos.pop("limit", None)
+    filtro = datos.get("filtro") or {}
+    if filtro.get("empleado"):
+        filtro["empleado"] = " ".join(sorted(set(_tokens(filtro["empleado"]))))
+    return json.dumps(datos, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+
+
+def _nombres(prompt: str) -> List[str]:
+    """Posibles nombres de empleados: palabras seguidas con mayúscula, o lo que sigue a "licencias de" y similares"""
+    nombres = []
+    actual: List[str] = []
+    for palabra in re.split(r"[\s,;:¿?¡!.]+", prompt):
+        if _PALABRA_CON_MAYUSCULA.fullmatch(palabra) and normalizar_texto(palabra) not in PALABRAS_COMUNES:
+            actual.append(palabra)
+            continue
+        if actual:
+            nombres.append(" ".join(actual))
+            actual = []
+    if actual:
+        nombres.append(" ".join(actual))
+
+    normalizado = " ".join(re.sub(r"[¿?¡!.,;:\"']+", " ", normalizar_texto(prompt)).split())
+    for coincidencia in _ANTES_DEL_NOMBRE.finditer(normalizado):
+        palabras = []
+        for palabra in normalizado[coincidencia.end():].split()[:3]:
+            if not palabra.isalpha() or palabra in PALABRAS_COMUNES:
+                break
+            palabras.append(palabra)
+        if palabras:
+            nombres.append(" ".join(palabras))
+
+    # Sin repetir nombres con las mismas palabras
+    vistos, unicos = set(), []
+    for nombre in nombres:
+        clave = frozenset(_tokens(nombre))
+        if clave and clave not in vistos:
+            vistos.add(clave)
+            unicos.append(nombre)
+    return unicos
+
+
+def _rango(prompt: str) -> Tuple[Optional[datetime.date], Optional[datetime.date]]:
+    """Mes y año ("noviembre de 2023") o año solo ("en 2023") mencionados en la pregunta"""
+    normalizado = normalizar_texto(prompt)
+    coincidencia = _MES_ANIO.search(normalizado)
+    if coincidencia:
+        return rango_mes(int(coincidencia.group(2)), MESES[coincidencia.group(1)])
+    coincidencia = _ANIO.search(normalizado)
+    if coincidencia:
+        anio = int(coincidencia.group(1))
+        return datetime.date(anio, 1, 1), datetime.date(anio, 12, 31)
+    return None, None
+
+
+def predecir_filtros(prompt: str, indice=None, maximo: int = PREBUSQUEDA_MAX) -> List[FiltrosLicencias]:
+    """
+    Filtros que el modelo probablemente use para responder la pregunta, del más al menos probable.
+    Con el índice de empleados (`IndiceEmpleados`, si ya está construido) se descartan los nombres que
+    no coinciden con ningún empleado y se agrega el nombre canónico cuando se escribe distinto.
+    """
+    desde, hasta = _rango(prompt)
+    empleados: List[str] = []
+    for nombre in _nombres(prompt):
+        if indice is not None:
+            if not indice.buscar(nombre, limit=1):
+                continue
+            canonico = indice.resolver(nombre)
+            empleados.append(nombre)
+            if canonico is not None and set(_tokens(canonico)) != set(_tokens(nombre)):
+                empleados.append(canonico)
+        else:
+            empleados.append(nombre)
+
+    filtros = [FiltrosLicencias(empleado=empleado, desde=desde, hasta=hasta) for empleado in empleados]
+    if not filtros and desde is not None:
+        filtros.append(FiltrosLicencias(desde=desde, hasta=hasta))
+    return filtros[:maximo]
+
+
+class EstadisticasPrebusqueda:
+    """Consultas especulativas lanzadas, aprovechadas y canceladas, y el tiempo ahorrado, en todo el proceso"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.lanzadas = 0
+        self.aciertos = 0
+        self.canceladas = 0
+        self.ahorro_ms = 0.0
+
+    def registrar(self, lanzadas: int, aciertos: int, canceladas: int, ahorro_ms: float):
+        with self._lock:
+            self.lanzadas += lanzadas
+            self.aciertos += aciertos
+            self.canceladas += canceladas
+            self.ahorro_ms += ahorro_ms
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "activa": PREBUSQUEDA_ACTIVA,
+                "lanzadas": self.lanzadas,
+                "aciertos": self.aciertos,
+                "canceladas": self.canceladas,
+                "tasa_aciertos": round(self.aciertos / self.lanzadas, 3) if self.lanzadas else None,
+                "ahorro_ms": round(self.ahorro_ms),
+            }
+
+
+estadisticas_prebusqueda = EstadisticasPrebusqueda()
+
+
+class _Prebuscada:
+    __slots__ = ("tarea", "limite", "inicio", "fin", "usada")
+
+    def __init__(self, tarea: asyncio.Task, limite: int):
+        self.tarea = tarea
+        self.limite = limite
+        self.inicio = time.perf_counter()
+        self.fin: Optional[float] = None
+        self.usada = False
+        tarea.add_done_callback(self._terminada)
+
+    def _terminada(self, _):
+        self.fin = time.perf_counter()
+
+
+class Prebusqueda:
+    """
+    Consultas de licencias iniciadas especulativamente durante una ejecución del agente.
+    Cuando el modelo llama a la herramienta con una consulta equivalente (misma clave de prebúsqueda
+    y un `limit` que no supera el de la consulta especulativa), se le entrega ese resultado.
+    """
+
+    def __init__(self):
+        self._prebuscadas: Dict[str, _Prebuscada] = {}
+        self.aciertos = 0
+        self.ahorro_ms = 0.0
+
+    def lanzar(self, consultas: List[BaseModel], funcion: Callable[[BaseModel], Awaitable[Any]]):
+        for consulta in consultas:
+            clave = clave_prebusqueda(consulta)
+            if clave not in self._prebuscadas:
+                self._prebuscadas[clave] = _Prebuscada(asyncio.ensure_future(funcion(consulta)), consulta.limit)
+
+    @property
+    def lanzadas(self) -> int:
+        return len(self._prebuscadas)
+
+    async def servir(self, input_data: BaseModel) -> Optional[Tuple[Any, float]]:
+        """
+        Resultado especulativo para la consulta, esperándolo si todavía está en curso
+
+        Returns:
+            Tupla (salida de la herramienta, ms de la consulta que ya se habían hecho al llegar la llamada),
+            o None si no hay una consulta especulativa equivalente o falló
+        """
+        prebuscada = self._prebuscadas.get(clave_prebusqueda(input_data))
+        if prebuscada is None or input_data.limit > prebuscada.limite:
+            return None
+        llegada = time.perf_counter()
+        prebuscada.usada = True
+        try:
+            salida = await asyncio.shield(prebuscada.tarea)
+        except asyncio.CancelledError:
+            if prebuscada.tarea.cancelled():
+                return None
+            raise
+        except Exception:
+            return None
+        if not salida.metadata.get("success"):
+            return None
+        ahorro_ms = (min(prebuscada.fin or llegada, llegada) - prebuscada.inicio) * 1000
+        self.aciertos += 1
+        self.ahorro_ms += ahorro_ms
+        return salida, ahorro_ms
+
+    def cancelar_restantes(self) -> int:
+        """Cancela las consultas especulativas que nadie usó; devuelve cuántas seguían en curso"""
+        canceladas = 0
+        for prebuscada in self._prebuscadas.values():
+            if not prebuscada.usada and not prebuscada.tarea.done():
+                prebuscada.tarea.cancel()
+                canceladas += 1
+        return canceladas
+
+
+def prebusqueda_actual() -> Optional[Prebusqueda]:
+    return _prebusqueda_actual.get()
+
+
+@contextlib.contextmanager
+def prebuscar(prompt: str, herramienta: Callable[[BaseModel], Awaitable[Any]],
+              tipo_entrada: Type[BaseModel], indice_empleados=None) -> Iterator[Optional[Prebusqueda]]:
+    """
+    Lanza en segundo plano las consultas que probablemente necesite la pregunta y las deja disponibles
+    para la herramienta mientras dura el bloque. Al salir se cancelan las que no se usaron y se
+    registran los aciertos y el tiempo ahorrado. Debe usarse dentro de un event loop en ejecución.
+
+    Args:
+        prompt: La consulta del usuario
+        herramienta: La herramienta de licencias (se recibe como parámetro porque ella misma usa este módulo)
+        tipo_entrada: Su modelo de entrada, con los campos `filtro` y `limit`
+        indice_empleados: Índice de empleados ya construido, para validar y completar los nombres
+    """
+    filtros = predecir_filtros(prompt, indice_empleados) if PREBUSQUEDA_ACTIVA else []
+    if not filtros:
+        yield None
+        return
+    prebusqueda = Prebusqueda()
+    # Las tareas se crean antes de publicar la prebúsqueda en el contexto, así no se sirven a sí mismas
+    prebusqueda.lanzar([tipo_entrada(filtro=filtro, limit=PREBUSQUEDA_LIMITE) for filtro in filtros], herramienta)
+    token = _prebusqueda_actual.set(prebusqueda)
+    try:
+        yield prebusqueda
+    finally:
+        _prebusqueda_actual.reset(token)
+        canceladas = prebusqueda.cancelar_restantes()
+        estadisticas_prebusqueda.registrar(prebusqueda.lanzadas, prebusqueda.aciertos, canceladas, prebusqueda.ahorro_ms)
@@ -0,0 +1,41 @@
+from pydantic import BaseModel, Field
+from typing import Dict, Any
+import datetime
+
+from mi_agente_ai.utils.serializacion import almacen_resultados
+
+class VerPaginaResultadoInput(BaseModel):
+    """Entrada para la herramienta de paginación de resultados grandes"""
+    handle: str = Field(..., description="Identificador del resultado resumido, devuelto en el campo `handle`")
+    pagina: int = Field(2, description="Número de página a obtener (la primera página ya se incluyó en el resumen)")
+
+class VerPaginaResultadoOutput(BaseModel):
+    """Salida de la herramienta de paginación de resultados grandes"""
+    resultado: Dict[str, Any] = Field(..., description="Filas de la página en formato de tabla")
+    metadata: Dict[str, Any] = Field(..., description="Metadatos de la consulta")
+
+async def ver_pagina_resultado(input_data: VerPaginaResultadoInput) -> VerPaginaResultadoOutput:
+    """
+    Herramienta que devuelve una página de un resultado que fue resumido por ser demasiado grande.
+    Usa el `handle` que vino en el resumen y pide las páginas de a una, solo si las necesitas.
+    
+    Args:
+        input_data: Handle del resultado y número de página
+        
+    Returns:
+        Filas de la página pedida en formato de tabla (columnas una vez, filas como arreglos)
+    """
+    pagina = almacen_resultados.pagina(input_data.handle, input_data.pagina)
+    if pagina is None:
+        return VerPaginaResultadoOutput(
+            resultado={"error": "El resultado ya no está disponible; vuelve a realizar la consulta"},
+            metadata={"success": False, "timestamp": datetime.datetime.now().isoformat(), "error": "Handle inexistente o vencido"}
+        )
+    return VerPaginaResultadoOutput(
+        resultado=pagina,
+        metadata={
+            "success": True,
+            "timestamp": datetime.datetime.now().isoformat(),
+            "record_count": len(pagina["filas"])
+        }
+    )
@@ -3,10 +3,8 @@ import sys
 import os
 import traceback
 import json
+import uuid
 import pandas as pd
-import threading
-import time
-from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 
 # Agregar el directorio raíz del proyecto al path para importaciones
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
@@ -14,6 +12,8 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '.
 # Ahora importamos usando rutas relativas
 from mi_agente_ai.agents.base_agent import Agent
 from mi_agente_ai.utils.config import load_env_vars
+from mi_agente_ai.utils.serializacion import expandir_tabla
+from mi_agente_ai.utils.trazas import trazador, estadisticas_trazas
 
 # Configuración de la página
 st.set_page_config(
@@ -56,7 +56,7 @@ def get_agent():
         return None
 
 # Función para generar respuesta con timeout
-def generate_response(prompt, timeout_seconds=65):  # 65 segundos (ligeramente mayor que el timeout del agente)
+def generate_response(prompt, timeout_seconds=60):
     agent = get_agent()
     if agent is None:
         # Crear un objeto con la misma estructura que devuelve el agente
@@ -68,19 +68,30 @@ def generate_response(prompt, timeout_seconds=65):  # 65 segundos (ligeramente m
         # Convertir a un objeto similar al que devuelve el agente
         return type('AgentResponse', (), error_obj)
     
-    # Utilizando ThreadPoolExecutor para implementar el timeout
-    with ThreadPoolExecutor() as executor:
-        future = executor.submit(agent.run, prompt)
-        try:
-            return future.result(timeout=timeout_seconds)
-        except FutureTimeoutError:
-            # Crear un objeto de respuesta para el timeout
-            timeout_obj = {
-                "response": "Lo siento, la consulta ha tomado demasiado tiempo en procesarse. Por favor, intenta con una pregunta más específica sobre licencias de encargados o consorcios administrados.", 
-                "tool_used": False, 
-                "tool_result": None
-            }
-            return type('AgentResponse', (), timeout_obj)
+    # El agente corre en el event loop compartido del proceso; si se agota el timeout
+    # cancela las llamadas en curso y devuelve un mensaje de tiempo agotado
+    return agent.run(prompt, timeout=timeout_seconds, sesion=st.session_state.sesion_id)
+
+# Función para generar respuesta en streaming: muestra el texto a medida que llega.
+# Si el streaming falla se lanza el error para mostrarlo, sin volver a ejecutar la consulta.
+def stream_response(prompt, placeholder, estado, timeout_seconds=60):
+    agent = get_agent()
+    if agent is None:
+        return generate_response(prompt, timeout_seconds)
+    
+    texto = ""
+    for evento in agent.stream(prompt, timeout=timeout_seconds, sesion=st.session_state.sesion_id):
+        if evento.tipo == "texto":
+            texto += evento.texto
+            placeholder.markdown(texto + "▌")
+        elif evento.tipo == "herramienta_llamada":
+            estado.caption(f"Consultando {evento.herramienta}...")
+        elif evento.tipo == "herramienta_resultado":
+            estado.caption(f"Datos recibidos de {evento.herramienta}")
+        elif evento.tipo == "final":
+            estado.empty()
+            return evento.datos
+    raise RuntimeError("la respuesta se interrumpió antes de terminar")
 
 # Título
 st.title("🤖 Mi Agente AI")
@@ -104,6 +115,10 @@ with st.expander("ℹ️ ¿Qué puedo consultar?"):
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
+# Identificador de la conversación, para que el agente recuerde las preguntas anteriores
+if "sesion_id" not in st.session_state:
+    st.session_state.sesion_id = uuid.uuid4().hex
+
 # Mostrar mensajes del chat
 for message in st.session_state.messages:
     with st.chat_message(message["role"]):
@@ -120,18 +135,24 @@ if prompt := st.chat_input("Pregúntame sobre licencias de encargados..."):
     
     # Mostrar mensaje del asistente
     with st.chat_message("assistant"):
+        estado_placeholder = st.empty()
         message_placeholder = st.empty()
         
         with st.spinner("Pensando..."):
             try:
-                # Obtener respuesta (ya tiene manejo de timeout incorporado)
-                result = generate_response(prompt)
+                # Obtener respuesta en streaming (ya tiene manejo de timeout incorporado)
+                with trazador.span("ui.respuesta"):
+                    result = stream_response(prompt, message_placeholder, estado_placeholder)
                 response = result.response
                 
+                # El armado de tablas y detalles se mide aparte de la espera de la respuesta
+                render = trazador.iniciar("ui.render", tool_used=bool(result.tool_used))
+                
                 # Procesar el resultado de la herramienta
                 if result.tool_used and result.tool_result:
                     try:
-                        tool_result = json.loads(result.tool_result)
+                        # Las herramientas devuelven tablas compactas; se expanden a registros para mostrarlas
+                        tool_result = expandir_tabla(json.loads(result.tool_result))
                         
                         # Si es un resultado de la herramienta de consulta de licencias
                         if "registros" in tool_result:
@@ -222,6 +243,7 @@ if prompt := st.chat_input("Pregúntame sobre licencias de encargados..."):
                         st.code(result.tool_result)
                 
                 message_placeholder.markdown(response)
+                trazador.terminar(render)
                 
                 # Agregar mensaje del asistente al historial
                 full_content = response
@@ -231,6 +253,7 @@ if prompt := st.chat_input("Pregúntame sobre licencias de encargados..."):
                 st.session_state.messages.append({"role": "assistant", "content": full_content})
             except Exception as e:
                 error_message = f"Error al procesar la consulta: {str(e)}"
+                estado_placeholder.empty()
                 st.error(error_message)
                 st.code(traceback.format_exc())
                 message_placeholder.markdown(error_message)
@@ -239,8 +262,23 @@ if prompt := st.chat_input("Pregúntame sobre licencias de encargados..."):
 # Botón para borrar el historial
 if st.sidebar.button("Borrar conversación"):
     st.session_state.messages = []
+    agente = get_agent()
+    if agente is not None:
+        agente.olvidar(st.session_state.sesion_id)
+    st.session_state.sesion_id = uuid.uuid4().hex
     st.rerun()
 
+# Latencias por etapa (agente, LLM, herramientas, Rukovoditel, interfaz)
+with st.sidebar.expander("Latencias"):
+    estadisticas = estadisticas_trazas()
+    if estadisticas:
+        st.dataframe(pd.DataFrame([
+            {"etapa": nombre, **{k: v for k, v in datos.items() if k != "buckets_ms"}}
+            for nombre, datos in estadisticas.items()
+        ]))
+    else:
+        st.caption("Todavía no hay consultas registradas.")
+
 # Información en el sidebar
 st.sidebar.markdown("## Acerca del Agente")
 st.sidebar.markdown("**Carlos Zapier** es un asistente virtual de Administración Anastópulos.")
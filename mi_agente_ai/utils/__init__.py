@@ -1,4 +1,12 @@
 # Archivo de inicialización para el paquete utils
 from .config import load_env_vars
+from .fechas import parsear_fecha, intervalo_licencia, rango_mes, MESES
+from .texto import normalizar_texto, quitar_acentos
+from .loop import loop_compartido, ejecutar_en_loop
+from .serializacion import compactar_registros, expandir_tabla, ajustar_a_presupuesto, salida_compacta
+from .trazas import trazador, span, trazado, estadisticas_trazas
 
-__all__ = ["load_env_vars"] 
\ No newline at end of file
+__all__ = ["load_env_vars", "parsear_fecha", "intervalo_licencia", "rango_mes", "MESES", "normalizar_texto", "quitar_acentos",
+           "loop_compartido", "ejecutar_en_loop",
+           "compactar_registros", "expandir_tabla", "ajustar_a_presupuesto", "salida_compacta",
+           "trazador", "span", "trazado", "estadisticas_trazas"]
\ No newline at end of file
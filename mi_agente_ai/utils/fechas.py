@@ -0,0 +1,70 @@
+import datetime
+from typing import Optional, Any, Tuple
+
+# Formatos de fecha que devuelve Rukovoditel según la configuración del campo
+FORMATOS_FECHA = ["%d/%m/%Y", "%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y %H:%M", "%Y-%m-%d %H:%M:%S", "%d.%m.%Y"]
+
+# Nombres de los meses en español (sin tildes) y su número
+MESES = {
+    "enero": 1, "febrero": 2, "marzo": 3, "abril": 4, "mayo": 5, "junio": 6, "julio": 7,
+    "agosto": 8, "septiembre": 9, "setiembre": 9, "octubre": 10, "noviembre": 11, "diciembre": 12,
+}
+
+
+def parsear_fecha(valor: Any) -> Optional[datetime.date]:
+    """
+    Convierte el valor de un campo de fecha de Rukovoditel en un `date`.
+    Acepta timestamps UNIX (como número o texto) y los formatos de `FORMATOS_FECHA`.
+
+    Returns:
+        La fecha, o None si el valor está vacío o no se reconoce
+    """
+    if valor is None or isinstance(valor, bool):
+        return None
+    if isinstance(valor, datetime.datetime):
+        return valor.date()
+    if isinstance(valor, datetime.date):
+        return valor
+    if isinstance(valor, (int, float)):
+        return datetime.date.fromtimestamp(valor) if valor > 0 else None
+
+    texto = str(valor).strip()
+    if not texto or texto == "0":
+        return None
+    if texto.isdigit():
+        return datetime.date.fromtimestamp(int(texto))
+    for formato in FORMATOS_FECHA:
+        try:
+            return datetime.datetime.strptime(texto, formato).date()
+        except ValueError:
+            continue
+    return None
+
+
+def intervalo_licencia(inicio: Any, fin: Any, reincorporacion: Any) -> Optional[Tuple[datetime.date, datetime.date]]:
+    """
+    Intervalo [inicio, fin] de una licencia a partir de sus tres campos de fecha.
+    Si no hay fecha de finalización se usa el día anterior a la reincorporación,
+    y si tampoco hay reincorporación la licencia queda abierta (`date.max`).
+
+    Returns:
+        Tupla (inicio, fin), o None si la licencia no tiene fecha de inicio
+    """
+    fecha_inicio = parsear_fecha(inicio)
+    if fecha_inicio is None:
+        return None
+    fecha_fin = parsear_fecha(fin)
+    if fecha_fin is None:
+        fecha_reincorporacion = parsear_fecha(reincorporacion)
+        if fecha_reincorporacion is not None:
+            fecha_fin = fecha_reincorporacion - datetime.timedelta(days=1)
+    if fecha_fin is None:
+        fecha_fin = datetime.date.max
+    return fecha_inicio, max(fecha_inicio, fecha_fin)
+
+
+def rango_mes(anio: int, mes: int) -> Tuple[datetime.date, datetime.date]:
+    """Primer y último día de un mes"""
+    primero = datetime.date(anio, mes, 1)
+    siguiente = datetime.date(anio + mes // 12, mes % 12 + 1, 1)
+    return primero, siguiente - datetime.timedelta(days=1)
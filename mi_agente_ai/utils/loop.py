@@ -0,0 +1,78 @@
+import os
+import asyncio
+import threading
+import concurrent.futures
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Any, Coroutine
+
+# Hilos del executor compartido (para código bloqueante llamado desde el loop)
+EXECUTOR_MAX_WORKERS = int(os.getenv("AGENTE_EXECUTOR_MAX_WORKERS", "8"))
+
+
+class LoopCompartido:
+    """
+    Event loop de larga duración que corre en un hilo propio y es compartido por todo el proceso.
+    El código síncrono (Streamlit, CLI) le envía corrutinas en lugar de crear un loop y un
+    ThreadPoolExecutor nuevos por cada consulta, y los clientes HTTP asíncronos conservan sus
+    conexiones entre consultas.
+    """
+
+    def __init__(self, max_workers: int = EXECUTOR_MAX_WORKERS):
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._hilo: Optional[threading.Thread] = None
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """El event loop compartido, iniciado la primera vez que se usa"""
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    loop.set_default_executor(
+                        ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="agente-executor")
+                    )
+                    listo = threading.Event()
+
+                    def correr():
+                        asyncio.set_event_loop(loop)
+                        loop.call_soon(listo.set)
+                        loop.run_forever()
+
+                    self._hilo = threading.Thread(target=correr, name="agente-loop", daemon=True)
+                    self._hilo.start()
+                    listo.wait()
+                    self._loop = loop
+        return self._loop
+
+    def en_hilo_del_loop(self) -> bool:
+        return self._hilo is not None and threading.current_thread() is self._hilo
+
+    def enviar(self, coro: Coroutine[Any, Any, Any]) -> concurrent.futures.Future:
+        """Programa una corrutina en el loop compartido y devuelve su Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def ejecutar(self, coro: Coroutine[Any, Any, Any], timeout: Optional[float] = None) -> Any:
+        """
+        Ejecuta una corrutina en el loop compartido y espera su resultado desde código síncrono.
+        Si se agota el timeout, la tarea se cancela dentro del loop (cancelando también las
+        peticiones HTTP en curso) y se lanza `TimeoutError`.
+        """
+        if self.en_hilo_del_loop():
+            coro.close()
+            raise RuntimeError("No se puede esperar de forma síncrona desde el propio loop compartido")
+        futuro = self.enviar(coro)
+        try:
+            return futuro.result(timeout)
+        except concurrent.futures.TimeoutError:
+            futuro.cancel()
+            raise TimeoutError("La operación superó el tiempo máximo de espera")
+
+
+loop_compartido = LoopCompartido()
+
+
+def ejecutar_en_loop(coro: Coroutine[Any, Any, Any], timeout: Optional[float] = None) -> Any:
+    """Ejecuta una corrutina en el loop compartido del proceso y devuelve su resultado"""
+    return loop_compartido.ejecutar(coro, timeout)
@@ -0,0 +1,190 @@
+import os
+import json
+import time
+import uuid
+import functools
+import threading
+from collections import OrderedDict, Counter
+from typing import Optional, Dict, Any, List, Tuple, Callable, Awaitable
+
+from mi_agente_ai.utils.fechas import parsear_fecha
+
+# Presupuesto aproximado de tokens para el resultado de una herramienta
+PRESUPUESTO_TOKENS = int(os.getenv("AGENTE_PRESUPUESTO_TOKENS", "1500"))
+# Resultados grandes guardados para paginar (cantidad y segundos de vigencia)
+RESULTADOS_MAX = int(os.getenv("AGENTE_RESULTADOS_MAX", "64"))
+RESULTADOS_TTL = float(os.getenv("AGENTE_RESULTADOS_TTL", "900"))
+
+# Columnas que van primero en la tabla, en este orden
+ORDEN_COLUMNAS = ["Empleado", "Fecha de inicio", "Fecha Finalización", "Reincorporación"]
+
+
+def estimar_tokens(valor: Any) -> int:
+    """Estimación rápida de tokens (unos 4 caracteres por token del JSON compacto)"""
+    return len(json.dumps(valor, ensure_ascii=False, separators=(",", ":"), default=str)) // 4 + 1
+
+
+def compactar_registros(registros: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Codifica una lista de registros en formato de tabla: los nombres de columna una sola vez
+    y cada fila como un arreglo de valores.
+    """
+    columnas = [c for c in ORDEN_COLUMNAS if any(c in r for r in registros)]
+    for registro in registros:
+        for columna in registro:
+            if columna not in columnas:
+                columnas.append(columna)
+    return {
+        "formato": "tabla",
+        "columnas": columnas,
+        "filas": [[registro.get(columna, "") for columna in columnas] for registro in registros],
+    }
+
+
+def expandir_tabla(resultado: Dict[str, Any]) -> Dict[str, Any]:
+    """Convierte un resultado en formato de tabla de nuevo a `{"registros": [...]}`; el resto queda igual"""
+    if not isinstance(resultado, dict) or "columnas" not in resultado or "filas" not in resultado:
+        return resultado
+    expandido = {k: v for k, v in resultado.items() if k not in ("formato", "columnas", "filas")}
+    expandido["registros"] = [dict(zip(resultado["columnas"], fila)) for fila in resultado["filas"]]
+    return expandido
+
+
+def resumir_registros(registros: List[Dict[str, Any]], max_grupos: int = 24) -> Dict[str, Any]:
+    """Agregados de un conjunto de licencias: cantidad por mes de inicio y por empleado"""
+    por_mes = Counter()
+    por_empleado = Counter()
+    for registro in registros:
+        inicio = parsear_fecha(registro.get("Fecha de inicio"))
+        por_mes[inicio.strftime("%Y-%m") if inicio else "sin fecha"] += 1
+        if registro.get("Empleado"):
+            por_empleado[str(registro["Empleado"])] += 1
+    return {
+        "total": len(registros),
+        "por_mes": dict(sorted(por_mes.items())[-max_grupos:]),
+        "por_empleado": dict(por_empleado.most_common(max_grupos)),
+    }
+
+
+class AlmacenResultados:
+    """Guarda temporalmente resultados grandes para que el agente los recorra por páginas"""
+
+    def __init__(self, max_resultados: int = RESULTADOS_MAX, ttl: float = RESULTADOS_TTL):
+        self.max_resultados = max_resultados
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # handle -> (registros, filas por página, guardado)
+        self._resultados: "OrderedDict[str, Tuple[List[Dict[str, Any]], int, float]]" = OrderedDict()
+
+    def guardar(self, registros: List[Dict[str, Any]], filas_por_pagina: int) -> str:
+        handle = uuid.uuid4().hex[:12]
+        with self._lock:
+            self._resultados[handle] = (registros, filas_por_pagina, time.time())
+            while len(self._resultados) > self.max_resultados:
+                self._resultados.popitem(last=False)
+        return handle
+
+    def registros(self, handle: str) -> Optional[List[Dict[str, Any]]]:
+        """Todos los registros guardados con el handle, o None si no existe o venció"""
+        with self._lock:
+            guardado = self._resultados.get(handle)
+            if guardado is None or time.time() - guardado[2] > self.ttl:
+                self._resultados.pop(handle, None)
+                return None
+        return guardado[0]
+
+    def pagina(self, handle: str, numero: int) -> Optional[Dict[str, Any]]:
+        """Devuelve una página (numerada desde 1) en formato de tabla, o None si el handle no existe o venció"""
+        with self._lock:
+            guardado = self._resultados.get(handle)
+            if guardado is None or time.time() - guardado[2] > self.ttl:
+                self._resultados.pop(handle, None)
+                return None
+            self._resultados.move_to_end(handle)
+        registros, filas_por_pagina, _ = guardado
+        total_paginas = max(1, -(-len(registros) // filas_por_pagina))
+        numero = min(max(1, numero), total_paginas)
+        desde = (numero - 1) * filas_por_pagina
+        return {
+            **compactar_registros(registros[desde:desde + filas_por_pagina]),
+            "handle": handle,
+            "pagina": numero,
+            "paginas": total_paginas,
+            "total": len(registros),
+        }
+
+
+almacen_resultados = AlmacenResultados()
+
+
+def ajustar_a_presupuesto(resultado: Dict[str, Any], presupuesto: int = PRESUPUESTO_TOKENS) -> Dict[str, Any]:
+    """
+    Prepara el resultado de una herramienta para el LLM. Si la tabla compacta entra en el presupuesto
+    de tokens se devuelve completa; si no, se devuelve un resumen agregado, la primera página
+    y un `handle` para pedir las páginas siguientes con `ver_pagina_resultado`.
+    Los resultados de un lote (`{"resultados": {...}}`) se ajustan uno por uno con una parte del presupuesto.
+    """
+    if isinstance(resultado, dict) and isinstance(resultado.get("resultados"), dict):
+        # Resultado de un lote: el presupuesto se reparte entre las subconsultas
+        subresultados = resultado["resultados"]
+        presupuesto_parcial = max(1, presupuesto // max(1, len(subresultados)))
+        return {**resultado, "resultados": {
+            clave: ajustar_a_presupuesto(subresultado, presupuesto_parcial) for clave, subresultado in subresultados.items()
+        }}
+
+    registros = resultado.get("registros") if isinstance(resultado, dict) else None
+    if not isinstance(registros, list):
+        return resultado
+
+    otros = {k: v for k, v in resultado.items() if k != "registros"}
+    tabla = compactar_registros(registros)
+    if estimar_tokens(tabla) <= presupuesto:
+        return {**otros, **tabla}
+
+    # Las filas de cada página ocupan a lo sumo la mitad del presupuesto; el resto es para el resumen
+    tokens_por_fila = max(1, estimar_tokens(tabla["filas"]) // max(1, len(registros)))
+    filas_por_pagina = max(1, (presupuesto // 2) // tokens_por_fila)
+    handle = almacen_resultados.guardar(registros, filas_por_pagina)
+    return {
+        **otros,
+        "resumen": resumir_registros(registros),
+        **almacen_resultados.pagina(handle, 1),
+        "formato": "resumen",
+        "nota": "Resultado resumido por su tamaño. Usa ver_pagina_resultado con el handle para ver más filas.",
+    }
+
+
+def resultado_completo(resultado: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Inversa de `ajustar_a_presupuesto`: devuelve `{"registros": [...]}` con todos los registros,
+    tomándolos del almacén si el resultado se resumió (si el handle venció queda la primera página).
+    Se usa para entregar a la UI los datos exactos que recibió el agente.
+    """
+    if isinstance(resultado, dict) and isinstance(resultado.get("resultados"), dict):
+        return {**resultado, "resultados": {
+            clave: resultado_completo(subresultado) for clave, subresultado in resultado["resultados"].items()
+        }}
+    if not isinstance(resultado, dict) or resultado.get("formato") != "resumen":
+        return expandir_tabla(resultado)
+    expandido = expandir_tabla(resultado)
+    registros = almacen_resultados.registros(resultado.get("handle", ""))
+    if registros is None:
+        return expandido
+    for clave in ("resumen", "handle", "pagina", "paginas", "total", "nota"):
+        expandido.pop(clave, None)
+    expandido["registros"] = registros
+    return expandido
+
+
+def salida_compacta(herramienta: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    """
+    Envuelve una herramienta asíncrona cuya salida tiene `resultado` y `metadata`, para que lo que
+    recibe el LLM esté en formato de tabla y dentro del presupuesto de tokens.
+    Conserva el nombre, la firma y el docstring, que pydantic-ai usa para describir la herramienta.
+    """
+    @functools.wraps(herramienta)
+    async def envoltura(*args, **kwargs):
+        salida = await herramienta(*args, **kwargs)
+        salida.resultado = ajustar_a_presupuesto(salida.resultado)
+        return salida
+    return envoltura
@@ -0,0 +1,15 @@
+import re
+import unicodedata
+
+_ESPACIOS = re.compile(r"\s+")
+
+
+def quitar_acentos(texto: str) -> str:
+    """Elimina tildes y diacríticos (por ejemplo, "Finalización" pasa a ser "Finalizacion")"""
+    descompuesto = unicodedata.normalize("NFKD", texto)
+    return "".join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+def normalizar_texto(texto: str) -> str:
+    """Normaliza un texto para comparaciones: minúsculas, sin acentos y con espacios simples"""
+    return _ESPACIOS.sub(" ", quitar_acentos(str(texto)).lower()).strip()
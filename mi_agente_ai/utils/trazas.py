@@ -0,0 +1,298 @@
+import os
+import json
+import time
+import bisect
+import secrets
+import functools
+import threading
+import contextlib
+import contextvars
+from collections import deque
+from typing import Optional, Dict, Any, Callable, Awaitable, Iterator
+
+from dotenv import load_dotenv
+
+# Cargar variables de entorno
+load_dotenv()
+
+# Destino de las trazas: vacío (solo estadísticas en memoria), "consola" o la ruta de un archivo JSONL
+TRAZAS_DESTINO = os.getenv("AGENTE_TRAZAS", "")
+# Duraciones recientes que se guardan por tipo de span para calcular percentiles
+TRAZAS_MUESTRAS = int(os.getenv("AGENTE_TRAZAS_MUESTRAS", "1024"))
+
+# Límites (en ms) de los buckets de los histogramas, los mismos que usa OpenTelemetry por defecto
+LIMITES_HISTOGRAMA_MS = [5, 10, 25, 50, 75, 100, 250, 500, 750, 1000, 2500, 5000, 7500, 10000]
+
+# Atributos de uso de tokens (convenciones semánticas de OpenTelemetry para IA generativa)
+TOKENS_ENTRADA = "gen_ai.usage.input_tokens"
+TOKENS_SALIDA = "gen_ai.usage.output_tokens"
+
+
+def _otel_trace():
+    """Módulo `trace` de OpenTelemetry si está instalado; sin un SDK configurado sus spans no hacen nada"""
+    try:
+        from opentelemetry import trace
+    except ImportError:
+        return None
+    return trace
+
+
+class Span:
+    """Operación medida dentro de una traza, con el mismo modelo de datos que un span de OpenTelemetry"""
+    __slots__ = ("nombre", "trace_id", "span_id", "padre_id", "inicio_ns", "fin_ns", "atributos", "estado", "error",
+                 "_otel")
+
+    def __init__(self, nombre: str, padre: Optional["Span"], atributos: Dict[str, Any]):
+        self.nombre = nombre
+        self.trace_id = padre.trace_id if padre is not None else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.padre_id = padre.span_id if padre is not None else None
+        self.inicio_ns = time.time_ns()
+        self.fin_ns: Optional[int] = None
+        self.atributos = dict(atributos)
+        self.estado = "OK"
+        self.error: Optional[str] = None
+        self._otel = None
+
+    @property
+    def duracion_ms(self) -> float:
+        fin = self.fin_ns if self.fin_ns is not None else time.time_ns()
+        return (fin - self.inicio_ns) / 1e6
+
+    def atributo(self, clave: str, valor: Any):
+        if valor is None:
+            return
+        self.atributos[clave] = valor
+        if self._otel is not None:
+            self._otel.set_attribute(clave, valor if isinstance(valor, (str, bool, int, float)) else str(valor))
+
+    def marcar_error(self, error: BaseException):
+        """Marca el span como fallido aunque el error se haya manejado (por ejemplo, convertido en un mensaje)"""
+        self.estado = "ERROR"
+        self.error = f"{type(error).__name__}: {error}"
+
+    def a_otlp(self) -> Dict[str, Any]:
+        """Representación en el formato JSON de OTLP"""
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.padre_id or "",
+            "name": self.nombre,
+            "startTimeUnixNano": self.inicio_ns,
+            "endTimeUnixNano": self.fin_ns,
+            "attributes": self.atributos,
+            "status": {"code": self.estado, "message": self.error or ""},
+        }
+
+
+class ExportadorConsola:
+    def exportar(self, span: Span):
+        print(json.dumps(span.a_otlp(), ensure_ascii=False, default=str))
+
+
+class ExportadorArchivo:
+    """Agrega cada span como una línea JSON (OTLP) al final del archivo"""
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+
+    def exportar(self, span: Span):
+        linea = json.dumps(span.a_otlp(), ensure_ascii=False, default=str)
+        with self._lock, open(self.ruta, "a", encoding="utf-8") as archivo:
+            archivo.write(linea + "\n")
+
+
+def crear_exportador(destino: str):
+    if not destino:
+        return None
+    if destino.lower() in ("consola", "console"):
+        return ExportadorConsola()
+    return ExportadorArchivo(destino)
+
+
+class Histograma:
+    """Duraciones de un tipo de span: buckets acumulados y muestras recientes para los percentiles"""
+
+    def __init__(self, muestras: int):
+        self.cuenta = 0
+        self.errores = 0
+        self.suma_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(LIMITES_HISTOGRAMA_MS) + 1)
+        self.recientes: deque = deque(maxlen=muestras)
+        self.tokens_entrada = 0
+        self.tokens_salida = 0
+
+    def registrar(self, span: Span):
+        duracion = span.duracion_ms
+        self.cuenta += 1
+        self.errores += span.estado == "ERROR"
+        self.suma_ms += duracion
+        self.max_ms = max(self.max_ms, duracion)
+        self.buckets[bisect.bisect_left(LIMITES_HISTOGRAMA_MS, duracion)] += 1
+        self.recientes.append(duracion)
+        self.tokens_entrada += int(span.atributos.get(TOKENS_ENTRADA) or 0)
+        self.tokens_salida += int(span.atributos.get(TOKENS_SALIDA) or 0)
+
+    def resumen(self) -> Dict[str, Any]:
+        ordenadas = sorted(self.recientes)
+
+        def percentil(p: float) -> Optional[float]:
+            if not ordenadas:
+                return None
+            return round(ordenadas[min(len(ordenadas) - 1, int(p * len(ordenadas)))], 2)
+
+        resumen = {
+            "cuenta": self.cuenta,
+            "errores": self.errores,
+            "media_ms": round(self.suma_ms / self.cuenta, 2) if self.cuenta else None,
+            "p50_ms": percentil(0.50),
+            "p95_ms": percentil(0.95),
+            "p99_ms": percentil(0.99),
+            "max_ms": round(self.max_ms, 2),
+            "buckets_ms": dict(zip([f"<={limite}" for limite in LIMITES_HISTOGRAMA_MS] + ["+inf"], self.buckets)),
+        }
+        if self.tokens_entrada or self.tokens_salida:
+            resumen["tokens_entrada"] = self.tokens_entrada
+            resumen["tokens_salida"] = self.tokens_salida
+        return resumen
+
+
+_span_actual: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("span_actual", default=None)
+
+
+class Trazador:
+    """
+    Registra spans anidados por contexto (también entre tareas asyncio), los exporta al destino
+    configurado y agrega sus duraciones por nombre. Si OpenTelemetry está instalado, cada span
+    también se crea ahí, así que un SDK configurado por la aplicación recibe las mismas trazas.
+    """
+
+    def __init__(self, destino: str = TRAZAS_DESTINO, muestras: int = TRAZAS_MUESTRAS):
+        self.exportador = crear_exportador(destino)
+        self.muestras = muestras
+        self._otel_trace = _otel_trace()
+        self._otel = self._otel_trace.get_tracer("mi_agente_ai") if self._otel_trace is not None else None
+        self._lock = threading.Lock()
+        self._histogramas: Dict[str, Histograma] = {}
+
+    def iniciar(self, nombre: str, padre: Optional[Span] = None, **atributos) -> Span:
+        """Inicia un span sin volverlo el actual (para operaciones que no abarcan un bloque `with`)"""
+        padre = padre if padre is not None else _span_actual.get()
+        span = Span(nombre, padre, atributos)
+        if self._otel is not None:
+            contexto_padre = None
+            if padre is not None and padre._otel is not None:
+                contexto_padre = self._otel_trace.set_span_in_context(padre._otel)
+            span._otel = self._otel.start_span(nombre, context=contexto_padre, attributes={
+                clave: valor for clave, valor in atributos.items() if isinstance(valor, (str, bool, int, float))
+            })
+            contexto = span._otel.get_span_context()
+            if contexto.is_valid:
+                span.trace_id = format(contexto.trace_id, "032x")
+                span.span_id = format(contexto.span_id, "016x")
+        return span
+
+    def terminar(self, span: Span, error: Optional[BaseException] = None):
+        if span.fin_ns is not None:
+            return
+        span.fin_ns = time.time_ns()
+        if error is not None:
+            span.marcar_error(error)
+        if span._otel is not None:
+            if error is not None:
+                span._otel.record_exception(error)
+            if span.estado == "ERROR":
+                span._otel.set_status(self._otel_trace.Status(self._otel_trace.StatusCode.ERROR, span.error))
+            span._otel.end()
+        with self._lock:
+            histograma = self._histogramas.get(span.nombre)
+            if histograma is None:
+                histograma = self._histogramas[span.nombre] = Histograma(self.muestras)
+            histograma.registrar(span)
+        if self.exportador is not None:
+            try:
+                self.exportador.exportar(span)
+            except OSError as e:
+                print(f"No se pudo exportar la traza: {str(e)}")
+
+    @contextlib.contextmanager
+    def activo(self, span: Span) -> Iterator[Span]:
+        """Vuelve actual un span iniciado con `iniciar` (por ejemplo dentro de otra tarea), sin terminarlo"""
+        token = _span_actual.set(span)
+        try:
+            yield span
+        finally:
+            _span_actual.reset(token)
+
+    @contextlib.contextmanager
+    def span(self, nombre: str, **atributos) -> Iterator[Span]:
+        """Mide el bloque como un span hijo del span actual"""
+        span = self.iniciar(nombre, **atributos)
+        token = _span_actual.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            self.terminar(span, e)
+            raise
+        finally:
+            _span_actual.reset(token)
+            self.terminar(span)
+
+    def estadisticas(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {nombre: histograma.resumen() for nombre, histograma in sorted(self._histogramas.items())}
+
+    def reiniciar(self):
+        """Descarta las estadísticas acumuladas (por ejemplo entre escenarios de un benchmark)"""
+        with self._lock:
+            self._histogramas.clear()
+
+
+trazador = Trazador()
+
+
+def span(nombre: str, **atributos):
+    """Atajo para `trazador.span`"""
+    return trazador.span(nombre, **atributos)
+
+
+def span_actual() -> Optional[Span]:
+    return _span_actual.get()
+
+
+def registrar_uso(span: Span, uso: Any):
+    """Registra en el span el uso de tokens de una petición o de una ejecución del agente (`Usage` de pydantic-ai)"""
+    if uso is None:
+        return
+    span.atributo(TOKENS_ENTRADA, getattr(uso, "request_tokens", None))
+    span.atributo(TOKENS_SALIDA, getattr(uso, "response_tokens", None))
+    if getattr(uso, "requests", None):
+        span.atributo("gen_ai.requests", uso.requests)
+
+
+def trazado(herramienta: Callable[..., Awaitable[Any]], nombre: Optional[str] = None) -> Callable[..., Awaitable[Any]]:
+    """
+    Envuelve una herramienta asíncrona en un span `herramienta.<nombre>`. Si la salida tiene `metadata`,
+    se registran como atributos el éxito, el origen de los datos y la cantidad de registros.
+    Conserva el nombre, la firma y el docstring, que pydantic-ai usa para describir la herramienta.
+    """
+    nombre_span = f"herramienta.{nombre or herramienta.__name__}"
+
+    @functools.wraps(herramienta)
+    async def envoltura(*args, **kwargs):
+        with span(nombre_span) as actual:
+            salida = await herramienta(*args, **kwargs)
+            metadata = getattr(salida, "metadata", None)
+            if isinstance(metadata, dict):
+                actual.atributo("success", metadata.get("success"))
+                actual.atributo("origen", metadata.get("origen") or ("cache" if (metadata.get("cache") or {}).get("hit") else None))
+                actual.atributo("record_count", metadata.get("record_count"))
+            return salida
+    return envoltura
+
+
+def estadisticas_trazas() -> Dict[str, Dict[str, Any]]:
+    """Percentiles, histogramas y uso de tokens por tipo de span"""
+    return trazador.estadisticas()
@@ -6,9 +6,18 @@ setup(
     packages=find_packages(),
     install_requires=[
         "pydantic-ai",
+        "groq",
         "httpx",
         "pydantic",
         "python-dotenv",
         "streamlit",
+        "pandas",
+        "numpy",
     ],
+    extras_require={
+        # HTTP/2 para el cliente de Rukovoditel
+        "http2": ["h2"],
+        # Servidor HTTP (python -m mi_agente_ai.api)
+        "api": ["fastapi", "uvicorn"],
+    },
 ) 
\ No newline at end of file
@@ -10,6 +10,8 @@ import sys
 from pprint import pprint
 from dotenv import load_dotenv
 
+from mi_agente_ai.tools.esquema import ESQUEMA_LICENCIAS
+
 # Cargar variables de entorno
 load_dotenv()
 
@@ -91,12 +93,7 @@ def consultar_api_rukovoditel(
 
 def mostrar_mapping_campos():
     """Muestra el mapping de IDs de campos y sus nombres para referencia"""
-    campo_mapping = {
-        "651": "Fecha de inicio",
-        "665": "Fecha Finalización",
-        "653": "Reincorporación",
-        "912": "Empleado"
-    }
+    campo_mapping = {campo.id: campo.nombre for campo in ESQUEMA_LICENCIAS.campos}
     
     print("\nMapping de IDs de campos:")
     for campo_id, nombre in campo_mapping.items():
@@ -134,17 +131,8 @@ if __name__ == "__main__":
                             print(f"  Fecha creación: {valor}")
                         elif campo_id == "date_updated":
                             print(f"  Última actualización: {valor}")
-                        elif campo_id == "651":
-                            print(f"  Fecha de inicio: {valor}")
-                        elif campo_id == "665":
-                            print(f"  Fecha Finalización: {valor}")
-                        elif campo_id == "653":
-                            print(f"  Reincorporación: {valor}")
-                        elif campo_id == "912":
-                            print(f"  Empleado: {valor}")
-                        # Otros campos mantienen su ID
                         else:
-                            print(f"  Campo {campo_id}: {valor}")
+                            print(f"  {ESQUEMA_LICENCIAS.nombre_campo(campo_id)}: {valor}")
         else:
             print(f"Estado: ❌ Error")
             pprint(resultado)
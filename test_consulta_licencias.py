@@ -12,16 +12,12 @@ from pprint import pprint
 sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
 
 # Importar la herramienta
-from mi_agente_ai.tools.consulta_licencias_encargados import consulta_licencias_encargados, ConsultaLicenciasEncargadosInput
+from mi_agente_ai.tools.consulta_licencias_encargados import consulta_licencias_encargados_sync, ConsultaLicenciasEncargadosInput
+from mi_agente_ai.tools.esquema import ESQUEMA_LICENCIAS
 
 def mostrar_campo_mapping():
     """Muestra el mapping de IDs de campos y sus nombres para referencia"""
-    campo_mapping = {
-        "651": "Fecha de inicio",
-        "665": "Fecha Finalización",
-        "653": "Reincorporación",
-        "912": "Empleado"
-    }
+    campo_mapping = {campo.id: campo.nombre for campo in ESQUEMA_LICENCIAS.campos}
     
     print("\nMapping de IDs de campos:")
     for campo_id, nombre in campo_mapping.items():
@@ -51,7 +47,7 @@ def probar_herramienta(entity_id=43, reports_id=3930, limit=10, select_fields="6
     )
     
     # Ejecutar la herramienta
-    resultado = consulta_licencias_encargados(input_data)
+    resultado = consulta_licencias_encargados_sync(input_data)
     
     # Mostrar resultado
     print("\nResultado:")
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Prueba de consistencia entre la consulta a la API y el espejo local.
+Ejecuta las mismas consultas contra el servidor falso de Rukovoditel (benchmarks/servidor_falso.py)
+y contra el espejo SQLite sincronizado desde ese mismo servidor, y verifica que ambos caminos
+devuelvan los mismos registros.
+
+Uso:
+    python -m pytest test_espejo_local.py
+    python test_espejo_local.py
+"""
+import sys
+import os
+
+# Añadir el directorio raíz y los benchmarks al path para poder importar los módulos
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "benchmarks")))
+
+# La configuración se lee al importar los módulos: credenciales de prueba y sin caches
+os.environ.update({
+    "RUKOVODITEL_API_KEY": "clave",
+    "RUKOVODITEL_USER": "usuario",
+    "RUKOVODITEL_PASSWORD": "secreto",
+    "RUKOVODITEL_CACHE_TTL": "0",
+    "RUKOVODITEL_CACHE_SQLITE": "",
+    "RUKOVODITEL_SYNC_SQLITE": "",
+    "RUKOVODITEL_TASA": "0",
+})
+
+import json
+from urllib.parse import parse_qsl
+
+import httpx
+
+from servidor_falso import RukovoditelFalso
+from mi_agente_ai.services import rukovoditel, sincronizacion, cache
+from mi_agente_ai.tools.planificador import FiltrosLicencias
+from mi_agente_ai.tools.consulta_licencias_encargados import (
+    consulta_licencias_encargados_sync, ConsultaLicenciasEncargadosInput
+)
+
+# El paquete `tools` exporta una función con el mismo nombre que el módulo
+modulo_consulta = sys.modules["mi_agente_ai.tools.consulta_licencias_encargados"]
+
+# Consultas que se comparan: filtros crudos (texto y rango de fechas) y filtros tipados
+CONSULTAS = [
+    {"filters": {"912": "viola"}},
+    {"filters": {"912": "VIOLA, Daniel"}},
+    {"filters": {"651": "2022-10-01,2022-12-31"}},
+    {"filters": {"651": "2023-06-01,"}},
+    {"filters": {"912": "sosa", "651": ",2020-12-31"}},
+    {"filtro": FiltrosLicencias(campos={"912": "GOMEZ, Ana"})},
+    {"filtro": FiltrosLicencias(empleado="perez juan", desde="2021-01-01", hasta="2021-12-31")},
+    {},
+]
+
+
+def _preparar_servidor(registros: int = 300):
+    """Instala un cliente compartido que responde con el servidor falso en el mismo proceso"""
+    falso = RukovoditelFalso(registros, latencia_ms=0, jitter_ms=0)
+    # Con pytest, otro módulo de pruebas puede haber importado el paquete antes de configurar el
+    # entorno: las credenciales y el cache se ajustan también en los módulos ya importados
+    modulo_consulta.API_KEY = os.environ["RUKOVODITEL_API_KEY"]
+    modulo_consulta.USER = os.environ["RUKOVODITEL_USER"]
+    modulo_consulta.PASSWORD = os.environ["RUKOVODITEL_PASSWORD"]
+    cache._cache_compartido = cache.CacheConsultas(ttl=0)
+
+    def responder(request: httpx.Request) -> httpx.Response:
+        params = dict(parse_qsl(request.content.decode("utf-8"), keep_blank_values=True))
+        return httpx.Response(200, content=json.dumps(falso.responder(params)).encode("utf-8"),
+                              headers={"content-type": "application/json"})
+
+    rukovoditel._cliente_compartido = rukovoditel.RukovoditelClient(
+        api_url="http://rukovoditel/api/rest.php", transport=httpx.MockTransport(responder),
+        async_transport=httpx.ASGITransport(falso),
+    )
+    return falso
+
+
+def _consultar(consulta, limit: int):
+    input_data = ConsultaLicenciasEncargadosInput(limit=limit, **consulta)
+    salida = consulta_licencias_encargados_sync(input_data)
+    assert "error" not in salida.resultado, salida.resultado
+    return salida.metadata.get("origen"), salida.resultado["registros"]
+
+
+def _con_espejo(funcion):
+    """Ejecuta `funcion` con el espejo local sincronizado y vigente"""
+    sincronizador = sincronizacion.SincronizadorLicencias(sincronizacion.AlmacenLocal(":memory:"))
+    sincronizador.sincronizar(reconciliar=True)
+    anterior = sincronizacion.SYNC_SQLITE, sincronizacion._sincronizador
+    sincronizacion.SYNC_SQLITE, sincronizacion._sincronizador = ":memory:", sincronizador
+    try:
+        return funcion()
+    finally:
+        sincronizacion.SYNC_SQLITE, sincronizacion._sincronizador = anterior
+
+
+def _comparar(limit: int):
+    _preparar_servidor()
+    for consulta in CONSULTAS:
+        origen_remoto, remotos = _consultar(consulta, limit)
+        origen_local, locales = _con_espejo(lambda: _consultar(consulta, limit))
+        assert origen_remoto != "local" and origen_local == "local"
+        # Mismos registros y en el mismo orden, también cuando `limit` corta el resultado
+        assert remotos == locales, consulta
+        assert remotos, consulta
+
+
+def test_espejo_y_api_devuelven_los_mismos_registros():
+    _comparar(limit=1000)
+
+
+def test_espejo_y_api_respetan_el_orden_con_limite():
+    _comparar(limit=3)
+
+
+def test_sincronizacion_incremental_trae_registros_nuevos():
+    # Los registros recién creados tienen date_updated vacío: deben llegar sin esperar la reconciliación
+    falso = _preparar_servidor(registros=50)
+    almacen = sincronizacion.AlmacenLocal(":memory:")
+    sincronizador = sincronizacion.SincronizadorLicencias(almacen)
+    sincronizador.sincronizar(reconciliar=True)
+    nuevo = dict(falso.registros[0], id="1000", date_added="1700000000", date_updated="")
+    falso.registros.insert(0, nuevo)
+    resumen = sincronizador.sincronizar(reconciliar=None)
+    assert resumen["cambios"] >= 1
+    assert almacen.registros(sincronizador.entity_id)[0]["id"] == "1000"
+
+
+if __name__ == "__main__":
+    test_espejo_y_api_devuelven_los_mismos_registros()
+    test_espejo_y_api_respetan_el_orden_con_limite()
+    test_sincronizacion_incremental_trae_registros_nuevos()
+    print("El espejo local y la API devuelven los mismos registros")